@@ -0,0 +1,38 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Crear índices compuestos para la paginación por cursor de facturas.
+    """
+    op.create_index('ix_invoices_date_id', 'invoices', ['date', 'id'], unique=False)
+    op.create_index('ix_invoices_user_id_date_id', 'invoices', ['user_id', 'date', 'id'], unique=False)
+    op.create_index('ix_invoices_status_date_id', 'invoices', ['status', 'date', 'id'], unique=False)
+    op.create_index('ix_invoices_category_date_id', 'invoices', ['category', 'date', 'id'], unique=False)
+    op.create_index('ix_invoices_payment_method_date_id', 'invoices', ['payment_method', 'date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    Eliminar los índices de paginación por cursor.
+    """
+    op.drop_index('ix_invoices_payment_method_date_id', table_name='invoices')
+    op.drop_index('ix_invoices_category_date_id', table_name='invoices')
+    op.drop_index('ix_invoices_status_date_id', table_name='invoices')
+    op.drop_index('ix_invoices_user_id_date_id', table_name='invoices')
+    op.drop_index('ix_invoices_date_id', table_name='invoices')
@@ -0,0 +1,48 @@
+"""add_invoice_search_indexes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Agregar la columna tsvector de búsqueda y los índices GIN/trigram.
+    """
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    # Columna generada con el documento de búsqueda (configuración en español)
+    op.execute("""
+        ALTER TABLE invoices ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('spanish', coalesce(provider, '')), 'A') ||
+            setweight(to_tsvector('spanish', coalesce(nit, '')), 'A') ||
+            setweight(to_tsvector('spanish', coalesce(description, '')), 'B') ||
+            setweight(to_tsvector('spanish', coalesce(ocr_data->>'raw_text', '')), 'C')
+        ) STORED
+    """)
+    
+    op.execute("CREATE INDEX IF NOT EXISTS ix_invoices_search_vector ON invoices USING gin (search_vector)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_invoices_provider_trgm ON invoices USING gin (provider gin_trgm_ops)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_invoices_description_trgm ON invoices USING gin (description gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """
+    Eliminar la columna de búsqueda y sus índices.
+    """
+    op.execute("DROP INDEX IF EXISTS ix_invoices_description_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_invoices_provider_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_invoices_search_vector")
+    op.execute("ALTER TABLE invoices DROP COLUMN IF EXISTS search_vector")
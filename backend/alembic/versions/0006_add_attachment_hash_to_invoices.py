@@ -0,0 +1,32 @@
+"""add_attachment_hash_to_invoices
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Agregar el hash del adjunto e indexar file_path para contar referencias.
+    """
+    op.add_column('invoices', sa.Column('file_sha256', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_invoices_file_path'), 'invoices', ['file_path'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    Eliminar el hash del adjunto y el índice de file_path.
+    """
+    op.drop_index(op.f('ix_invoices_file_path'), table_name='invoices')
+    op.drop_column('invoices', 'file_sha256')
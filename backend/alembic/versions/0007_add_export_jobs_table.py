@@ -0,0 +1,52 @@
+"""add_export_jobs_table
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Crear la tabla de trabajos de exportación en segundo plano.
+    """
+    op.create_table(
+        'export_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column(
+            'status',
+            sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', name='exportjobstatus'),
+            nullable=False
+        ),
+        sa.Column('filters', sa.JSON(), nullable=False),
+        sa.Column('filters_key', sa.String(length=64), nullable=False),
+        sa.Column('total_rows', sa.Integer(), nullable=True),
+        sa.Column('rows_written', sa.Integer(), nullable=False),
+        sa.Column('file_key', sa.String(length=500), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_export_jobs_filters_key_created_at', 'export_jobs', ['filters_key', 'created_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """
+    Eliminar la tabla de trabajos de exportación.
+    """
+    op.drop_index('ix_export_jobs_filters_key_created_at', table_name='export_jobs')
+    op.drop_table('export_jobs')
+    op.execute("DROP TYPE IF EXISTS exportjobstatus")
@@ -0,0 +1,57 @@
+"""add_invoice_daily_rollups_table
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Crear la tabla de rollups diarios de facturas y poblarla desde las
+    facturas existentes.
+    """
+    # Los tipos enum ya existen por la tabla invoices
+    op.create_table(
+        'invoice_daily_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('category', postgresql.ENUM(name='expensecategory', create_type=False), nullable=False),
+        sa.Column('payment_method', postgresql.ENUM(name='paymentmethod', create_type=False), nullable=False),
+        sa.Column('status', postgresql.ENUM(name='invoicestatus', create_type=False), nullable=False),
+        sa.Column('invoice_count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('day', 'user_id', 'category', 'payment_method', 'status')
+    )
+    op.create_index(
+        'ix_invoice_daily_rollups_user_id_day', 'invoice_daily_rollups', ['user_id', 'day'], unique=False
+    )
+
+    # Backfill inicial (día en UTC, como `invoice_day` y el mantenimiento incremental)
+    op.execute("""
+        INSERT INTO invoice_daily_rollups
+            (day, user_id, category, payment_method, status, invoice_count, total_amount)
+        SELECT CAST(date AT TIME ZONE 'UTC' AS DATE), user_id, category, payment_method, status, COUNT(id), SUM(amount)
+        FROM invoices
+        GROUP BY CAST(date AT TIME ZONE 'UTC' AS DATE), user_id, category, payment_method, status
+    """)
+
+
+def downgrade() -> None:
+    """
+    Eliminar la tabla de rollups diarios.
+    """
+    op.drop_index('ix_invoice_daily_rollups_user_id_day', table_name='invoice_daily_rollups')
+    op.drop_table('invoice_daily_rollups')
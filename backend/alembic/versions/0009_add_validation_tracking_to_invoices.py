@@ -0,0 +1,42 @@
+"""add_validation_tracking_to_invoices
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Agregar el momento y el usuario de la validación de las facturas.
+    Las facturas validadas antes de esta migración quedan sin tiempo de
+    validación y no cuentan en los percentiles.
+    """
+    op.add_column('invoices', sa.Column('validated_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('invoices', sa.Column('validated_by', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_invoices_validated_by_users', 'invoices', 'users', ['validated_by'], ['id']
+    )
+    op.create_index(
+        'ix_invoices_validated_by_validated_at', 'invoices', ['validated_by', 'validated_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """
+    Eliminar los campos de validación.
+    """
+    op.drop_index('ix_invoices_validated_by_validated_at', table_name='invoices')
+    op.drop_constraint('fk_invoices_validated_by_users', 'invoices', type_='foreignkey')
+    op.drop_column('invoices', 'validated_by')
+    op.drop_column('invoices', 'validated_at')
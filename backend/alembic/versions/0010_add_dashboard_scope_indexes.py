@@ -0,0 +1,38 @@
+"""add_dashboard_scope_indexes
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Crear índices para las estadísticas del dashboard por rango de fechas,
+    colaborador y categoría.
+    Los rollups ya tienen (day, ...) como clave primaria y (user_id, day).
+    """
+    op.create_index(
+        'ix_invoice_daily_rollups_category_day', 'invoice_daily_rollups', ['category', 'day'], unique=False
+    )
+    op.create_index('ix_invoices_created_at', 'invoices', ['created_at'], unique=False)
+    op.create_index('ix_invoices_user_id_created_at', 'invoices', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    Eliminar los índices del dashboard.
+    """
+    op.drop_index('ix_invoices_user_id_created_at', table_name='invoices')
+    op.drop_index('ix_invoices_created_at', table_name='invoices')
+    op.drop_index('ix_invoice_daily_rollups_category_day', table_name='invoice_daily_rollups')
@@ -0,0 +1,53 @@
+"""add_ocr_jobs_table
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-16 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Crear la tabla de trabajos de OCR ejecutados por los workers de Celery.
+    """
+    op.create_table(
+        'ocr_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column(
+            'status',
+            sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', name='ocrjobstatus'),
+            nullable=False
+        ),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('invoice_id', sa.Integer(), nullable=True),
+        sa.Column('file_key', sa.String(length=500), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('confidence', sa.Float(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ocr_jobs_invoice_id', 'ocr_jobs', ['invoice_id'], unique=False)
+
+
+def downgrade() -> None:
+    """
+    Eliminar la tabla de trabajos de OCR.
+    """
+    op.drop_index('ix_ocr_jobs_invoice_id', table_name='ocr_jobs')
+    op.drop_table('ocr_jobs')
+    op.execute("DROP TYPE IF EXISTS ocrjobstatus")
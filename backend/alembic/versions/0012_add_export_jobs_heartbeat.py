@@ -0,0 +1,32 @@
+"""add_export_jobs_heartbeat
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-16 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Agregar el último avance de los trabajos de exportación, para detectar
+    los que quedaron en curso sin un proceso que los ejecute.
+    """
+    op.add_column('export_jobs', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE export_jobs SET updated_at = COALESCE(completed_at, created_at)")
+
+
+def downgrade() -> None:
+    """
+    Eliminar el último avance de los trabajos de exportación.
+    """
+    op.drop_column('export_jobs', 'updated_at')
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Reconstruir la tabla de rollups diarios de facturas.
+Debe ejecutarse tras cargas masivas o actualizaciones directas en la tabla
+de facturas, que no pasan por el mantenimiento incremental de la sesión.
+
+Uso:
+    python scripts/backfill_invoice_rollups.py
+    python scripts/backfill_invoice_rollups.py --database-url postgresql://...
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio backend al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import settings
+from src.services.dashboard_cache import invalidate_dashboard_cache
+from src.services.invoice_rollups import rebuild_invoice_rollups
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconstruir los rollups diarios de facturas")
+    parser.add_argument("--database-url", default=settings.database_url, help="Base de datos a reconstruir")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    db = sessionmaker(bind=engine)()
+    try:
+        started = time.perf_counter()
+        rows = rebuild_invoice_rollups(db)
+        db.commit()
+        # Solo alcanza a otras instancias con la caché en Redis
+        invalidate_dashboard_cache()
+        logger.info(f"Rollups reconstruidos: {rows} filas en {time.perf_counter() - started:.1f}s")
+    except Exception:
+        db.rollback()
+        logger.exception("Error reconstruyendo los rollups")
+        sys.exit(1)
+    finally:
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
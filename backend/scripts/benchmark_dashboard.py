@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la agregación del dashboard.
+Compara las consultas anteriores de estadísticas básicas, distribuciones y
+rendimiento de validación (una consulta por métrica) con la agregación
+consolidada de `aggregate_invoices` sobre los rollups diarios, a partir de
+una tabla de facturas sembrada.
+
+Uso:
+    python scripts/benchmark_dashboard.py --rows 1000000
+    python scripts/benchmark_dashboard.py --database-url postgresql://... --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio backend al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, event, func, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models import User, Invoice, InvoiceStatus, ExpenseCategory, PaymentMethod
+from src.services.dashboard_stats import DashboardStatsService
+from src.services.invoice_rollups import rebuild_invoice_rollups
+
+SEED_BATCH_SIZE = 50_000
+
+
+def seed(engine, rows: int, users: int = 200) -> None:
+    """Crear las tablas, sembrar usuarios y facturas aleatorias y construir los rollups."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    start = datetime(2023, 1, 1)
+    statuses, categories, methods = list(InvoiceStatus), list(ExpenseCategory), list(PaymentMethod)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"Colaborador {i}", "email": f"colaborador{i}@boosting.com"} for i in range(users)
+        ])
+        for offset in range(0, rows, SEED_BATCH_SIZE):
+            conn.execute(insert(Invoice), [
+                {
+                    "user_id": rng.randint(1, users),
+                    "date": start + timedelta(minutes=rng.randint(0, 60 * 24 * 600)),
+                    "provider": f"Proveedor {rng.randint(1, 5000)}",
+                    "amount": round(rng.uniform(5, 2000), 2),
+                    "payment_method": rng.choice(methods),
+                    "category": rng.choice(categories),
+                    "status": rng.choice(statuses),
+                }
+                for _ in range(min(SEED_BATCH_SIZE, rows - offset))
+            ])
+
+    # La inserción masiva no pasa por el mantenimiento incremental de la sesión
+    db = sessionmaker(bind=engine)()
+    try:
+        rebuild_invoice_rollups(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def legacy_sections(db) -> None:
+    """Consultas previas: una por métrica, con carga de objetos en validación."""
+    db.query(User).count()
+    db.query(Invoice.status, func.count(Invoice.id)).group_by(Invoice.status).all()
+    db.query(func.sum(Invoice.amount)).scalar()
+    db.query(Invoice.status, func.sum(Invoice.amount)).group_by(Invoice.status).all()
+    db.query(Invoice.category, func.count(Invoice.id), func.sum(Invoice.amount)).group_by(Invoice.category).all()
+    db.query(Invoice.payment_method, func.count(Invoice.id), func.sum(Invoice.amount)).group_by(
+        Invoice.payment_method
+    ).all()
+    db.query(Invoice).filter(Invoice.status.in_([InvoiceStatus.VALIDATED, InvoiceStatus.REJECTED])).all()
+    db.query(Invoice).filter(Invoice.status == InvoiceStatus.PENDING).count()
+
+
+def consolidated_sections(db) -> None:
+    """Agregación consolidada: las mismas secciones sobre una sola consulta."""
+    service = DashboardStatsService(db, use_cache=False)
+    service.get_basic_stats()
+    service.get_category_distribution()
+    service.get_payment_method_distribution()
+    service.get_validation_performance()
+
+
+def measure(engine, session_factory, sections, repeats: int):
+    """Medir el número de consultas y la mejor latencia de varias ejecuciones."""
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    timings = []
+    for _ in range(repeats):
+        statements.clear()
+        db = session_factory()
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            started = time.perf_counter()
+            sections(db)
+            timings.append(time.perf_counter() - started)
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+            db.close()
+    return len(statements), min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la agregación del dashboard")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Facturas a sembrar")
+    parser.add_argument("--repeats", type=int, default=3, help="Ejecuciones por variante")
+    parser.add_argument("--database-url", default=None, help="Base de datos (por defecto SQLite temporal)")
+    parser.add_argument("--skip-seed", action="store_true", help="Reutilizar los datos existentes")
+    args = parser.parse_args()
+
+    temp_path = None
+    database_url = args.database_url
+    if database_url is None:
+        fd, temp_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{temp_path}"
+
+    engine = create_engine(database_url)
+    session_factory = sessionmaker(bind=engine)
+    try:
+        if not args.skip_seed:
+            started = time.perf_counter()
+            seed(engine, args.rows)
+            print(f"Sembradas {args.rows:,} facturas en {time.perf_counter() - started:.1f}s ({engine.dialect.name})")
+
+        print(f"{'Variante':<14}{'Consultas':>10}{'Latencia (s)':>14}")
+        for name, sections in (("anterior", legacy_sections), ("consolidada", consolidated_sections)):
+            queries, latency = measure(engine, session_factory, sections, args.repeats)
+            print(f"{name:<14}{queries:>10}{latency:>14.3f}")
+    finally:
+        engine.dispose()
+        if temp_path:
+            os.remove(temp_path)
+
+
+if __name__ == "__main__":
+    main()
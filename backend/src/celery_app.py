@@ -9,12 +9,11 @@ from src.config import settings
 # Configurar Celery
 celery_app = Celery(
     "facturas_boosting",
-    broker=settings.redis_url,
-    backend=settings.redis_url,
+    broker=settings.celery_broker_url,
+    backend=settings.celery_result_backend,
     include=[
         "src.tasks.ocr_tasks",
-        "src.tasks.gmail_tasks",
-        "src.tasks.notification_tasks"
+        "src.tasks.gmail_tasks"
     ]
 )
 
@@ -26,6 +25,8 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
+    task_always_eager=settings.celery_task_always_eager,
+    task_acks_late=True,  # Un trabajo interrumpido se reentrega a otro worker
     task_time_limit=30 * 60,  # 30 minutos
     task_soft_time_limit=25 * 60,  # 25 minutos
     worker_prefetch_multiplier=1,
@@ -34,7 +35,6 @@ celery_app.conf.update(
     task_routes={
         "src.tasks.ocr_tasks.*": {"queue": "ocr_queue"},
         "src.tasks.gmail_tasks.*": {"queue": "gmail_queue"},
-        "src.tasks.notification_tasks.*": {"queue": "notification_queue"},
     },
     task_default_queue="default",
     task_queues={
@@ -50,10 +50,6 @@ celery_app.conf.update(
             "exchange": "gmail",
             "routing_key": "gmail",
         },
-        "notification_queue": {
-            "exchange": "notification",
-            "routing_key": "notification",
-        },
     },
 )
 
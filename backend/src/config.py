@@ -0,0 +1,9 @@
+"""
+Configuración compartida por la API y los workers de Celery.
+Los workers importan la configuración desde aquí para no depender de los
+routers; los valores se leen de las variables de entorno en `src.database`.
+"""
+
+from src.database import Settings, settings
+
+__all__ = ["Settings", "settings"]
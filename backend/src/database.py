@@ -3,7 +3,7 @@ Configuración de la base de datos PostgreSQL.
 Maneja la conexión y sesión de SQLAlchemy.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from pydantic_settings import BaseSettings
@@ -24,7 +24,42 @@ class Settings(BaseSettings):
     algorithm: str = os.getenv("ALGORITHM", "HS256")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     upload_dir: str = os.getenv("UPLOAD_DIR", "./uploads")
+    # Archivos de las exportaciones en segundo plano (no se publica como /uploads)
+    export_dir: str = os.getenv("EXPORT_DIR", "./exports")
     max_file_size: int = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB
+    # Totales de listados por proceso; sin Redis en el dashboard, desfase máximo entre instancias
+    count_cache_ttl: int = int(os.getenv("COUNT_CACHE_TTL", "60"))  # segundos
+    export_cache_ttl: int = int(os.getenv("EXPORT_CACHE_TTL", "600"))  # segundos que se reutiliza una exportación
+    export_stale_after: int = int(os.getenv("EXPORT_STALE_AFTER", "300"))  # segundos sin avance para dar por fallido un trabajo
+    export_retention: int = int(os.getenv("EXPORT_RETENTION", "86400"))  # segundos que se conservan los archivos exportados
+    # Caché de estadísticas del dashboard: "memory" (por proceso) o "redis" (compartida)
+    dashboard_cache_backend: str = os.getenv("DASHBOARD_CACHE_BACKEND", "memory")
+    dashboard_cache_ttl: int = int(os.getenv("DASHBOARD_CACHE_TTL", "300"))  # segundos
+    # Secciones del dashboard en paralelo: hilos y tiempo máximo por sección
+    dashboard_workers: int = int(os.getenv("DASHBOARD_WORKERS", "4"))
+    dashboard_section_timeout: float = float(os.getenv("DASHBOARD_SECTION_TIMEOUT", "5"))  # segundos
+    # Pool de procesos del OCR: procesos (0 = núcleos), trabajos en espera (-1 = 2 por proceso) y tiempo máximo
+    ocr_workers: int = int(os.getenv("OCR_WORKERS", "0"))
+    ocr_max_pending: int = int(os.getenv("OCR_MAX_PENDING", "-1"))
+    ocr_timeout: float = float(os.getenv("OCR_TIMEOUT", "60"))  # segundos
+    # Caché persistente de resultados de OCR (ruta vacía la deshabilita)
+    ocr_cache_path: str = os.getenv("OCR_CACHE_PATH", "./cache/ocr_results.sqlite3")
+    ocr_cache_max_mb: int = int(os.getenv("OCR_CACHE_MAX_MB", "100"))
+    # Tabla JSON de palabras clave por categoría (vacía = tabla por defecto); se recarga al cambiar
+    ocr_category_keywords_path: str = os.getenv("OCR_CATEGORY_KEYWORDS_PATH", "")
+    # Celery: broker y resultados (por defecto el mismo Redis); "eager" ejecuta las tareas en proceso
+    celery_broker_url: str = os.getenv("CELERY_BROKER_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    celery_result_backend: str = os.getenv("CELERY_RESULT_BACKEND", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    celery_task_always_eager: bool = os.getenv("CELERY_TASK_ALWAYS_EAGER", "False").lower() == "true"
+    # Almacenamiento de adjuntos: "local" o "s3" (AWS S3, MinIO, GCS interoperable)
+    storage_backend: str = os.getenv("STORAGE_BACKEND", "local")
+    s3_bucket: str = os.getenv("S3_BUCKET", "")
+    s3_prefix: str = os.getenv("S3_PREFIX", "")
+    s3_endpoint_url: str = os.getenv("S3_ENDPOINT_URL", "")
+    s3_region: str = os.getenv("S3_REGION", "")
+    s3_access_key_id: str = os.getenv("S3_ACCESS_KEY_ID", "")
+    s3_secret_access_key: str = os.getenv("S3_SECRET_ACCESS_KEY", "")
+    s3_presign_expiration: int = int(os.getenv("S3_PRESIGN_EXPIRATION", "300"))  # segundos
     debug: bool = os.getenv("DEBUG", "True").lower() == "true"
     
     class Config:
@@ -76,6 +111,25 @@ else:
         echo=settings.debug
     )
 
+
+@event.listens_for(engine, "connect")
+def _use_utc_session_timezone(dbapi_connection, connection_record):
+    """
+    Fijar la zona de las sesiones de PostgreSQL en UTC.
+
+    Las fechas sin zona se interpretan entonces como UTC, igual que al
+    calcular el día de los rollups en Python (`src.models._rollup_day`).
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    autocommit = dbapi_connection.autocommit
+    dbapi_connection.autocommit = True
+    cursor = dbapi_connection.cursor()
+    cursor.execute("SET TIME ZONE 'UTC'")
+    cursor.close()
+    dbapi_connection.autocommit = autocommit
+
+
 # Crear sesión de base de datos
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -9,7 +9,8 @@ from fastapi.staticfiles import StaticFiles
 import os
 
 from src.routers import invoices, users, dashboard, ocr, gmail_robust
-from src.database import engine
+from src.database import engine, settings
+from src.services.ocr_executor import shutdown_ocr_executor
 from src.models import Base
 
 # Crear tablas en la base de datos (con manejo de errores)
@@ -46,8 +47,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Servir archivos estáticos
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Servir archivos estáticos (solo cuando los adjuntos están en el disco local)
+if settings.storage_backend == "local":
+    app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 # Incluir routers
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
@@ -57,6 +59,12 @@ app.include_router(gmail_robust.router, prefix="/api/v1/gmail", tags=["gmail"])
 app.include_router(ocr.router, prefix="/api/v1", tags=["ocr"])
 
 
+@app.on_event("shutdown")
+def stop_ocr_executor():
+    """Cerrar el pool de procesos de OCR al apagar la aplicación."""
+    shutdown_ocr_executor()
+
+
 @app.get("/")
 async def root():
     """
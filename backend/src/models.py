@@ -1,10 +1,17 @@
 """
 Modelos de base de datos usando SQLAlchemy.
-Define las tablas users e invoices para el sistema de control de facturas.
+Define las tablas users, invoices, invoice_daily_rollups, export_jobs y ocr_jobs
+para el sistema de control de facturas.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Enum, Text, JSON
-from sqlalchemy.orm import relationship
+from collections import defaultdict
+from datetime import datetime, timezone
+from sqlalchemy import (
+    Column, Integer, String, Date, DateTime, Float, ForeignKey, Enum, Text, JSON, Index, DDL, event, and_, delete,
+    inspect
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import relationship, Session
 from sqlalchemy.sql import func
 from src.database import Base
 import enum
@@ -43,6 +50,22 @@ class InvoiceStatus(str, enum.Enum):
     REJECTED = "rechazada"
 
 
+class ExportJobStatus(str, enum.Enum):
+    """Estados de un trabajo de exportación."""
+    PENDING = "pendiente"
+    RUNNING = "en_proceso"
+    COMPLETED = "completado"
+    FAILED = "fallido"
+
+
+class OCRJobStatus(str, enum.Enum):
+    """Estados de un trabajo de OCR."""
+    PENDING = "pendiente"
+    RUNNING = "en_proceso"
+    COMPLETED = "completado"
+    FAILED = "fallido"
+
+
 class User(Base):
     """Modelo de usuario del sistema."""
     
@@ -56,7 +79,7 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relación con facturas
-    invoices = relationship("Invoice", back_populates="user")
+    invoices = relationship("Invoice", back_populates="user", foreign_keys="Invoice.user_id")
 
 
 class Invoice(Base):
@@ -71,7 +94,8 @@ class Invoice(Base):
     amount = Column(Float, nullable=False)
     payment_method = Column(Enum(PaymentMethod), nullable=False)
     category = Column(Enum(ExpenseCategory), nullable=False)
-    file_path = Column(String(500), nullable=True)  # Ruta del archivo adjunto
+    file_path = Column(String(500), nullable=True, index=True)  # Ruta del archivo adjunto
+    file_sha256 = Column(String(64), nullable=True)  # Hash del contenido del adjunto
     description = Column(Text, nullable=True)
     nit = Column(String(50), nullable=True, index=True)  # Número de identificación tributaria
     status = Column(Enum(InvoiceStatus), nullable=False, default=InvoiceStatus.PENDING)
@@ -80,6 +104,258 @@ class Invoice(Base):
     ocr_confidence = Column(Float, nullable=True)  # Nivel de confianza del OCR
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Validación: momento y usuario que validó o rechazó la factura
+    validated_at = Column(DateTime(timezone=True), nullable=True)
+    validated_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     
     # Relación con usuario
-    user = relationship("User", back_populates="invoices")
+    user = relationship("User", back_populates="invoices", foreign_keys=[user_id])
+    
+    # Índices compuestos para la paginación por cursor sobre (date, id)
+    __table_args__ = (
+        Index("ix_invoices_date_id", "date", "id"),
+        Index("ix_invoices_user_id_date_id", "user_id", "date", "id"),
+        Index("ix_invoices_status_date_id", "status", "date", "id"),
+        Index("ix_invoices_category_date_id", "category", "date", "id"),
+        Index("ix_invoices_payment_method_date_id", "payment_method", "date", "id"),
+        Index("ix_invoices_validated_by_validated_at", "validated_by", "validated_at"),
+        # Actividad reciente del dashboard, global y por colaborador
+        Index("ix_invoices_created_at", "created_at"),
+        Index("ix_invoices_user_id_created_at", "user_id", "created_at"),
+    )
+
+
+
+# Búsqueda de texto completo (solo PostgreSQL): columna tsvector generada sobre
+# proveedor, descripción, NIT y texto OCR, con índice GIN e índices trigram
+# para las búsquedas por subcadena. En otros motores se usa ILIKE.
+INVOICE_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE invoices ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', coalesce(provider, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(nit, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('spanish', coalesce(ocr_data->>'raw_text', '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_invoices_search_vector ON invoices USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_invoices_provider_trgm ON invoices USING gin (provider gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_invoices_description_trgm ON invoices USING gin (description gin_trgm_ops)",
+]
+
+for _statement in INVOICE_SEARCH_DDL:
+    event.listen(Invoice.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+
+class InvoiceDailyRollup(Base):
+    """
+    Totales diarios de facturas por usuario, categoría, método de pago y estado.
+    
+    Se mantiene de forma incremental en cada flush de la sesión (ver
+    `_track_invoice_rollups`) y se reconstruye con
+    `scripts/backfill_invoice_rollups.py`. Las consultas del dashboard leen
+    de esta tabla en lugar de recorrer todas las facturas.
+    """
+    
+    __tablename__ = "invoice_daily_rollups"
+    
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category = Column(Enum(ExpenseCategory), primary_key=True)
+    payment_method = Column(Enum(PaymentMethod), primary_key=True)
+    status = Column(Enum(InvoiceStatus), primary_key=True)
+    invoice_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        Index("ix_invoice_daily_rollups_user_id_day", "user_id", "day"),
+        Index("ix_invoice_daily_rollups_category_day", "category", "day"),
+    )
+
+
+# Columnas de Invoice que determinan la fila del rollup o su monto
+_ROLLUP_ATTRIBUTES = ("date", "user_id", "category", "payment_method", "status", "amount")
+
+
+def _load_previous_value(target, value, oldvalue, initiator) -> None:
+    """Listener vacío: solo activa la carga del valor anterior."""
+
+
+# `active_history` carga el valor anterior antes de asignar un atributo expirado,
+# para poder descontarlo del rollup de origen
+for _name in _ROLLUP_ATTRIBUTES:
+    event.listen(getattr(Invoice, _name), "set", _load_previous_value, active_history=True)
+
+
+def _rollup_day(value, dialect: str):
+    """
+    Día del rollup de una fecha, en la misma zona que usa el SQL de los rollups.
+    
+    En PostgreSQL el SQL toma el día en UTC (`timezone('UTC', date)`), así que
+    una fecha con offset se convierte a UTC antes de tomar el día; las fechas
+    sin zona ya están en UTC porque las conexiones usan `TimeZone=UTC` (ver
+    `src.database`). SQLite guarda la hora local sin el offset y `DATE()` toma
+    ese día, así que allí se descarta el offset.
+    """
+    if not isinstance(value, datetime):
+        return value
+    if value.tzinfo is not None:
+        if dialect == "sqlite":
+            value = value.replace(tzinfo=None)
+        else:
+            value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _rollup_entry(invoice: "Invoice", dialect: str, previous: bool = False):
+    """
+    Clave del rollup y monto de una factura.
+    
+    Con `previous=True` se usan los valores cargados antes de los cambios
+    pendientes del flush; así la fecha guardada y la nueva caen en el mismo
+    día que calcula `rebuild_invoice_rollups`.
+    """
+    state = inspect(invoice)
+    values = {}
+    for name in _ROLLUP_ATTRIBUTES:
+        history = state.attrs[name].history
+        if previous and history.deleted:
+            values[name] = history.deleted[0]
+        else:
+            values[name] = getattr(invoice, name)
+    day = _rollup_day(values["date"], dialect)
+    # El estado puede no estar asignado todavía; se aplica el valor por defecto de la columna
+    invoice_status = values["status"] or InvoiceStatus.PENDING
+    key = (day, values["user_id"], values["category"], values["payment_method"], invoice_status)
+    return key, values["amount"]
+
+
+def _upsert_rollups(connection, deltas) -> None:
+    """Aplicar los incrementos de conteo y monto con INSERT ... ON CONFLICT DO UPDATE."""
+    dialect = connection.dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    table = InvoiceDailyRollup.__table__
+    rows = [
+        {
+            "day": day, "user_id": user_id, "category": category, "payment_method": method,
+            "status": status, "invoice_count": count, "total_amount": amount
+        }
+        for (day, user_id, category, method, status), (count, amount) in deltas.items()
+        if count or amount
+    ]
+    if not rows:
+        return
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.user_id, table.c.category, table.c.payment_method, table.c.status],
+        set_={
+            "invoice_count": table.c.invoice_count + statement.excluded.invoice_count,
+            "total_amount": table.c.total_amount + statement.excluded.total_amount,
+        }
+    )
+    connection.execute(statement, rows)
+    
+    # Eliminar las filas que quedaron sin facturas
+    for row in rows:
+        if row["invoice_count"] < 0:
+            connection.execute(delete(table).where(and_(
+                table.c.day == row["day"],
+                table.c.user_id == row["user_id"],
+                table.c.category == row["category"],
+                table.c.payment_method == row["payment_method"],
+                table.c.status == row["status"],
+                table.c.invoice_count <= 0
+            )))
+
+
+@event.listens_for(Session, "before_flush")
+def _track_invoice_rollups(session, flush_context, instances) -> None:
+    """
+    Mantener `invoice_daily_rollups` con las facturas creadas, modificadas o
+    eliminadas en el flush, dentro de la misma transacción.
+    
+    Las operaciones masivas (`query.update()`/`query.delete()`) no pasan por
+    aquí; después de usarlas hay que reconstruir los rollups.
+    """
+    deltas = defaultdict(lambda: [0, 0.0])
+    dialect = session.get_bind().dialect.name
+    
+    def add(key, count, amount):
+        deltas[key][0] += count
+        deltas[key][1] += amount
+    
+    for obj in session.new:
+        if isinstance(obj, Invoice):
+            key, amount = _rollup_entry(obj, dialect)
+            add(key, 1, amount)
+    for obj in session.deleted:
+        if isinstance(obj, Invoice):
+            key, amount = _rollup_entry(obj, dialect, previous=True)
+            add(key, -1, -amount)
+    for obj in session.dirty:
+        if isinstance(obj, Invoice) and any(
+            inspect(obj).attrs[name].history.has_changes() for name in _ROLLUP_ATTRIBUTES
+        ):
+            old_key, old_amount = _rollup_entry(obj, dialect, previous=True)
+            new_key, new_amount = _rollup_entry(obj, dialect)
+            add(old_key, -1, -old_amount)
+            add(new_key, 1, new_amount)
+    
+    if deltas:
+        _upsert_rollups(session.connection(), {key: tuple(value) for key, value in deltas.items()})
+
+
+class ExportJob(Base):
+    """Trabajo de exportación de facturas a Excel ejecutado en segundo plano."""
+    
+    __tablename__ = "export_jobs"
+    
+    id = Column(String(32), primary_key=True)  # UUID en hexadecimal
+    status = Column(Enum(ExportJobStatus), nullable=False, default=ExportJobStatus.PENDING)
+    filters = Column(JSON, nullable=False)  # Filtros normalizados de la exportación
+    filters_key = Column(String(64), nullable=False)  # Hash de los filtros para reutilizar resultados
+    total_rows = Column(Integer, nullable=True)
+    rows_written = Column(Integer, nullable=False, default=0)
+    file_key = Column(String(500), nullable=True)  # Clave del archivo en el almacén
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=True)  # Último avance del trabajo (latido)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_export_jobs_filters_key_created_at", "filters_key", "created_at"),
+    )
+    
+    @property
+    def progress(self) -> float:
+        """Fracción de filas escritas (0 a 1)."""
+        if self.status == ExportJobStatus.COMPLETED:
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(self.rows_written / self.total_rows, 1.0)
+
+
+class OCRJob(Base):
+    """Trabajo de OCR de una factura ejecutado por un worker de Celery."""
+    
+    __tablename__ = "ocr_jobs"
+    
+    id = Column(String(32), primary_key=True)  # UUID en hexadecimal
+    status = Column(Enum(OCRJobStatus), nullable=False, default=OCRJobStatus.PENDING)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    invoice_id = Column(Integer, ForeignKey("invoices.id", ondelete="SET NULL"), nullable=True, index=True)
+    file_key = Column(String(500), nullable=False)  # Clave del archivo en el almacén
+    result = Column(JSON, nullable=True)  # Datos extraídos por OCR
+    confidence = Column(Float, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    @property
+    def finished(self) -> bool:
+        """Indica si el trabajo ya no cambiará de estado."""
+        return self.status in (OCRJobStatus.COMPLETED, OCRJobStatus.FAILED)
@@ -3,18 +3,45 @@ Router para endpoints del dashboard.
 Proporciona estadísticas y métricas para el dashboard principal.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Dict, Any, Optional
+from datetime import date
 
 from src.database import get_db
-from src.services.dashboard_stats import get_dashboard_stats
+from src.models import ExpenseCategory
+from src.services.dashboard_cache import get_dashboard_cache
+from src.services.dashboard_stats import DashboardScope, DashboardStatsService, get_dashboard_stats
 
 router = APIRouter(tags=["dashboard"])
 
 
+def get_dashboard_scope(
+    start_date: Optional[date] = Query(None, description="Primer día incluido"),
+    end_date: Optional[date] = Query(None, description="Último día incluido"),
+    user_id: Optional[int] = Query(None, description="Limitar a un colaborador"),
+    category: Optional[ExpenseCategory] = Query(None, description="Limitar a una categoría"),
+) -> DashboardScope:
+    """
+    Construir el alcance de las estadísticas a partir de los parámetros.
+    
+    Raises:
+        HTTPException: Si el rango de fechas es inválido
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de inicio debe ser anterior o igual a la fecha de fin"
+        )
+    return DashboardScope(start_date=start_date, end_date=end_date, user_id=user_id, category=category)
+
+
 @router.get("/stats", response_model=Dict[str, Any])
-async def get_dashboard_statistics(db: Session = Depends(get_db)):
+async def get_dashboard_statistics(
+    scope: DashboardScope = Depends(get_dashboard_scope),
+    db: Session = Depends(get_db)
+):
     """
     Obtener estadísticas completas del dashboard.
     
@@ -27,7 +54,12 @@ async def get_dashboard_statistics(db: Session = Depends(get_db)):
     - Rendimiento de validación
     - Actividad reciente
     
+    Las secciones se calculan en paralelo con sesiones propias; si alguna
+    supera el tiempo máximo o falla, se devuelve como null, `partial` es
+    true y `section_errors` indica el motivo por sección.
+    
     Args:
+        scope: Alcance (start_date, end_date, user_id, category)
         db: Sesión de base de datos
         
     Returns:
@@ -37,7 +69,8 @@ async def get_dashboard_statistics(db: Session = Depends(get_db)):
         HTTPException: Si hay error al obtener las estadísticas
     """
     try:
-        stats = get_dashboard_stats(db)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+        stats = await run_in_threadpool(get_dashboard_stats, session_factory, None, scope)
         return stats
     except Exception as e:
         raise HTTPException(
@@ -47,19 +80,22 @@ async def get_dashboard_statistics(db: Session = Depends(get_db)):
 
 
 @router.get("/basic-stats", response_model=Dict[str, Any])
-async def get_basic_statistics(db: Session = Depends(get_db)):
+def get_basic_statistics(
+    scope: DashboardScope = Depends(get_dashboard_scope),
+    db: Session = Depends(get_db)
+):
     """
     Obtener solo las estadísticas básicas del dashboard.
     
     Args:
+        scope: Alcance (start_date, end_date, user_id, category)
         db: Sesión de base de datos
         
     Returns:
         Dict con estadísticas básicas
     """
     try:
-        from src.services.dashboard_stats import DashboardStatsService
-        service = DashboardStatsService(db)
+        service = DashboardStatsService(db, scope)
         return service.get_basic_stats()
     except Exception as e:
         raise HTTPException(
@@ -69,20 +105,24 @@ async def get_basic_statistics(db: Session = Depends(get_db)):
 
 
 @router.get("/trends", response_model=Dict[str, Any])
-async def get_monthly_trends(months: int = 6, db: Session = Depends(get_db)):
+def get_monthly_trends(
+    months: int = 6,
+    scope: DashboardScope = Depends(get_dashboard_scope),
+    db: Session = Depends(get_db)
+):
     """
     Obtener tendencias mensuales de facturas.
     
     Args:
         months: Número de meses a incluir (default: 6)
+        scope: Alcance (start_date, end_date, user_id, category)
         db: Sesión de base de datos
         
     Returns:
         Dict con tendencias mensuales
     """
     try:
-        from src.services.dashboard_stats import DashboardStatsService
-        service = DashboardStatsService(db)
+        service = DashboardStatsService(db, scope)
         trends = service.get_monthly_trends(months)
         return {"trends": trends}
     except Exception as e:
@@ -93,20 +133,24 @@ async def get_monthly_trends(months: int = 6, db: Session = Depends(get_db)):
 
 
 @router.get("/user-stats", response_model=Dict[str, Any])
-async def get_user_statistics(limit: int = 10, db: Session = Depends(get_db)):
+def get_user_statistics(
+    limit: int = 10,
+    scope: DashboardScope = Depends(get_dashboard_scope),
+    db: Session = Depends(get_db)
+):
     """
     Obtener estadísticas por usuario.
     
     Args:
         limit: Número máximo de usuarios a retornar (default: 10)
+        scope: Alcance (start_date, end_date, user_id, category)
         db: Sesión de base de datos
         
     Returns:
         Dict con estadísticas por usuario
     """
     try:
-        from src.services.dashboard_stats import DashboardStatsService
-        service = DashboardStatsService(db)
+        service = DashboardStatsService(db, scope)
         user_stats = service.get_user_stats(limit)
         return {"user_stats": user_stats}
     except Exception as e:
@@ -117,19 +161,22 @@ async def get_user_statistics(limit: int = 10, db: Session = Depends(get_db)):
 
 
 @router.get("/category-distribution", response_model=Dict[str, Any])
-async def get_category_distribution(db: Session = Depends(get_db)):
+def get_category_distribution(
+    scope: DashboardScope = Depends(get_dashboard_scope),
+    db: Session = Depends(get_db)
+):
     """
     Obtener distribución de facturas por categoría.
     
     Args:
+        scope: Alcance (start_date, end_date, user_id, category)
         db: Sesión de base de datos
         
     Returns:
         Dict con distribución por categoría
     """
     try:
-        from src.services.dashboard_stats import DashboardStatsService
-        service = DashboardStatsService(db)
+        service = DashboardStatsService(db, scope)
         distribution = service.get_category_distribution()
         return {"category_distribution": distribution}
     except Exception as e:
@@ -140,19 +187,22 @@ async def get_category_distribution(db: Session = Depends(get_db)):
 
 
 @router.get("/payment-method-distribution", response_model=Dict[str, Any])
-async def get_payment_method_distribution(db: Session = Depends(get_db)):
+def get_payment_method_distribution(
+    scope: DashboardScope = Depends(get_dashboard_scope),
+    db: Session = Depends(get_db)
+):
     """
     Obtener distribución de facturas por método de pago.
     
     Args:
+        scope: Alcance (start_date, end_date, user_id, category)
         db: Sesión de base de datos
         
     Returns:
         Dict con distribución por método de pago
     """
     try:
-        from src.services.dashboard_stats import DashboardStatsService
-        service = DashboardStatsService(db)
+        service = DashboardStatsService(db, scope)
         distribution = service.get_payment_method_distribution()
         return {"payment_method_distribution": distribution}
     except Exception as e:
@@ -163,19 +213,22 @@ async def get_payment_method_distribution(db: Session = Depends(get_db)):
 
 
 @router.get("/validation-performance", response_model=Dict[str, Any])
-async def get_validation_performance(db: Session = Depends(get_db)):
+def get_validation_performance(
+    scope: DashboardScope = Depends(get_dashboard_scope),
+    db: Session = Depends(get_db)
+):
     """
     Obtener métricas de rendimiento de validación.
     
     Args:
+        scope: Alcance (start_date, end_date, user_id, category)
         db: Sesión de base de datos
         
     Returns:
         Dict con métricas de validación
     """
     try:
-        from src.services.dashboard_stats import DashboardStatsService
-        service = DashboardStatsService(db)
+        service = DashboardStatsService(db, scope)
         performance = service.get_validation_performance()
         return {"validation_performance": performance}
     except Exception as e:
@@ -186,20 +239,24 @@ async def get_validation_performance(db: Session = Depends(get_db)):
 
 
 @router.get("/recent-activity", response_model=Dict[str, Any])
-async def get_recent_activity(limit: int = 10, db: Session = Depends(get_db)):
+def get_recent_activity(
+    limit: int = 10,
+    scope: DashboardScope = Depends(get_dashboard_scope),
+    db: Session = Depends(get_db)
+):
     """
     Obtener actividad reciente del sistema.
     
     Args:
         limit: Número máximo de actividades a retornar (default: 10)
+        scope: Alcance (start_date, end_date, user_id, category)
         db: Sesión de base de datos
         
     Returns:
         Dict con actividad reciente
     """
     try:
-        from src.services.dashboard_stats import DashboardStatsService
-        service = DashboardStatsService(db)
+        service = DashboardStatsService(db, scope)
         activity = service.get_recent_activity(limit)
         return {"recent_activity": activity}
     except Exception as e:
@@ -207,3 +264,24 @@ async def get_recent_activity(limit: int = 10, db: Session = Depends(get_db)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al obtener actividad reciente: {str(e)}"
         )
+
+
+@router.get("/cache-stats", response_model=Dict[str, Any])
+async def get_cache_statistics():
+    """
+    Obtener los contadores de la caché de estadísticas del dashboard.
+    
+    Con el backend de Redis los contadores son de esta instancia y no se
+    informa el número de entradas.
+    
+    Returns:
+        Dict con el backend, entradas, aciertos, fallos y tasa de aciertos
+    """
+    cache = get_dashboard_cache()
+    stats = cache.get_stats()
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        "backend": cache.name,
+        **stats,
+        "hit_rate": round(stats["hits"] / lookups * 100, 2) if lookups else 0
+    }
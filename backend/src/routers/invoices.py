@@ -3,22 +3,39 @@ Router para endpoints de facturas.
 Maneja la carga, consulta, actualización y exportación de facturas.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Form
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File, Query, Form, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, joinedload, sessionmaker
+from sqlalchemy import and_, or_, tuple_
 from typing import List, Optional
+import logging
 import os
-import uuid
-from datetime import datetime
+import tempfile
+from datetime import datetime, timezone
 
 from src.database import get_db, settings
-from src.models import Invoice, User, InvoiceStatus, ExpenseCategory, PaymentMethod
+from src.models import Invoice, User, InvoiceStatus, ExpenseCategory, PaymentMethod, ExportJob, ExportJobStatus
 from src.schemas import (
     InvoiceCreate, InvoiceUpdate, Invoice as InvoiceSchema, 
-    InvoiceFilters, PaginatedResponse, ExportParams, MessageResponse
+    InvoiceFilters, PaginatedResponse, ExportParams, MessageResponse, ExportJob as ExportJobSchema
 )
-from src.services.excel_export import export_invoices_to_excel
+from src.services.excel_export import (
+    export_invoices_to_excel, write_invoices_workbook, invoice_export_query, export_totals, iter_export_rows,
+    summarize_invoices, write_invoices_summary_workbook
+)
+from src.services.attachment_storage import store_upload, release_file, get_storage_backend, FileTooLargeError
+from src.services.pagination import encode_cursor, decode_cursor
+from src.services.file_response import AttachmentResponse, make_etag
+from src.services.invoice_search import apply_invoice_filters, search_rank
+from src.services.export_jobs import submit_export_job, run_export_job
+from src.services.stream_export import stream_export, MEDIA_TYPES as STREAM_MEDIA_TYPES
+from src.services.columnar_export import COLUMNAR_WRITERS, MEDIA_TYPES as COLUMNAR_MEDIA_TYPES
+from src.services.count_cache import invoice_count_cache, estimate_count, ESTIMATE_EXACT_THRESHOLD
+from src.services.dashboard_cache import invalidate_dashboard_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -72,6 +89,7 @@ async def upload_invoice(
     
     # Manejar archivo adjunto si se proporciona
     file_path = None
+    file_sha256 = None
     if file:
         # Validar tipo de archivo
         allowed_extensions = {'.pdf', '.jpg', '.jpeg', '.png', '.xlsx', '.xls'}
@@ -83,22 +101,21 @@ async def upload_invoice(
                 detail="Tipo de archivo no permitido. Use PDF, JPG, PNG o Excel"
             )
         
-        # Validar tamaño del archivo
-        file_content = await file.read()
-        if len(file_content) > settings.max_file_size:
+        # Guardar archivo por bloques (deduplicado por contenido) validando el tamaño
+        try:
+            stored = await store_upload(
+                file,
+                suffix=file_extension,
+                max_size=settings.max_file_size,
+                db=db
+            )
+        except FileTooLargeError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"El archivo es demasiado grande. Máximo {settings.max_file_size} bytes"
             )
-        
-        # Generar nombre único para el archivo
-        file_id = str(uuid.uuid4())
-        file_path = f"{settings.upload_dir}/{file_id}{file_extension}"
-        
-        # Guardar archivo
-        os.makedirs(settings.upload_dir, exist_ok=True)
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
+        file_path = stored.path
+        file_sha256 = stored.sha256
     
     # Crear factura
     invoice_data = InvoiceCreate(
@@ -111,14 +128,65 @@ async def upload_invoice(
         description=description
     )
     
-    db_invoice = Invoice(**invoice_data.dict(), file_path=file_path)
+    db_invoice = Invoice(
+        **invoice_data.dict(),
+        file_path=file_path,
+        file_sha256=file_sha256
+    )
     db.add(db_invoice)
     db.commit()
     db.refresh(db_invoice)
+    invoice_count_cache.invalidate()
+    await run_in_threadpool(invalidate_dashboard_cache)
     
     return db_invoice
 
 
+def _count_invoices(db: Session, query, filters: dict, estimate: bool = False):
+    """
+    Contar las facturas de una consulta usando la caché de totales.
+    
+    La caché consulta la generación compartida (Redis) y el conteo va a la
+    base de datos: se ejecuta en el threadpool, fuera del event loop.
+    
+    Args:
+        db: Sesión de base de datos
+        query: Consulta ya filtrada
+        filters: Filtros aplicados (clave de la caché)
+        estimate: Usar la estimación del planificador para consultas amplias
+        
+    Returns:
+        Tuple con el total y si se trata de una estimación
+    """
+    if estimate:
+        estimated = estimate_count(db, query)
+        if estimated is not None and estimated >= ESTIMATE_EXACT_THRESHOLD:
+            return estimated, True
+    
+    total = invoice_count_cache.get(filters)
+    if total is None:
+        generation = invoice_count_cache.generation()
+        total = query.count()
+        invoice_count_cache.set(filters, total, generation)
+    return total, False
+
+
+def _parse_cursor(cursor: str):
+    """
+    Decodificar el cursor de paginación recibido del cliente.
+    
+    Raises:
+        HTTPException: Si el cursor no es válido
+    """
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
+
+
 @router.get("/", response_model=PaginatedResponse)
 async def get_invoices(
     page: int = Query(1, ge=1, description="Número de página"),
@@ -130,14 +198,23 @@ async def get_invoices(
     start_date: Optional[datetime] = Query(None, description="Fecha de inicio"),
     end_date: Optional[datetime] = Query(None, description="Fecha de fin"),
     provider: Optional[str] = Query(None, description="Filtrar por proveedor"),
-    search_text: Optional[str] = Query(None, description="Búsqueda por texto en proveedor o descripción"),
+    search_text: Optional[str] = Query(None, description="Búsqueda por texto en proveedor, descripción, NIT o texto OCR"),
+    pagination: str = Query("offset", pattern="^(offset|cursor)$", description="Modo de paginación: offset o cursor"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor (activa el modo cursor)"),
+    include_total: Optional[bool] = Query(None, description="Calcular el total de registros (por defecto solo en modo offset)"),
+    estimate: bool = Query(False, description="Usar un total aproximado del planificador para consultas amplias"),
     db: Session = Depends(get_db)
 ):
     """
     Obtener facturas con filtros y paginación.
     
+    En modo offset se pagina con `page`/`size` y, si hay `search_text`, los
+    resultados se ordenan por relevancia. En modo cursor las facturas se
+    ordenan por `(date, id)` descendente y cada página devuelve `next_cursor`
+    para pedir la siguiente sin recorrer las filas anteriores.
+    
     Args:
-        page: Número de página
+        page: Número de página (solo modo offset)
         size: Tamaño de página
         user_id: Filtrar por usuario
         status: Filtrar por estado
@@ -146,56 +223,130 @@ async def get_invoices(
         start_date: Fecha de inicio
         end_date: Fecha de fin
         provider: Filtrar por proveedor
+        search_text: Búsqueda por texto en proveedor, descripción, NIT o texto OCR
+        pagination: Modo de paginación (offset o cursor)
+        cursor: Cursor de la página anterior
+        include_total: Si se debe contar el total de registros
+        estimate: Si se acepta un total aproximado
         db: Sesión de base de datos
         
     Returns:
         PaginatedResponse: Facturas paginadas
     """
-    # Construir query base
-    query = db.query(Invoice)
-    
-    # Aplicar filtros
-    if user_id:
-        query = query.filter(Invoice.user_id == user_id)
-    if status:
-        query = query.filter(Invoice.status == status)
-    if category:
-        query = query.filter(Invoice.category == category)
-    if payment_method:
-        query = query.filter(Invoice.payment_method == payment_method)
-    if start_date:
-        query = query.filter(Invoice.date >= start_date)
-    if end_date:
-        query = query.filter(Invoice.date <= end_date)
-    if provider:
-        query = query.filter(Invoice.provider.ilike(f"%{provider}%"))
-    if search_text:
-        # Búsqueda por texto en proveedor o descripción
-        search_filter = f"%{search_text}%"
-        query = query.filter(
-            (Invoice.provider.ilike(search_filter)) |
-            (Invoice.description.ilike(search_filter))
-        )
+    # Construir query base con filtros
+    filters = {
+        "user_id": user_id,
+        "status": status,
+        "category": category,
+        "payment_method": payment_method,
+        "start_date": start_date,
+        "end_date": end_date,
+        "provider": provider,
+        "search_text": search_text,
+    }
+    query = apply_invoice_filters(db.query(Invoice), **filters)
+    
+    cursor_mode = pagination == "cursor" or cursor is not None
+    if include_total is None:
+        include_total = not cursor_mode
     
-    # Contar total de registros
-    total = query.count()
+    # Contar total de registros solo si se solicita (con caché por filtros)
+    total, total_is_estimate = None, False
+    if include_total:
+        total, total_is_estimate = await run_in_threadpool(_count_invoices, db, query, filters, estimate)
+    pages = (total + size - 1) // size if total is not None else None
+    
+    if not cursor_mode:
+        # Ordenar por relevancia cuando hay búsqueda de texto (solo PostgreSQL)
+        rank = search_rank(query, search_text) if search_text else None
+        if rank is not None:
+            query = query.order_by(rank.desc(), Invoice.date.desc(), Invoice.id.desc())
+        
+        # Aplicar paginación
+        offset = (page - 1) * size
+        invoices = query.options(joinedload(Invoice.user)).offset(offset).limit(size).all()
+        
+        return PaginatedResponse(
+            items=invoices,
+            total=total,
+            page=page,
+            size=size,
+            pages=pages,
+            total_is_estimate=total_is_estimate
+        )
     
-    # Aplicar paginación
-    offset = (page - 1) * size
-    invoices = query.offset(offset).limit(size).all()
+    # Paginación por cursor (keyset) sobre el índice (date, id)
+    if cursor:
+        last_date, last_id = _parse_cursor(cursor)
+        query = query.filter(tuple_(Invoice.date, Invoice.id) < tuple_(last_date, last_id))
     
-    # Calcular número de páginas
-    pages = (total + size - 1) // size
+    rows = query.options(joinedload(Invoice.user)).order_by(
+        Invoice.date.desc(), Invoice.id.desc()
+    ).limit(size + 1).all()
+    invoices = rows[:size]
+    next_cursor = None
+    if len(rows) > size:
+        next_cursor = encode_cursor(invoices[-1].date, invoices[-1].id)
     
     return PaginatedResponse(
         items=invoices,
         total=total,
         page=page,
         size=size,
-        pages=pages
+        pages=pages,
+        next_cursor=next_cursor,
+        total_is_estimate=total_is_estimate
     )
 
 
+@router.get("/count")
+async def count_invoices(
+    user_id: Optional[int] = Query(None, description="Filtrar por usuario"),
+    status: Optional[InvoiceStatus] = Query(None, description="Filtrar por estado"),
+    category: Optional[ExpenseCategory] = Query(None, description="Filtrar por categoría"),
+    payment_method: Optional[PaymentMethod] = Query(None, description="Filtrar por método de pago"),
+    start_date: Optional[datetime] = Query(None, description="Fecha de inicio"),
+    end_date: Optional[datetime] = Query(None, description="Fecha de fin"),
+    provider: Optional[str] = Query(None, description="Filtrar por proveedor"),
+    search_text: Optional[str] = Query(None, description="Búsqueda por texto en proveedor, descripción, NIT o texto OCR"),
+    estimate: bool = Query(False, description="Usar un total aproximado del planificador para consultas amplias"),
+    db: Session = Depends(get_db)
+):
+    """
+    Contar las facturas que cumplen los filtros.
+    
+    Permite a los clientes en modo cursor pedir el total por separado.
+    
+    Args:
+        user_id: Filtrar por usuario
+        status: Filtrar por estado
+        category: Filtrar por categoría
+        payment_method: Filtrar por método de pago
+        start_date: Fecha de inicio
+        end_date: Fecha de fin
+        provider: Filtrar por proveedor
+        search_text: Búsqueda por texto en proveedor, descripción, NIT o texto OCR
+        estimate: Si se acepta un total aproximado
+        db: Sesión de base de datos
+        
+    Returns:
+        dict: Total de facturas y si es una estimación
+    """
+    filters = {
+        "user_id": user_id,
+        "status": status,
+        "category": category,
+        "payment_method": payment_method,
+        "start_date": start_date,
+        "end_date": end_date,
+        "provider": provider,
+        "search_text": search_text,
+    }
+    query = apply_invoice_filters(db.query(Invoice), **filters)
+    total, is_estimate = await run_in_threadpool(_count_invoices, db, query, filters, estimate)
+    return {"total": total, "total_is_estimate": is_estimate}
+
+
 @router.get("/{invoice_id}", response_model=InvoiceSchema)
 async def get_invoice(invoice_id: int, db: Session = Depends(get_db)):
     """
@@ -211,7 +362,7 @@ async def get_invoice(invoice_id: int, db: Session = Depends(get_db)):
     Raises:
         HTTPException: Si la factura no existe
     """
-    invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    invoice = db.query(Invoice).options(joinedload(Invoice.user)).filter(Invoice.id == invoice_id).first()
     if not invoice:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -261,6 +412,8 @@ async def update_invoice(
     
     db.commit()
     db.refresh(invoice)
+    invoice_count_cache.invalidate()
+    await run_in_threadpool(invalidate_dashboard_cache)
     
     return invoice
 
@@ -270,7 +423,8 @@ async def export_invoices_excel(
     user_id: Optional[int] = Query(None, description="Filtrar por usuario"),
     start_date: Optional[datetime] = Query(None, description="Fecha de inicio"),
     end_date: Optional[datetime] = Query(None, description="Fecha de fin"),
-    status: Optional[InvoiceStatus] = Query(None, description="Filtrar por estado"),
+    invoice_status: Optional[InvoiceStatus] = Query(None, alias="status", description="Filtrar por estado"),
+    download: bool = Query(False, description="Enviar el archivo en la respuesta en lugar de guardarlo en el servidor"),
     db: Session = Depends(get_db)
 ):
     """
@@ -280,43 +434,407 @@ async def export_invoices_excel(
         user_id: Filtrar por usuario
         start_date: Fecha de inicio
         end_date: Fecha de fin
-        status: Filtrar por estado
+        invoice_status: Filtrar por estado
+        download: Si es True, el archivo se envía al cliente y no se conserva
         db: Sesión de base de datos
         
     Returns:
-        FileResponse: Archivo Excel con las facturas
+        dict con la ruta del archivo generado, o FileResponse con el archivo si `download`
         
     Raises:
         HTTPException: Si no hay facturas para exportar
     """
-    # Construir query con filtros
-    query = db.query(Invoice)
-    
-    if user_id:
-        query = query.filter(Invoice.user_id == user_id)
-    if start_date:
-        query = query.filter(Invoice.date >= start_date)
-    if end_date:
-        query = query.filter(Invoice.date <= end_date)
-    if status:
-        query = query.filter(Invoice.status == status)
-    
-    invoices = query.all()
+    # Consulta de tuplas con solo las columnas exportadas
+    query = apply_invoice_filters(
+        invoice_export_query(db),
+        user_id=user_id,
+        status=invoice_status,
+        start_date=start_date,
+        end_date=end_date
+    )
     
-    if not invoices:
+    # Número de facturas y total en SQL, sin cargar las filas
+    totals = export_totals(query)
+    if not totals.count:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No hay facturas para exportar con los filtros especificados"
         )
     
+    # Las filas se leen por lotes mientras se escribe el libro
+    rows = iter_export_rows(query)
+    
+    if download:
+        # Escribir en un archivo temporal y enviarlo; se elimina al terminar la respuesta
+        fd, temp_path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        try:
+            await run_in_threadpool(write_invoices_workbook, rows, temp_path, totals.amount)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        filename = f"facturas_boosting_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        return FileResponse(
+            path=temp_path,
+            filename=filename,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            background=BackgroundTask(os.remove, temp_path)
+        )
+    
     # Generar archivo Excel
-    file_path = export_invoices_to_excel(invoices)
+    file_path = await run_in_threadpool(export_invoices_to_excel, rows, totals.amount)
     
     return {
         "message": "Archivo Excel generado exitosamente",
         "file_path": file_path,
-        "total_invoices": len(invoices)
+        "total_invoices": totals.count
+    }
+
+
+@router.get("/export/summary")
+async def export_invoices_summary(
+    user_id: Optional[int] = Query(None, description="Filtrar por usuario"),
+    start_date: Optional[datetime] = Query(None, description="Fecha de inicio"),
+    end_date: Optional[datetime] = Query(None, description="Fecha de fin"),
+    invoice_status: Optional[InvoiceStatus] = Query(None, alias="status", description="Filtrar por estado"),
+    db: Session = Depends(get_db)
+):
+    """
+    Exportar el resumen de facturas a Excel.
+    
+    Incluye hojas por usuario, por categoría, por usuario y mes, y por
+    categoría y método de pago, calculadas con `GROUP BY` en la base de datos.
+    
+    Args:
+        user_id: Filtrar por usuario
+        start_date: Fecha de inicio
+        end_date: Fecha de fin
+        invoice_status: Filtrar por estado
+        db: Sesión de base de datos
+        
+    Returns:
+        FileResponse: Archivo Excel con el resumen
+        
+    Raises:
+        HTTPException: Si no hay facturas para exportar
+    """
+    query = apply_invoice_filters(
+        invoice_export_query(db),
+        user_id=user_id,
+        status=invoice_status,
+        start_date=start_date,
+        end_date=end_date
+    )
+    summary = await run_in_threadpool(summarize_invoices, query)
+    
+    if not summary.by_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No hay facturas para exportar con los filtros especificados"
+        )
+    
+    fd, temp_path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await run_in_threadpool(write_invoices_summary_workbook, summary, temp_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    
+    filename = f"resumen_facturas_boosting_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return FileResponse(
+        path=temp_path,
+        filename=filename,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        background=BackgroundTask(os.remove, temp_path)
+    )
+
+
+def _stream_invoice_export(
+    export_format: str,
+    request: Request,
+    db: Session,
+    user_id: Optional[int],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    invoice_status: Optional[InvoiceStatus]
+) -> StreamingResponse:
+    """Construir la respuesta en flujo de una exportación CSV o NDJSON."""
+    def build_rows(session: Session):
+        query = apply_invoice_filters(
+            invoice_export_query(session),
+            user_id=user_id,
+            status=invoice_status,
+            start_date=start_date,
+            end_date=end_date
+        )
+        return iter_export_rows(query)
+    
+    # Comprimir con gzip si el cliente lo acepta
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    filename = f"facturas_boosting_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(
+        stream_export(export_format, sessionmaker(bind=db.get_bind()), build_rows, compress=compress),
+        media_type=STREAM_MEDIA_TYPES[export_format],
+        headers=headers
+    )
+
+
+@router.get("/export/csv")
+async def export_invoices_csv(
+    request: Request,
+    user_id: Optional[int] = Query(None, description="Filtrar por usuario"),
+    start_date: Optional[datetime] = Query(None, description="Fecha de inicio"),
+    end_date: Optional[datetime] = Query(None, description="Fecha de fin"),
+    invoice_status: Optional[InvoiceStatus] = Query(None, alias="status", description="Filtrar por estado"),
+    db: Session = Depends(get_db)
+):
+    """
+    Exportar facturas a CSV en flujo.
+    
+    Las filas se envían a medida que salen del cursor de la base de datos y se
+    comprimen con gzip si el cliente envía `Accept-Encoding: gzip`.
+    
+    Args:
+        request: Petición HTTP (negociación de compresión)
+        user_id: Filtrar por usuario
+        start_date: Fecha de inicio
+        end_date: Fecha de fin
+        invoice_status: Filtrar por estado
+        db: Sesión de base de datos
+        
+    Returns:
+        StreamingResponse: Archivo CSV
+    """
+    return _stream_invoice_export("csv", request, db, user_id, start_date, end_date, invoice_status)
+
+
+@router.get("/export/ndjson")
+async def export_invoices_ndjson(
+    request: Request,
+    user_id: Optional[int] = Query(None, description="Filtrar por usuario"),
+    start_date: Optional[datetime] = Query(None, description="Fecha de inicio"),
+    end_date: Optional[datetime] = Query(None, description="Fecha de fin"),
+    invoice_status: Optional[InvoiceStatus] = Query(None, alias="status", description="Filtrar por estado"),
+    db: Session = Depends(get_db)
+):
+    """
+    Exportar facturas a NDJSON (un objeto JSON por línea) en flujo.
+    
+    Args:
+        request: Petición HTTP (negociación de compresión)
+        user_id: Filtrar por usuario
+        start_date: Fecha de inicio
+        end_date: Fecha de fin
+        invoice_status: Filtrar por estado
+        db: Sesión de base de datos
+        
+    Returns:
+        StreamingResponse: Archivo NDJSON
+    """
+    return _stream_invoice_export("ndjson", request, db, user_id, start_date, end_date, invoice_status)
+
+
+async def _columnar_invoice_export(
+    export_format: str,
+    db: Session,
+    user_id: Optional[int],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    invoice_status: Optional[InvoiceStatus]
+) -> FileResponse:
+    """Escribir una exportación columnar en un archivo temporal y enviarlo."""
+    query = apply_invoice_filters(
+        invoice_export_query(db),
+        user_id=user_id,
+        status=invoice_status,
+        start_date=start_date,
+        end_date=end_date
+    )
+    
+    fd, temp_path = tempfile.mkstemp(suffix=f".{export_format}")
+    os.close(fd)
+    try:
+        await run_in_threadpool(COLUMNAR_WRITERS[export_format], iter_export_rows(query), temp_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    
+    filename = f"facturas_boosting_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return FileResponse(
+        path=temp_path,
+        filename=filename,
+        media_type=COLUMNAR_MEDIA_TYPES[export_format],
+        background=BackgroundTask(os.remove, temp_path)
+    )
+
+
+@router.get("/export/parquet")
+async def export_invoices_parquet(
+    user_id: Optional[int] = Query(None, description="Filtrar por usuario"),
+    start_date: Optional[datetime] = Query(None, description="Fecha de inicio"),
+    end_date: Optional[datetime] = Query(None, description="Fecha de fin"),
+    invoice_status: Optional[InvoiceStatus] = Query(None, alias="status", description="Filtrar por estado"),
+    db: Session = Depends(get_db)
+):
+    """
+    Exportar facturas a Parquet con columnas tipadas.
+    
+    Args:
+        user_id: Filtrar por usuario
+        start_date: Fecha de inicio
+        end_date: Fecha de fin
+        invoice_status: Filtrar por estado
+        db: Sesión de base de datos
+        
+    Returns:
+        FileResponse: Archivo Parquet
+    """
+    return await _columnar_invoice_export("parquet", db, user_id, start_date, end_date, invoice_status)
+
+
+@router.get("/export/arrow")
+async def export_invoices_arrow(
+    user_id: Optional[int] = Query(None, description="Filtrar por usuario"),
+    start_date: Optional[datetime] = Query(None, description="Fecha de inicio"),
+    end_date: Optional[datetime] = Query(None, description="Fecha de fin"),
+    invoice_status: Optional[InvoiceStatus] = Query(None, alias="status", description="Filtrar por estado"),
+    db: Session = Depends(get_db)
+):
+    """
+    Exportar facturas en formato de archivo Arrow IPC con columnas tipadas.
+    
+    Args:
+        user_id: Filtrar por usuario
+        start_date: Fecha de inicio
+        end_date: Fecha de fin
+        invoice_status: Filtrar por estado
+        db: Sesión de base de datos
+        
+    Returns:
+        FileResponse: Archivo Arrow IPC
+    """
+    return await _columnar_invoice_export("arrow", db, user_id, start_date, end_date, invoice_status)
+
+
+@router.post("/export/jobs", response_model=ExportJobSchema, status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(
+    background_tasks: BackgroundTasks,
+    response: Response,
+    user_id: Optional[int] = Query(None, description="Filtrar por usuario"),
+    start_date: Optional[datetime] = Query(None, description="Fecha de inicio"),
+    end_date: Optional[datetime] = Query(None, description="Fecha de fin"),
+    invoice_status: Optional[InvoiceStatus] = Query(None, alias="status", description="Filtrar por estado"),
+    db: Session = Depends(get_db)
+):
+    """
+    Crear un trabajo de exportación a Excel en segundo plano.
+    
+    Si en la ventana de frescura ya existe un trabajo con los mismos filtros,
+    se devuelve ese trabajo (200) en lugar de generar otro archivo.
+    
+    Args:
+        background_tasks: Tareas en segundo plano de la petición
+        response: Respuesta HTTP (para ajustar el código de estado)
+        user_id: Filtrar por usuario
+        start_date: Fecha de inicio
+        end_date: Fecha de fin
+        invoice_status: Filtrar por estado
+        db: Sesión de base de datos
+        
+    Returns:
+        ExportJobSchema: Trabajo creado o reutilizado
+    """
+    filters = {
+        "user_id": user_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "status": invoice_status,
     }
+    job, reused = submit_export_job(db, filters)
+    
+    if reused:
+        response.status_code = status.HTTP_200_OK
+    else:
+        background_tasks.add_task(run_export_job, job.id, sessionmaker(bind=db.get_bind()))
+    
+    result = ExportJobSchema.model_validate(job)
+    result.reused = reused
+    return result
+
+
+def _get_export_job(db: Session, job_id: str) -> ExportJob:
+    """Obtener un trabajo de exportación o responder 404."""
+    job = db.get(ExportJob, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo de exportación no encontrado"
+        )
+    return job
+
+
+@router.get("/export/jobs/{job_id}", response_model=ExportJobSchema)
+async def get_export_job(job_id: str, db: Session = Depends(get_db)):
+    """
+    Consultar el estado y el progreso de un trabajo de exportación.
+    
+    Args:
+        job_id: ID del trabajo
+        db: Sesión de base de datos
+        
+    Returns:
+        ExportJobSchema: Estado, filas escritas y total de filas
+        
+    Raises:
+        HTTPException: Si el trabajo no existe
+    """
+    return _get_export_job(db, job_id)
+
+
+@router.get("/export/jobs/{job_id}/download")
+async def download_export_job(job_id: str, db: Session = Depends(get_db)):
+    """
+    Descargar el archivo de un trabajo de exportación terminado.
+    
+    Args:
+        job_id: ID del trabajo
+        db: Sesión de base de datos
+        
+    Returns:
+        FileResponse con el archivo Excel, o redirección a una URL prefirmada
+        
+    Raises:
+        HTTPException: Si el trabajo no existe, no ha terminado o su archivo ya no existe
+    """
+    job = _get_export_job(db, job_id)
+    if job.status != ExportJobStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"La exportación no está disponible (estado: {job.status.value})"
+        )
+    
+    storage = get_storage_backend()
+    if not await run_in_threadpool(storage.exists, job.file_key):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="El archivo de la exportación ya no está disponible"
+        )
+    
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    filename = f"facturas_boosting_{job.id}.xlsx"
+    download_url = storage.download_url(job.file_key, filename, media_type)
+    if download_url:
+        return RedirectResponse(download_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    
+    return FileResponse(path=storage.local_path(job.file_key), filename=filename, media_type=media_type)
 
 
 @router.patch("/{invoice_id}/validate", response_model=InvoiceSchema)
@@ -324,22 +842,27 @@ async def validate_invoice(
     invoice_id: int,
     new_status: InvoiceStatus = Form(...),
     validation_notes: Optional[str] = Form(None),
+    validated_by: Optional[int] = Form(None),
     db: Session = Depends(get_db)
 ):
     """
     Validar o rechazar una factura.
     
+    Registra el momento de la validación y, si se indica, el usuario que
+    la realizó, para las métricas de tiempo de validación del dashboard.
+    
     Args:
         invoice_id: ID de la factura a validar
         new_status: Nuevo estado (validada o rechazada)
         validation_notes: Notas de validación (opcional)
+        validated_by: ID del usuario que valida (opcional)
         db: Sesión de base de datos
         
     Returns:
         InvoiceSchema: Factura actualizada
         
     Raises:
-        HTTPException: Si la factura no existe o el estado es inválido
+        HTTPException: Si la factura o el validador no existen o el estado es inválido
     """
     invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
     if not invoice:
@@ -355,8 +878,16 @@ async def validate_invoice(
             detail="Estado inválido. Solo se puede validar o rechazar facturas"
         )
     
-    # Actualizar estado y notas
+    if validated_by is not None and db.get(User, validated_by) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuario validador no encontrado"
+        )
+    
+    # Actualizar estado, validación y notas
     invoice.status = new_status
+    invoice.validated_at = datetime.now(timezone.utc)
+    invoice.validated_by = validated_by
     if validation_notes:
         # Agregar notas a la descripción existente
         if invoice.description:
@@ -366,6 +897,8 @@ async def validate_invoice(
     
     db.commit()
     db.refresh(invoice)
+    invoice_count_cache.invalidate()
+    await run_in_threadpool(invalidate_dashboard_cache)
     
     return invoice
 
@@ -389,25 +922,37 @@ async def delete_invoice(invoice_id: int, db: Session = Depends(get_db)):
             detail="Factura no encontrada"
         )
     
-    # Eliminar archivo adjunto si existe
-    if invoice.file_path and os.path.exists(invoice.file_path):
-        os.remove(invoice.file_path)
-    
+    file_path = invoice.file_path
     db.delete(invoice)
     db.commit()
+    invoice_count_cache.invalidate()
+    await run_in_threadpool(invalidate_dashboard_cache)
+    
+    # Eliminar el archivo adjunto solo si ninguna otra factura lo referencia.
+    # La factura ya está borrada: si el almacén falla, el blob huérfano queda
+    # para la limpieza en lugar de responder con un error.
+    try:
+        await run_in_threadpool(release_file, db, file_path)
+    except Exception:
+        logger.exception(f"No se pudo liberar el adjunto {file_path} de la factura {invoice_id}")
 
 
 @router.get("/{invoice_id}/download")
-async def download_invoice_file(invoice_id: int, db: Session = Depends(get_db)):
+async def download_invoice_file(invoice_id: int, request: Request, db: Session = Depends(get_db)):
     """
     Descargar archivo adjunto de una factura.
     
+    Soporta descargas parciales (`Range`) para que el visor de PDF cargue por
+    páginas, y peticiones condicionales (`If-None-Match`, `If-Modified-Since`)
+    con un ETag fuerte derivado del hash del contenido.
+    
     Args:
         invoice_id: ID de la factura
+        request: Petición HTTP (cabeceras de rango y condicionales)
         db: Sesión de base de datos
         
     Returns:
-        FileResponse: Archivo adjunto
+        AttachmentResponse: Archivo adjunto (200, 206 o 304), o redirección a una URL prefirmada
         
     Raises:
         HTTPException: Si la factura no existe o no tiene archivo
@@ -427,8 +972,20 @@ async def download_invoice_file(invoice_id: int, db: Session = Depends(get_db)):
             detail="Esta factura no tiene archivo adjunto"
         )
     
-    # Verificar que el archivo exista en el sistema de archivos
-    if not os.path.exists(invoice.file_path):
+    storage = get_storage_backend()
+    local_path = storage.local_path(invoice.file_path)
+    
+    # Verificar que el archivo exista en el almacén de adjuntos (un solo stat en disco local)
+    stat_result = None
+    if local_path is not None:
+        try:
+            stat_result = await run_in_threadpool(os.stat, local_path)
+        except FileNotFoundError:
+            pass
+        file_found = stat_result is not None
+    else:
+        file_found = await run_in_threadpool(storage.exists, invoice.file_path)
+    if not file_found:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="El archivo adjunto no se encuentra en el servidor"
@@ -454,8 +1011,16 @@ async def download_invoice_file(invoice_id: int, db: Session = Depends(get_db)):
     # Generar nombre de archivo para descarga
     download_filename = f"factura_{invoice_id}_{filename}"
     
-    return FileResponse(
-        path=invoice.file_path,
-        filename=download_filename,
-        media_type=media_type
+    # Con almacenamiento remoto el cliente descarga directamente con una URL prefirmada
+    download_url = storage.download_url(invoice.file_path, download_filename, media_type)
+    if download_url:
+        return RedirectResponse(download_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    
+    return AttachmentResponse(
+        path=local_path,
+        request_headers=request.headers,
+        stat_result=stat_result,
+        etag=make_etag(invoice.file_sha256, stat_result),
+        media_type=media_type,
+        filename=download_filename
     )
@@ -3,18 +3,26 @@ Router para endpoints de OCR.
 Proporciona funcionalidades para procesamiento OCR de facturas físicas.
 """
 
+import asyncio
 import os
-import tempfile
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional
 import logging
 
-from src.database import get_db
+from src.database import get_db, settings
 from src.services.ocr_service import ocr_service
-from src.models import Invoice, User, InvoiceStatus, ExpenseCategory, PaymentMethod
-from src.schemas import InvoiceCreate
+from src.services.ocr_executor import get_ocr_executor, OCRQueueFullError, OCRTimeoutError, OCRPoolBrokenError
+from src.services.ocr_cache import get_ocr_cache
+from src.services.count_cache import invoice_count_cache
+from src.services.dashboard_cache import invalidate_dashboard_cache
+from src.services.attachment_storage import store_file, store_upload, store_upload_to_temp, FileTooLargeError
+from src.services.ocr_jobs import create_ocr_job, fail_ocr_job
+from src.tasks.ocr_tasks import process_ocr_job
+from src.models import Invoice, User, InvoiceStatus, ExpenseCategory, PaymentMethod, OCRJob
+from src.schemas import InvoiceCreate, OCRJob as OCRJobSchema
 from datetime import datetime
 
 # Configurar logging
@@ -23,6 +31,73 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ocr", tags=["ocr"])
 
+# Segundos que se sugiere esperar al cliente cuando el OCR está saturado
+OCR_RETRY_AFTER_SECONDS = 5
+
+# Intervalo con el que se revisa un trabajo de OCR mientras el cliente espera
+OCR_JOB_POLL_INTERVAL = 0.5
+
+
+async def save_temp_upload(file: UploadFile) -> str:
+    """
+    Guardar una carga en un archivo temporal sin leerla completa en memoria.
+
+    Args:
+        file: Archivo recibido en la petición
+
+    Returns:
+        str: Ruta del archivo temporal (el llamador debe borrarlo)
+
+    Raises:
+        HTTPException: Si el archivo supera el tamaño máximo
+    """
+    try:
+        return await store_upload_to_temp(
+            file,
+            suffix=os.path.splitext(file.filename)[1],
+            max_size=settings.max_file_size
+        )
+    except FileTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El archivo es demasiado grande. Máximo {settings.max_file_size} bytes"
+        )
+
+
+async def run_ocr(file_path: str) -> Dict[str, Any]:
+    """
+    Procesar un archivo en el pool de OCR sin bloquear el bucle de eventos.
+    
+    Args:
+        file_path: Ruta del archivo de factura
+        
+    Returns:
+        Dict con los datos extraídos por OCR
+        
+    Raises:
+        HTTPException: 429 si el OCR está saturado, 504 si supera el tiempo máximo,
+            503 si el proceso de OCR murió
+    """
+    try:
+        return await get_ocr_executor().process_invoice_file(file_path)
+    except OCRQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"{e}. Intente de nuevo en unos segundos",
+            headers={"Retry-After": str(OCR_RETRY_AFTER_SECONDS)}
+        )
+    except OCRTimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
+    except OCRPoolBrokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(OCR_RETRY_AFTER_SECONDS)}
+        )
+
 
 @router.post("/process", response_model=Dict[str, Any])
 async def process_invoice_ocr(
@@ -60,15 +135,12 @@ async def process_invoice_ocr(
                 detail=f"Formato de archivo no soportado. Formatos permitidos: {', '.join(ocr_service.supported_formats)}"
             )
         
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        # Guardar la carga en un archivo temporal por bloques
+        temp_file_path = await save_temp_upload(file)
         
         try:
             # Procesar archivo con OCR
-            ocr_result = ocr_service.process_invoice_file(temp_file_path)
+            ocr_result = await run_ocr(temp_file_path)
             
             # Agregar información del usuario
             ocr_result['user_id'] = user_id
@@ -134,15 +206,12 @@ async def process_and_create_invoice(
                 detail=f"Formato de archivo no soportado. Formatos permitidos: {', '.join(ocr_service.supported_formats)}"
             )
         
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        # Guardar la carga en un archivo temporal por bloques
+        temp_file_path = await save_temp_upload(file)
         
         try:
             # Procesar archivo con OCR
-            ocr_result = ocr_service.process_invoice_file(temp_file_path)
+            ocr_result = await run_ocr(temp_file_path)
             
             # Validar que se extrajo al menos el monto
             if not ocr_result.get('amount'):
@@ -151,17 +220,10 @@ async def process_and_create_invoice(
                     detail="No se pudo extraer el monto de la factura. Verifique que la imagen sea clara y contenga información legible."
                 )
             
-            # Crear nombre único para el archivo
+            # Guardar el archivo en el almacén de adjuntos (deduplicado por contenido)
             file_extension = os.path.splitext(file.filename)[1]
-            unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{user_id}_{file.filename}"
-            file_path = os.path.join("uploads", unique_filename)
-            
-            # Crear directorio si no existe
-            os.makedirs("uploads", exist_ok=True)
-            
-            # Copiar archivo a la ubicación final
-            with open(file_path, "wb") as final_file:
-                final_file.write(content)
+            stored = await run_in_threadpool(store_file, temp_file_path, file_extension, db)
+            file_path = stored.path
             
             # Crear factura en la base de datos
             # Asegurar que provider no sea None
@@ -194,6 +256,7 @@ async def process_and_create_invoice(
                 user_id=invoice_data.user_id,
                 description=invoice_data.description,
                 file_path=file_path,
+                file_sha256=stored.sha256,
                 nit=ocr_result.get('nit'),
                 status=InvoiceStatus.PENDING,
                 ocr_data=ocr_result,  # Guardar datos OCR para referencia
@@ -203,6 +266,8 @@ async def process_and_create_invoice(
             db.add(db_invoice)
             db.commit()
             db.refresh(db_invoice)
+            invoice_count_cache.invalidate()
+            await run_in_threadpool(invalidate_dashboard_cache)
             
             logger.info(f"Factura creada con OCR: ID {db_invoice.id}, confianza {ocr_result['confidence']:.2f}")
             
@@ -252,6 +317,144 @@ async def get_supported_formats():
     }
 
 
+@router.get("/executor-stats")
+async def get_ocr_executor_stats():
+    """
+    Obtener la ocupación del pool de OCR.
+    
+    Returns:
+        Dict con procesos, capacidad, trabajos en curso y contadores
+    """
+    return get_ocr_executor().get_stats()
+
+
+@router.get("/cache-stats")
+async def get_ocr_cache_stats():
+    """
+    Obtener la ocupación y la tasa de aciertos de la caché de resultados de OCR.
+    
+    Returns:
+        Dict con entradas, bytes, aciertos, fallos, tasa de aciertos y expulsiones
+    """
+    cache = get_ocr_cache()
+    if cache is None:
+        return {"backend": None, "available": False}
+    return await run_in_threadpool(cache.get_stats)
+
+
+@router.post("/jobs", response_model=OCRJobSchema, status_code=status.HTTP_202_ACCEPTED)
+async def create_ocr_job_endpoint(
+    file: UploadFile = File(...),
+    user_id: int = Form(...),
+    invoice_id: Optional[int] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Encolar el OCR de una factura y responder de inmediato con el trabajo.
+    
+    El OCR lo ejecuta un worker de Celery; el estado se consulta en
+    `GET /ocr/jobs/{job_id}`. Si se indica `invoice_id`, al terminar se
+    completan los datos de OCR de esa factura.
+    
+    Args:
+        file: Archivo de factura (imagen o PDF)
+        user_id: ID del usuario que sube la factura
+        invoice_id: Factura que recibirá los datos extraídos (opcional)
+        db: Sesión de base de datos
+        
+    Returns:
+        OCRJobSchema: Trabajo pendiente
+        
+    Raises:
+        HTTPException: Si el usuario o la factura no existen, el archivo no es
+            válido o no se pudo encolar el trabajo
+    """
+    if not db.query(User.id).filter(User.id == user_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuario no encontrado"
+        )
+    
+    if invoice_id is not None and not db.query(Invoice.id).filter(Invoice.id == invoice_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Factura no encontrada"
+        )
+    
+    if not ocr_service.is_supported_format(file.filename):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato de archivo no soportado. Formatos permitidos: {', '.join(ocr_service.supported_formats)}"
+        )
+    
+    # Guardar el archivo en el almacén para que cualquier worker pueda leerlo
+    try:
+        stored = await store_upload(
+            file,
+            suffix=os.path.splitext(file.filename)[1],
+            max_size=settings.max_file_size,
+            db=db
+        )
+    except FileTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El archivo es demasiado grande. Máximo {settings.max_file_size} bytes"
+        )
+    
+    job = create_ocr_job(db, user_id, stored.path, invoice_id)
+    
+    try:
+        await run_in_threadpool(process_ocr_job.delay, job.id)
+    except Exception as e:
+        logger.error(f"No se pudo encolar el OCR {job.id}: {str(e)}")
+        fail_ocr_job(db, job, "No se pudo encolar el trabajo de OCR")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El servicio de OCR en segundo plano no está disponible"
+        )
+    
+    db.refresh(job)
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=OCRJobSchema)
+async def get_ocr_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=30, description="Segundos a esperar a que el trabajo termine"),
+    db: Session = Depends(get_db)
+):
+    """
+    Consultar el estado y el resultado de un trabajo de OCR.
+    
+    Con `wait` la respuesta se retiene hasta que el trabajo termina o se
+    agota la espera, lo que evita consultas repetidas del cliente.
+    
+    Args:
+        job_id: ID del trabajo
+        wait: Segundos máximos de espera
+        db: Sesión de base de datos
+        
+    Returns:
+        OCRJobSchema: Estado, resultado y error del trabajo
+        
+    Raises:
+        HTTPException: Si el trabajo no existe
+    """
+    job = db.get(OCRJob, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo de OCR no encontrado"
+        )
+    
+    deadline = asyncio.get_running_loop().time() + wait
+    while not job.finished and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(OCR_JOB_POLL_INTERVAL)
+        db.refresh(job)
+    
+    return job
+
+
 @router.get("/invoice/{invoice_id}/ocr-data")
 async def get_invoice_ocr_data(
     invoice_id: int,
@@ -5,11 +5,13 @@ Maneja la creación, consulta y actualización de usuarios del sistema.
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List
 
 from src.database import get_db
 from src.models import User
 from src.schemas import UserCreate, UserUpdate, User as UserSchema
+from src.services.dashboard_cache import invalidate_dashboard_cache
 
 router = APIRouter()
 
@@ -42,6 +44,7 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    await run_in_threadpool(invalidate_dashboard_cache)
     
     return db_user
 
@@ -134,6 +137,7 @@ async def update_user(
     
     db.commit()
     db.refresh(user)
+    await run_in_threadpool(invalidate_dashboard_cache)
     
     return user
 
@@ -159,3 +163,4 @@ async def delete_user(user_id: int, db: Session = Depends(get_db)):
     
     db.delete(user)
     db.commit()
+    await run_in_threadpool(invalidate_dashboard_cache)
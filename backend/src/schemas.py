@@ -6,7 +6,7 @@ Define los modelos de entrada y salida para la API.
 from pydantic import BaseModel, EmailStr, Field, validator
 from typing import Optional, List
 from datetime import datetime
-from src.models import UserRole, PaymentMethod, ExpenseCategory, InvoiceStatus
+from src.models import UserRole, PaymentMethod, ExpenseCategory, InvoiceStatus, ExportJobStatus, OCRJobStatus
 
 
 # Esquemas de Usuario
@@ -75,6 +75,8 @@ class Invoice(InvoiceBase):
     status: InvoiceStatus
     created_at: datetime
     updated_at: Optional[datetime] = None
+    validated_at: Optional[datetime] = None
+    validated_by: Optional[int] = None
     user: User
     
     class Config:
@@ -96,7 +98,7 @@ class InvoiceFilters(BaseModel):
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     provider: Optional[str] = None
-    search_text: Optional[str] = Field(None, description="Búsqueda por texto en proveedor o descripción")
+    search_text: Optional[str] = Field(None, description="Búsqueda por texto en proveedor, descripción, NIT o texto OCR")
 
 
 class PaginationParams(BaseModel):
@@ -108,10 +110,12 @@ class PaginationParams(BaseModel):
 class PaginatedResponse(BaseModel):
     """Esquema para respuestas paginadas."""
     items: List[Invoice]
-    total: int
+    total: Optional[int] = None
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = Field(None, description="Cursor para la siguiente página (modo cursor)")
+    total_is_estimate: bool = Field(False, description="Indica si el total es una estimación del planificador")
 
 
 # Esquemas para exportación
@@ -121,7 +125,41 @@ class ExportParams(BaseModel):
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     status: Optional[InvoiceStatus] = None
-    format: str = Field(default="excel", pattern="^(excel|csv)$")
+    format: str = Field(default="excel", pattern="^(excel|csv|ndjson|parquet|arrow)$")
+
+
+class ExportJob(BaseModel):
+    """Esquema de respuesta de un trabajo de exportación."""
+    id: str
+    status: ExportJobStatus
+    filters: dict
+    total_rows: Optional[int] = None
+    rows_written: int = 0
+    progress: float = Field(0.0, description="Fracción de filas escritas (0 a 1)")
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    reused: bool = Field(False, description="Indica si se reutilizó un resultado reciente con los mismos filtros")
+    
+    class Config:
+        from_attributes = True
+
+
+class OCRJob(BaseModel):
+    """Esquema de respuesta de un trabajo de OCR."""
+    id: str
+    status: OCRJobStatus
+    user_id: int
+    invoice_id: Optional[int] = None
+    result: Optional[dict] = Field(None, description="Datos extraídos por OCR (al completarse)")
+    confidence: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
 
 
 # Esquemas de respuesta de la API
@@ -0,0 +1,564 @@
+"""
+Servicio de almacenamiento de archivos adjuntos de facturas.
+Guarda las cargas por bloques, sin mantener el archivo completo en memoria ni
+bloquear el event loop con escrituras síncronas.
+
+Los adjuntos se direccionan por contenido: cada archivo se guarda una sola
+vez con la clave `<sha[:2]>/<sha><ext>` y varias facturas pueden referenciar
+la misma clave en `Invoice.file_path`. El archivo solo se elimina cuando deja
+de estar referenciado. Guardar y liberar una clave se serializan con un
+bloqueo por contenido en PostgreSQL (`lock_blob`) que dura hasta el commit de la
+transacción, para que una carga deduplicada sobre un blob que se está
+liberando no lo pierda antes de confirmar su factura.
+
+El almacenamiento es intercambiable: disco local (por defecto) o un servicio
+compatible con S3 (`STORAGE_BACKEND=s3`), que permite ejecutar varias
+instancias sin disco compartido y servir descargas con URLs prefirmadas.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Iterator, NamedTuple, Optional
+
+from fastapi import UploadFile
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from src.database import settings
+from src.models import Invoice, OCRJob, OCRJobStatus
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque para leer y escribir cargas (1MB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Tamaño de cada parte en cargas multiparte a S3 (mínimo 5MB salvo la última)
+S3_PART_SIZE = 8 * 1024 * 1024
+
+# Subdirectorio / prefijo para cargas en curso
+INCOMING_DIR = ".incoming"
+
+# Prefijo en S3 para archivos generados (exportaciones); en disco local se
+# guardan en `settings.export_dir`, fuera del directorio servido en /uploads
+ARTIFACTS_DIR = "exports"
+
+
+class FileTooLargeError(ValueError):
+    """El archivo supera el tamaño máximo permitido."""
+
+
+class StoredUpload(NamedTuple):
+    """Resultado de guardar una carga."""
+    path: str
+    size: int
+    sha256: str
+
+
+def _content_key(sha256: str, suffix: str) -> str:
+    """Clave relativa direccionada por contenido."""
+    return f"{sha256[:2]}/{sha256}{suffix.lower()}"
+
+
+class _LocalWriter:
+    """Escritura de una carga en un archivo temporal local."""
+
+    def __init__(self, directory: str, suffix: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = f"{directory}/{uuid.uuid4()}{suffix}"
+        self.handle = open(self.path, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.handle.write(chunk)
+
+    def close(self) -> None:
+        self.handle.close()
+
+    def abort(self) -> None:
+        self.handle.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class LocalStorageBackend:
+    """Almacenamiento de adjuntos en el disco local."""
+
+    name = "local"
+
+    def __init__(self, root: Optional[str] = None, artifacts_root: Optional[str] = None):
+        self._root = root
+        self._artifacts_root = artifacts_root
+
+    @property
+    def root(self) -> str:
+        return self._root or settings.upload_dir
+
+    @property
+    def artifacts_root(self) -> str:
+        return self._artifacts_root or settings.export_dir
+
+    def key_for(self, sha256: str, suffix: str) -> str:
+        """La clave local es la ruta del archivo (compatible con rutas previas)."""
+        return f"{self.root}/{_content_key(sha256, suffix)}"
+
+    def artifact_key(self, name: str) -> str:
+        """
+        Clave de un archivo generado por la aplicación (p. ej. exportaciones).
+
+        Queda fuera de `root`, que se publica sin autenticación en /uploads:
+        estos archivos solo se sirven desde sus endpoints de descarga.
+        """
+        return f"{self.artifacts_root}/{name}"
+
+    def open_writer(self, suffix: str) -> "_LocalUploadWriter":
+        return _LocalUploadWriter(self, suffix)
+
+    def put_file(self, source_path: str, key: str) -> None:
+        if os.path.exists(key):
+            return
+        # Copia temporal en el mismo sistema de archivos que la clave (el reemplazo es atómico)
+        base = self.root if key.startswith(f"{self.root}/") else os.path.dirname(key)
+        incoming_dir = os.path.join(base, INCOMING_DIR)
+        os.makedirs(incoming_dir, exist_ok=True)
+        temp_path = f"{incoming_dir}/{uuid.uuid4()}{os.path.splitext(key)[1]}"
+        shutil.copyfile(source_path, temp_path)
+        self._promote(temp_path, key)
+
+    def _promote(self, temp_path: str, key: str) -> None:
+        """Mover un archivo temporal a su clave definitiva o descartarlo si ya existe."""
+        if os.path.exists(key):
+            # Contenido duplicado: se reutiliza el blob existente
+            os.remove(temp_path)
+            logger.info(f"Adjunto deduplicado: {key}")
+            return
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        os.replace(temp_path, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(key)
+
+    def delete(self, key: str) -> None:
+        if os.path.exists(key):
+            os.remove(key)
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(key)
+
+    def iter_chunks(self, key: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        with open(key, "rb") as handle:
+            for chunk in iter(lambda: handle.read(chunk_size), b""):
+                yield chunk
+
+    def local_path(self, key: str) -> Optional[str]:
+        return key
+
+    def download_url(self, key: str, filename: str, media_type: str) -> Optional[str]:
+        """El disco local no genera URLs: el archivo se sirve desde la API."""
+        return None
+
+
+class _LocalUploadWriter(_LocalWriter):
+    """Carga local que se promueve a su clave por contenido al terminar."""
+
+    def __init__(self, backend: LocalStorageBackend, suffix: str):
+        super().__init__(os.path.join(backend.root, INCOMING_DIR), suffix)
+        self.backend = backend
+        self.suffix = suffix
+
+    def commit(self, sha256: str) -> str:
+        self.close()
+        key = self.backend.key_for(sha256, self.suffix)
+        self.backend._promote(self.path, key)
+        return key
+
+
+class S3StorageBackend:
+    """Almacenamiento de adjuntos en un servicio compatible con S3 (AWS, MinIO, GCS)."""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client=None,
+        presign_expiration: int = 300,
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None
+    ):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign_expiration = presign_expiration
+        if client is None:
+            import boto3  # Dependencia opcional: solo se necesita con STORAGE_BACKEND=s3
+
+            client = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url or None,
+                region_name=region_name or None,
+                aws_access_key_id=access_key_id or None,
+                aws_secret_access_key=secret_access_key or None
+            )
+        self.client = client
+
+    def key_for(self, sha256: str, suffix: str) -> str:
+        return f"{self.prefix}{_content_key(sha256, suffix)}"
+
+    def artifact_key(self, name: str) -> str:
+        return f"{self.prefix}{ARTIFACTS_DIR}/{name}"
+
+    def open_writer(self, suffix: str) -> "_S3UploadWriter":
+        return _S3UploadWriter(self, suffix)
+
+    def put_file(self, source_path: str, key: str) -> None:
+        if not self.exists(key):
+            self.client.upload_file(source_path, self.bucket, key)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception as e:
+            if _is_not_found(e):
+                return False
+            raise
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def size(self, key: str) -> int:
+        return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+
+    def iter_chunks(self, key: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        try:
+            for chunk in iter(lambda: body.read(chunk_size), b""):
+                yield chunk
+        finally:
+            body.close()
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    def download_url(self, key: str, filename: str, media_type: str) -> Optional[str]:
+        """Generar una URL prefirmada para que el cliente descargue directamente."""
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ResponseContentDisposition": f'attachment; filename="{filename}"',
+                "ResponseContentType": media_type,
+            },
+            ExpiresIn=self.presign_expiration
+        )
+
+
+class _S3UploadWriter:
+    """Carga multiparte a S3 sobre una clave temporal."""
+
+    def __init__(self, backend: S3StorageBackend, suffix: str):
+        self.backend = backend
+        self.suffix = suffix
+        self.temp_key = f"{backend.prefix}{INCOMING_DIR}/{uuid.uuid4()}{suffix}"
+        self.upload_id = backend.client.create_multipart_upload(
+            Bucket=backend.bucket, Key=self.temp_key
+        )["UploadId"]
+        self.parts = []
+        self.buffer = bytearray()
+
+    def _flush(self) -> None:
+        part_number = len(self.parts) + 1
+        response = self.backend.client.upload_part(
+            Bucket=self.backend.bucket,
+            Key=self.temp_key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=bytes(self.buffer)
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self.buffer.clear()
+
+    def write(self, chunk: bytes) -> None:
+        self.buffer.extend(chunk)
+        if len(self.buffer) >= S3_PART_SIZE:
+            self._flush()
+
+    def commit(self, sha256: str) -> str:
+        if self.buffer or not self.parts:
+            self._flush()
+        client, bucket = self.backend.client, self.backend.bucket
+        client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=self.temp_key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts}
+        )
+        key = self.backend.key_for(sha256, self.suffix)
+        if self.backend.exists(key):
+            logger.info(f"Adjunto deduplicado: {key}")
+        else:
+            client.copy_object(
+                Bucket=bucket,
+                Key=key,
+                CopySource={"Bucket": bucket, "Key": self.temp_key}
+            )
+        client.delete_object(Bucket=bucket, Key=self.temp_key)
+        return key
+
+    def abort(self) -> None:
+        self.backend.client.abort_multipart_upload(
+            Bucket=self.backend.bucket, Key=self.temp_key, UploadId=self.upload_id
+        )
+
+
+def _is_not_found(error: Exception) -> bool:
+    """Determinar si un error del cliente S3 corresponde a un objeto inexistente."""
+    response = getattr(error, "response", None) or {}
+    code = str(response.get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+_backend = None
+
+
+def get_storage_backend():
+    """
+    Obtener el backend de almacenamiento configurado.
+
+    Returns:
+        LocalStorageBackend o S3StorageBackend según `settings.storage_backend`
+    """
+    global _backend
+    if _backend is None:
+        if settings.storage_backend == "s3":
+            _backend = S3StorageBackend(
+                bucket=settings.s3_bucket,
+                prefix=settings.s3_prefix,
+                presign_expiration=settings.s3_presign_expiration,
+                endpoint_url=settings.s3_endpoint_url,
+                region_name=settings.s3_region,
+                access_key_id=settings.s3_access_key_id,
+                secret_access_key=settings.s3_secret_access_key
+            )
+        else:
+            _backend = LocalStorageBackend()
+    return _backend
+
+
+def set_storage_backend(backend) -> None:
+    """Reemplazar el backend de almacenamiento (None vuelve a la configuración)."""
+    global _backend
+    _backend = backend
+
+
+async def _stream_to_writer(upload: UploadFile, writer, max_size: int, chunk_size: int):
+    """
+    Copiar una carga a un escritor por bloques calculando su SHA-256.
+
+    Returns:
+        Tuple con el tamaño y el hash hexadecimal
+
+    Raises:
+        FileTooLargeError: Si el archivo supera el tamaño máximo
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise FileTooLargeError(f"El archivo supera {max_size} bytes")
+            await run_in_threadpool(_write_chunk, writer, digest, chunk)
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+    return size, digest.hexdigest()
+
+
+def _check_declared_size(upload: UploadFile, max_size: int) -> None:
+    """Rechazar de inmediato la carga si su tamaño declarado ya es excesivo."""
+    if upload.size is not None and upload.size > max_size:
+        raise FileTooLargeError(f"El archivo supera {max_size} bytes")
+
+
+def _write_chunk(writer, digest, chunk: bytes) -> None:
+    """Actualizar el hash y escribir un bloque (se ejecuta en el threadpool)."""
+    digest.update(chunk)
+    writer.write(chunk)
+
+
+def _lock_id(key: str) -> int:
+    """Identificador de 64 bits con signo para `pg_advisory_xact_lock`."""
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big", signed=True)
+
+
+def lock_blob(db: Session, key: str) -> None:
+    """
+    Bloquear una clave del almacén hasta el fin de la transacción de `db`.
+
+    En PostgreSQL es un bloqueo consultivo por clave que se libera con el
+    commit o el rollback. Puede esperar a otra transacción: llamarlo en el
+    threadpool desde código asíncrono.
+
+    En los demás motores no se bloquea nada: SQLite solo se usa en
+    desarrollo y pruebas, con un único escritor, donde no hay cargas y
+    borrados concurrentes que serializar.
+
+    Args:
+        db: Sesión cuya transacción retiene el bloqueo
+        key: Clave del adjunto
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": _lock_id(key)})
+
+
+async def store_upload(
+    upload: UploadFile,
+    suffix: str,
+    max_size: int,
+    db: Optional[Session] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredUpload:
+    """
+    Guardar una carga en el almacén de adjuntos direccionado por contenido.
+
+    Con `db`, la clave queda bloqueada (`lock_blob`) hasta el commit de esa
+    sesión, que debe ser el que confirma la factura o el trabajo que la
+    referencia.
+
+    Args:
+        upload: Archivo recibido en la petición
+        suffix: Extensión del archivo (con punto)
+        max_size: Tamaño máximo permitido en bytes
+        db: Sesión que confirmará la referencia al adjunto
+        chunk_size: Tamaño de cada bloque leído
+
+    Returns:
+        StoredUpload: Clave del blob, tamaño y hash
+
+    Raises:
+        FileTooLargeError: Si el archivo supera el tamaño máximo
+    """
+    _check_declared_size(upload, max_size)
+    backend = get_storage_backend()
+    writer = await run_in_threadpool(backend.open_writer, suffix)
+    size, sha256 = await _stream_to_writer(upload, writer, max_size, chunk_size)
+    if db is not None:
+        try:
+            await run_in_threadpool(lock_blob, db, backend.key_for(sha256, suffix))
+        except BaseException:
+            await run_in_threadpool(writer.abort)
+            raise
+    key = await run_in_threadpool(writer.commit, sha256)
+    return StoredUpload(path=key, size=size, sha256=sha256)
+
+
+async def store_upload_to_temp(
+    upload: UploadFile,
+    suffix: str,
+    max_size: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> str:
+    """
+    Guardar una carga en un archivo temporal local, por bloques y con límite.
+
+    El llamador debe borrar el archivo cuando termine de usarlo.
+
+    Args:
+        upload: Archivo recibido en la petición
+        suffix: Extensión del archivo (con punto)
+        max_size: Tamaño máximo permitido en bytes
+        chunk_size: Tamaño de cada bloque leído
+
+    Returns:
+        str: Ruta del archivo temporal
+
+    Raises:
+        FileTooLargeError: Si el archivo supera el tamaño máximo
+    """
+    _check_declared_size(upload, max_size)
+    writer = await run_in_threadpool(_LocalWriter, tempfile.gettempdir(), suffix)
+    await _stream_to_writer(upload, writer, max_size, chunk_size)
+    await run_in_threadpool(writer.close)
+    return writer.path
+
+
+def store_file(source_path: str, suffix: str, db: Optional[Session] = None) -> StoredUpload:
+    """
+    Guardar un archivo local en el almacén de adjuntos direccionado por contenido.
+
+    Args:
+        source_path: Ruta del archivo a guardar
+        suffix: Extensión del archivo (con punto)
+        db: Sesión que confirmará la referencia al adjunto (ver `store_upload`)
+
+    Returns:
+        StoredUpload: Clave del blob, tamaño y hash
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(source_path, "rb") as source:
+        for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    sha256 = digest.hexdigest()
+
+    backend = get_storage_backend()
+    key = backend.key_for(sha256, suffix)
+    if db is not None:
+        lock_blob(db, key)
+    backend.put_file(source_path, key)
+    return StoredUpload(path=key, size=size, sha256=sha256)
+
+
+def count_references(db: Session, file_path: str) -> int:
+    """Contar las facturas y los trabajos de OCR activos que referencian un archivo adjunto."""
+    invoices = db.query(func.count(Invoice.id)).filter(Invoice.file_path == file_path).scalar()
+    jobs = db.query(func.count(OCRJob.id)).filter(
+        OCRJob.file_key == file_path,
+        OCRJob.status.in_([OCRJobStatus.PENDING, OCRJobStatus.RUNNING])
+    ).scalar()
+    return invoices + jobs
+
+
+def release_file(db: Session, file_path: Optional[str]) -> bool:
+    """
+    Eliminar un adjunto si ya nada lo referencia.
+
+    Debe llamarse después de confirmar el borrado o cambio de la factura: el
+    conteo y el borrado se hacen con la clave bloqueada (`lock_blob`) y la
+    transacción se confirma al terminar para liberar el bloqueo, o se
+    revierte si algo falla para no ocultar el error original.
+
+    Args:
+        db: Sesión de base de datos
+        file_path: Clave del adjunto liberado
+
+    Returns:
+        bool: True si el archivo se eliminó del almacén
+    """
+    if not file_path:
+        return False
+    try:
+        lock_blob(db, file_path)
+        deleted = False
+        if count_references(db, file_path) == 0:
+            backend = get_storage_backend()
+            if backend.exists(file_path):
+                backend.delete(file_path)
+                deleted = True
+    except BaseException:
+        db.rollback()
+        raise
+    db.commit()
+    return deleted
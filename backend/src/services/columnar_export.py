@@ -0,0 +1,147 @@
+"""
+Servicio de exportación columnar de facturas (Parquet y Arrow IPC).
+Pensado para cargas analíticas (pandas, DuckDB, Spark): los montos son
+numéricos, las fechas son timestamps y las categorías se codifican como
+diccionario. El archivo se escribe por lotes de registros leídos del cursor
+de la base de datos.
+"""
+
+from itertools import islice
+from typing import IO, Iterable, Iterator, Union
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from src.models import ExpenseCategory, InvoiceStatus, PaymentMethod
+
+# Filas por lote de registros (y por grupo de filas en Parquet)
+RECORD_BATCH_SIZE = 50_000
+
+# Tipo de las columnas de enums: índices pequeños sobre el diccionario de valores
+_ENUM_TYPE = pa.dictionary(pa.int8(), pa.string())
+
+INVOICE_ARROW_SCHEMA = pa.schema([
+    pa.field("id", pa.int64(), nullable=False),
+    pa.field("user_name", pa.string()),
+    pa.field("date", pa.timestamp("us", tz="UTC"), nullable=False),
+    pa.field("provider", pa.string()),
+    pa.field("amount", pa.float64(), nullable=False),
+    pa.field("payment_method", _ENUM_TYPE),
+    pa.field("category", _ENUM_TYPE),
+    pa.field("status", _ENUM_TYPE),
+    pa.field("description", pa.string()),
+    pa.field("created_at", pa.timestamp("us", tz="UTC")),
+])
+
+# Diccionarios fijos por enum: todos los lotes comparten el mismo diccionario,
+# requisito del formato de archivo Arrow IPC
+_ENUM_DICTIONARIES = {
+    enum_class: (
+        pa.array([member.value for member in enum_class], type=pa.string()),
+        {member: index for index, member in enumerate(enum_class)},
+    )
+    for enum_class in (PaymentMethod, ExpenseCategory, InvoiceStatus)
+}
+
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+def _enum_array(values: list, enum_class) -> pa.DictionaryArray:
+    """Codificar valores de un enum como índices sobre su diccionario fijo."""
+    dictionary, positions = _ENUM_DICTIONARIES[enum_class]
+    indices = pa.array([positions[value] for value in values], type=pa.int8())
+    return pa.DictionaryArray.from_arrays(indices, dictionary)
+
+
+def _record_batch(rows: list) -> pa.RecordBatch:
+    """Construir un lote de registros tipado a partir de filas de exportación."""
+    arrays = [
+        pa.array([row.id for row in rows], type=pa.int64()),
+        pa.array([row.user_name for row in rows], type=pa.string()),
+        pa.array([row.date for row in rows], type=pa.timestamp("us", tz="UTC")),
+        pa.array([row.provider for row in rows], type=pa.string()),
+        pa.array([row.amount for row in rows], type=pa.float64()),
+        _enum_array([row.payment_method for row in rows], PaymentMethod),
+        _enum_array([row.category for row in rows], ExpenseCategory),
+        _enum_array([row.status for row in rows], InvoiceStatus),
+        pa.array([row.description for row in rows], type=pa.string()),
+        pa.array([row.created_at for row in rows], type=pa.timestamp("us", tz="UTC")),
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=INVOICE_ARROW_SCHEMA)
+
+
+def iter_record_batches(rows: Iterable, batch_size: int = RECORD_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    """
+    Agrupar filas de exportación en lotes de registros de Arrow.
+
+    Args:
+        rows: Filas de exportación (ver `EXPORT_COLUMNS`), normalmente un iterador
+        batch_size: Filas por lote
+
+    Returns:
+        Iterator de RecordBatch con el esquema `INVOICE_ARROW_SCHEMA`
+    """
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, batch_size))
+        if not chunk:
+            return
+        yield _record_batch(chunk)
+
+
+def write_invoices_parquet(
+    rows: Iterable,
+    output: Union[str, IO[bytes]],
+    batch_size: int = RECORD_BATCH_SIZE
+) -> int:
+    """
+    Escribir las facturas en Parquet (zstd), un grupo de filas por lote.
+
+    Args:
+        rows: Filas de exportación
+        output: Ruta o archivo binario de destino
+        batch_size: Filas por lote
+
+    Returns:
+        int: Número de facturas escritas
+    """
+    total = 0
+    with pq.ParquetWriter(output, INVOICE_ARROW_SCHEMA, compression="zstd") as writer:
+        for batch in iter_record_batches(rows, batch_size):
+            writer.write_batch(batch)
+            total += batch.num_rows
+    return total
+
+
+def write_invoices_arrow(
+    rows: Iterable,
+    output: Union[str, IO[bytes]],
+    batch_size: int = RECORD_BATCH_SIZE
+) -> int:
+    """
+    Escribir las facturas en formato de archivo Arrow IPC (Feather v2).
+
+    Args:
+        rows: Filas de exportación
+        output: Ruta o archivo binario de destino
+        batch_size: Filas por lote
+
+    Returns:
+        int: Número de facturas escritas
+    """
+    total = 0
+    with ipc.new_file(output, INVOICE_ARROW_SCHEMA) as writer:
+        for batch in iter_record_batches(rows, batch_size):
+            writer.write_batch(batch)
+            total += batch.num_rows
+    return total
+
+
+COLUMNAR_WRITERS = {
+    "parquet": write_invoices_parquet,
+    "arrow": write_invoices_arrow,
+}
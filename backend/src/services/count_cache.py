@@ -0,0 +1,182 @@
+"""
+Caché de totales para los listados filtrados de facturas.
+Evita repetir `COUNT(*)` con los mismos filtros y permite estimar el total
+con el planificador de PostgreSQL para consultas amplias.
+
+Los totales se guardan en cada proceso, pero cada uno lleva la generación de
+la caché del dashboard en la que se calculó. Con `DASHBOARD_CACHE_BACKEND=redis`
+esa generación es el contador compartido en Redis, de modo que una escritura
+en cualquier instancia invalida los totales de todas; con la caché en memoria
+un total puede quedar desactualizado en las demás instancias hasta que vence
+`COUNT_CACHE_TTL`.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from src.database import settings
+from src.services.dashboard_cache import get_dashboard_cache
+
+# Por debajo de este número de filas estimadas se cuenta de forma exacta
+ESTIMATE_EXACT_THRESHOLD = 1000
+
+
+class _Explain(Executable, ClauseElement):
+    """Sentencia `EXPLAIN (FORMAT JSON)` sobre una consulta con sus parámetros."""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+class CountCache:
+    """Caché en proceso con TTL de los totales por conjunto de filtros."""
+
+    def __init__(
+        self,
+        ttl_seconds: int = 60,
+        max_entries: int = 1024,
+        shared_generation: Optional[Callable[[], Optional[int]]] = None
+    ):
+        """
+        Args:
+            ttl_seconds: Segundos que se conserva cada total
+            max_entries: Máximo de conjuntos de filtros guardados
+            shared_generation: Generación compartida entre procesos (None si no
+                está disponible); al cambiar descarta los totales guardados
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.shared_generation = shared_generation
+        self._entries: "OrderedDict[str, Tuple[float, int, Hashable]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self) -> Optional[Hashable]:
+        """
+        Generación actual: invalidaciones de este proceso y, si hay, la compartida.
+
+        Returns:
+            La generación, o None si la compartida no está disponible (no se usa la caché)
+        """
+        if self.shared_generation is None:
+            return self._generation
+        shared = self.shared_generation()
+        if shared is None:
+            return None
+        return (self._generation, shared)
+
+    @staticmethod
+    def make_key(filters: Dict[str, Any]) -> str:
+        """
+        Normalizar un conjunto de filtros en una clave estable.
+
+        Se descartan los filtros vacíos y los textos se comparan sin
+        distinguir mayúsculas, igual que el `ILIKE` de la consulta.
+
+        Args:
+            filters: Filtros aplicados al listado
+
+        Returns:
+            str: Clave de la caché
+        """
+        normalized = {}
+        for name, value in filters.items():
+            if value is None or value == "":
+                continue
+            if isinstance(value, Enum):
+                value = value.value
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, str):
+                value = value.strip().lower()
+            normalized[name] = value
+        return json.dumps(normalized, sort_keys=True)
+
+    def get(self, filters: Dict[str, Any]) -> Optional[int]:
+        """Obtener el total guardado para los filtros, si no ha expirado ni hubo escrituras."""
+        key = self.make_key(filters)
+        generation = self.generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if generation is None or entry is None or entry[0] <= time.monotonic() or entry[2] != generation:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, filters: Dict[str, Any], total: int, generation: Optional[Hashable] = None) -> None:
+        """
+        Guardar el total de un conjunto de filtros.
+
+        Si se indica `generation` (de `generation()` antes de contar) y hubo
+        una invalidación desde entonces, el total se descarta porque pudo
+        calcularse antes de la escritura.
+        """
+        key = self.make_key(filters)
+        current = self.generation()
+        with self._lock:
+            if current is None or (generation is not None and generation != current):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, total, current)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Descartar todos los totales (se llama al escribir facturas)."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Obtener contadores de aciertos y fallos de la caché."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def estimate_count(db, query) -> Optional[int]:
+    """
+    Estimar el número de filas de una consulta con el planificador de PostgreSQL.
+
+    Args:
+        db: Sesión de base de datos
+        query: Consulta de SQLAlchemy ya filtrada
+
+    Returns:
+        int con la estimación, o None si el motor no permite estimar
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+
+    plan = db.execute(_Explain(query.statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+# Instancia global de la caché de totales; comparte la generación de la caché
+# del dashboard, que se invalida en las mismas escrituras
+invoice_count_cache = CountCache(
+    ttl_seconds=settings.count_cache_ttl,
+    shared_generation=lambda: get_dashboard_cache().generation()
+)
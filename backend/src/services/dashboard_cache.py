@@ -0,0 +1,216 @@
+"""
+Caché de las estadísticas del dashboard.
+Las métricas solo cambian cuando se escriben facturas, así que cada sección de
+`DashboardStatsService` se guarda hasta que expira su TTL o hasta que un
+endpoint de escritura invalida la caché. Hay un backend en proceso (LRU con
+TTL) y otro en Redis, compartido por todas las instancias de la API.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.database import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryDashboardCache:
+    """Caché en proceso, LRU con TTL, de las secciones del dashboard."""
+
+    name = "memory"
+
+    def __init__(self, ttl_seconds: int = 300, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self) -> int:
+        """Generación actual; cambia con cada invalidación."""
+        return self._generation
+
+    def get(self, key: str) -> Optional[Any]:
+        """Obtener una sección guardada, si no ha expirado."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, generation: Optional[int] = None) -> None:
+        """
+        Guardar una sección.
+
+        Si hubo una invalidación desde `generation`, el valor se descarta
+        porque pudo calcularse antes de la escritura.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Descartar todas las secciones guardadas."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtener contadores de aciertos y fallos de la caché."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class RedisDashboardCache:
+    """
+    Caché de las secciones del dashboard en Redis.
+
+    Cada valor se guarda junto con la generación en la que se calculó; la
+    invalidación incrementa la generación (`INCR`), de modo que todas las
+    instancias dejan de usar los valores anteriores sin borrar claves. La
+    lectura obtiene valor y generación en un solo `MGET`. Si Redis no está
+    disponible la caché se comporta como un fallo y el dashboard se calcula
+    desde la base de datos; tras un error no se vuelve a intentar durante
+    `failure_backoff` segundos, para no esperar el timeout del socket en cada
+    petición.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        url: str = "",
+        ttl_seconds: int = 300,
+        prefix: str = "dashboard:",
+        client=None,
+        failure_backoff: float = 5.0
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.failure_backoff = failure_backoff
+        self._retry_at = 0.0
+        self.generation_key = f"{prefix}generation"
+        if client is None:
+            import redis  # Solo se necesita con DASHBOARD_CACHE_BACKEND=redis
+
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client = client
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _available(self) -> bool:
+        """False mientras dura la espera tras el último error de Redis."""
+        return time.monotonic() >= self._retry_at
+
+    def _failed(self, message: str, error: Exception) -> None:
+        """Registrar un error de Redis y suspender los intentos durante `failure_backoff`."""
+        self._retry_at = time.monotonic() + self.failure_backoff
+        logger.warning(f"{message}: {error}")
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def generation(self) -> Optional[int]:
+        """Generación actual en Redis (None si Redis no responde)."""
+        if not self._available():
+            return None
+        try:
+            return int(self.client.get(self.generation_key) or 0)
+        except Exception as e:
+            self._failed("Caché del dashboard no disponible", e)
+            return None
+
+    def get(self, key: str) -> Optional[Any]:
+        """Obtener una sección guardada en la generación actual."""
+        if not self._available():
+            self._count(False)
+            return None
+        try:
+            generation, payload = self.client.mget(self.generation_key, self.prefix + key)
+        except Exception as e:
+            self._failed("Caché del dashboard no disponible", e)
+            self._count(False)
+            return None
+        if payload is None:
+            self._count(False)
+            return None
+        entry = json.loads(payload)
+        if entry["generation"] != int(generation or 0):
+            self._count(False)
+            return None
+        self._count(True)
+        return entry["value"]
+
+    def set(self, key: str, value: Any, generation: Optional[int] = None) -> None:
+        """Guardar una sección con la generación en la que se calculó."""
+        if generation is None or not self._available():
+            return
+        payload = json.dumps({"generation": generation, "value": value})
+        try:
+            self.client.set(self.prefix + key, payload, ex=self.ttl_seconds)
+        except Exception as e:
+            self._failed("No se pudo guardar en la caché del dashboard", e)
+
+    def invalidate(self) -> None:
+        """Invalidar las secciones guardadas por todas las instancias."""
+        # Se intenta aunque Redis haya fallado hace poco: perder una invalidación
+        # dejaría valores desactualizados en las demás instancias
+        try:
+            self.client.incr(self.generation_key)
+        except Exception as e:
+            self._failed("No se pudo invalidar la caché del dashboard", e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtener contadores de aciertos y fallos de esta instancia."""
+        with self._lock:
+            return {"entries": None, "hits": self.hits, "misses": self.misses}
+
+
+_cache = None
+
+
+def get_dashboard_cache():
+    """
+    Obtener la caché del dashboard configurada.
+
+    Returns:
+        MemoryDashboardCache o RedisDashboardCache según `settings.dashboard_cache_backend`
+    """
+    global _cache
+    if _cache is None:
+        if settings.dashboard_cache_backend == "redis":
+            _cache = RedisDashboardCache(url=settings.redis_url, ttl_seconds=settings.dashboard_cache_ttl)
+        else:
+            _cache = MemoryDashboardCache(ttl_seconds=settings.dashboard_cache_ttl)
+    return _cache
+
+
+def set_dashboard_cache(cache) -> None:
+    """Reemplazar la caché del dashboard (None vuelve a la configuración)."""
+    global _cache
+    _cache = cache
+
+
+def invalidate_dashboard_cache() -> None:
+    """Invalidar la caché del dashboard (se llama al escribir facturas)."""
+    get_dashboard_cache().invalidate()
@@ -1,23 +1,373 @@
 """
 Servicio para calcular estadísticas del dashboard.
 Proporciona métricas y datos agregados para el dashboard principal.
+Las tendencias y distribuciones se leen de los rollups diarios
+(`invoice_daily_rollups`), cuyo tamaño depende de los días con actividad y no
+del número de facturas. Cada sección se guarda en la caché del dashboard
+hasta que expira o se escriben facturas. El dashboard completo calcula las
+secciones independientes en paralelo, cada grupo con su propia sesión.
 """
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, and_
-from typing import Dict, List, Any
-from datetime import datetime, timedelta
-from collections import defaultdict
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import event, func, extract, and_, select, tuple_, case, cast, Integer
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
+from typing import Callable, Dict, List, Any, NamedTuple, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import wraps
+import inspect
+import json
+import logging
+import threading
+import time
 
-from src.models import Invoice, User, InvoiceStatus, ExpenseCategory, PaymentMethod
+from src.database import settings
+
+from src.models import Invoice, InvoiceDailyRollup, User, InvoiceStatus, ExpenseCategory, PaymentMethod
+from src.services.dashboard_cache import get_dashboard_cache
+
+logger = logging.getLogger(__name__)
+
+
+class InvoiceAggregates(NamedTuple):
+    """Totales de facturas por estado, categoría y método de pago."""
+    total_users: int
+    total_invoices: int
+    total_amount: float
+    by_status: Dict[InvoiceStatus, Tuple[int, float]]
+    by_category: Dict[ExpenseCategory, Tuple[int, float]]
+    by_payment_method: Dict[PaymentMethod, Tuple[int, float]]
+
+
+class DashboardScope(NamedTuple):
+    """Alcance de las estadísticas: rango de días (inclusivo), colaborador y categoría."""
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    user_id: Optional[int] = None
+    category: Optional[ExpenseCategory] = None
+    
+    def cache_key(self) -> str:
+        """Representación estable del alcance para las claves de la caché."""
+        return json.dumps({
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'user_id': self.user_id,
+            'category': self.category.value if self.category else None,
+        }, sort_keys=True)
+    
+    def rollup_filters(self) -> list:
+        """Condiciones del alcance sobre los rollups diarios."""
+        conditions = []
+        if self.start_date:
+            conditions.append(InvoiceDailyRollup.day >= self.start_date)
+        if self.end_date:
+            conditions.append(InvoiceDailyRollup.day <= self.end_date)
+        if self.user_id is not None:
+            conditions.append(InvoiceDailyRollup.user_id == self.user_id)
+        if self.category:
+            conditions.append(InvoiceDailyRollup.category == self.category)
+        return conditions
+    
+    def invoice_filters(self) -> list:
+        """Condiciones del alcance sobre la tabla de facturas."""
+        conditions = []
+        if self.start_date:
+            conditions.append(Invoice.date >= datetime.combine(self.start_date, datetime.min.time()))
+        if self.end_date:
+            # Inclusivo: hasta el inicio del día siguiente
+            conditions.append(Invoice.date < datetime.combine(self.end_date + timedelta(days=1), datetime.min.time()))
+        if self.user_id is not None:
+            conditions.append(Invoice.user_id == self.user_id)
+        if self.category:
+            conditions.append(Invoice.category == self.category)
+        return conditions
+
+
+# Alcance sin filtros: todas las facturas
+GLOBAL_SCOPE = DashboardScope()
+
+
+def _add_to_group(groups: Dict, key, count: int, total) -> None:
+    """Acumular cantidad y monto en un grupo."""
+    previous_count, previous_total = groups.get(key, (0, 0.0))
+    groups[key] = (previous_count + int(count or 0), previous_total + float(total or 0))
+
+
+def _ordered(groups: Dict, enum_class) -> Dict:
+    """Ordenar los grupos según la declaración del enum."""
+    return {member: groups[member] for member in enum_class if member in groups}
+
+
+def aggregate_invoices(db: Session, scope: DashboardScope = GLOBAL_SCOPE) -> InvoiceAggregates:
+    """
+    Calcular en una sola consulta los totales generales y las distribuciones
+    por estado, categoría y método de pago.
+
+    En PostgreSQL usa `GROUPING SETS`: cada conjunto produce las filas de
+    una distribución y el conjunto vacío el total general. En otros motores
+    agrupa por la combinación (estado, categoría, método de pago), que tiene
+    como máximo unas decenas de filas, y acumula las distribuciones en Python.
+    El número de usuarios viaja en la misma consulta como subconsulta escalar.
+    Los conteos y montos se suman desde los rollups diarios.
+
+    Args:
+        db: Sesión de base de datos
+        scope: Alcance de las estadísticas (por defecto todas las facturas)
+
+    Returns:
+        InvoiceAggregates con los totales y distribuciones
+    """
+    users = select(func.count(User.id))
+    if scope.user_id is not None:
+        users = users.where(User.id == scope.user_id)
+    user_count = users.scalar_subquery()
+    rollup = InvoiceDailyRollup
+    conditions = scope.rollup_filters()
+    count = func.sum(rollup.invoice_count)
+    total = func.sum(rollup.total_amount)
+    by_status, by_category, by_payment_method = {}, {}, {}
+    total_users: Optional[int] = None
+    total_invoices, total_amount = 0, 0.0
+
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.query(
+            user_count,
+            rollup.status, rollup.category, rollup.payment_method,
+            func.grouping(rollup.status), func.grouping(rollup.category), func.grouping(rollup.payment_method),
+            count, total
+        ).filter(*conditions).group_by(func.grouping_sets(
+            tuple_(rollup.status), tuple_(rollup.category), tuple_(rollup.payment_method), tuple_()
+        )).all()
+
+        for users, status, category, method, no_status, no_category, no_method, number, amount in rows:
+            total_users = users
+            if not no_status:
+                _add_to_group(by_status, status, number, amount)
+            elif not no_category:
+                _add_to_group(by_category, category, number, amount)
+            elif not no_method:
+                _add_to_group(by_payment_method, method, number, amount)
+            else:
+                total_invoices, total_amount = int(number or 0), float(amount or 0)
+    else:
+        rows = db.query(
+            user_count, rollup.status, rollup.category, rollup.payment_method, count, total
+        ).filter(*conditions).group_by(rollup.status, rollup.category, rollup.payment_method).all()
+
+        for users, status, category, method, number, amount in rows:
+            total_users = users
+            _add_to_group(by_status, status, number, amount)
+            _add_to_group(by_category, category, number, amount)
+            _add_to_group(by_payment_method, method, number, amount)
+            total_invoices += number
+            total_amount += float(amount or 0)
+
+    if total_users is None:
+        # Sin facturas no hay filas agrupadas que lleven el conteo de usuarios
+        total_users = db.execute(users).scalar()
+
+    return InvoiceAggregates(
+        total_users=total_users,
+        total_invoices=total_invoices,
+        total_amount=total_amount,
+        by_status=_ordered(by_status, InvoiceStatus),
+        by_category=_ordered(by_category, ExpenseCategory),
+        by_payment_method=_ordered(by_payment_method, PaymentMethod),
+    )
+
+
+# Percentiles del tiempo de validación
+VALIDATION_PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class ValidationTiming(NamedTuple):
+    """Resumen del tiempo entre la carga y la validación de las facturas, en horas."""
+    count: int
+    avg_hours: float
+    percentiles: Dict[float, float]
+
+
+def validation_hours(db: Session):
+    """
+    Expresión SQL de las horas entre la carga y la validación de una factura.
+    
+    Args:
+        db: Sesión de base de datos
+        
+    Returns:
+        Expresión compatible con el motor de la sesión
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return extract('epoch', Invoice.validated_at - Invoice.created_at) / 3600.0
+    return (func.julianday(Invoice.validated_at) - func.julianday(Invoice.created_at)) * 24.0
+
+
+def _timed_validations(scope: DashboardScope):
+    """Condición de las facturas validadas o rechazadas con tiempo de validación, dentro del alcance."""
+    return and_(
+        Invoice.status.in_([InvoiceStatus.VALIDATED, InvoiceStatus.REJECTED]),
+        Invoice.validated_at.isnot(None),
+        Invoice.created_at.isnot(None),
+        *scope.invoice_filters()
+    )
+
+
+def aggregate_validation_timing(db: Session, scope: DashboardScope = GLOBAL_SCOPE) -> ValidationTiming:
+    """
+    Calcular en una consulta el número, promedio y percentiles del tiempo de
+    validación, sin cargar las facturas.
+    
+    En PostgreSQL usa `percentile_cont`. En otros motores numera los tiempos
+    con `ROW_NUMBER()` y calcula la misma interpolación lineal sumando solo
+    las dos posiciones que rodean a cada percentil.
+    
+    Args:
+        db: Sesión de base de datos
+        scope: Alcance de las estadísticas (por fecha de la factura)
+        
+    Returns:
+        ValidationTiming con las horas de validación
+    """
+    hours = validation_hours(db)
+    
+    if db.get_bind().dialect.name == "postgresql":
+        row = db.query(
+            func.count(),
+            func.avg(hours),
+            *[func.percentile_cont(p).within_group(hours) for p in VALIDATION_PERCENTILES]
+        ).filter(_timed_validations(scope)).one()
+    else:
+        ranked = select(
+            hours.label('hours'),
+            func.row_number().over(order_by=hours).label('position'),
+            func.count().over().label('total')
+        ).where(_timed_validations(scope)).subquery()
+        
+        def percentile(p: float):
+            rank = p * (ranked.c.total - 1)
+            lower = cast(rank, Integer)  # Truncado: rank nunca es negativo
+            fraction = rank - lower
+            return func.sum(case(
+                (ranked.c.position == lower + 1, ranked.c.hours * (1 - fraction)),
+                (ranked.c.position == lower + 2, ranked.c.hours * fraction),
+                else_=0
+            ))
+        
+        row = db.query(
+            func.count(),
+            func.avg(ranked.c.hours),
+            *[percentile(p) for p in VALIDATION_PERCENTILES]
+        ).select_from(ranked).one()
+    
+    count, avg_hours, *values = row
+    return ValidationTiming(
+        count=count,
+        avg_hours=float(avg_hours or 0),
+        percentiles={p: float(value or 0) for p, value in zip(VALIDATION_PERCENTILES, values)}
+    )
+
+
+def validator_throughput(db: Session, scope: DashboardScope = GLOBAL_SCOPE) -> List[Dict[str, Any]]:
+    """
+    Calcular por validador las facturas validadas y rechazadas, el tiempo
+    promedio de validación y las validaciones por día en su periodo activo.
+    
+    Args:
+        db: Sesión de base de datos
+        scope: Alcance de las estadísticas (por fecha de la factura)
+        
+    Returns:
+        Lista de validadores ordenada por número de validaciones
+    """
+    hours = validation_hours(db)
+    total = func.count(Invoice.id)
+    rows = db.query(
+        User.id,
+        User.name,
+        total,
+        func.sum(case((Invoice.status == InvoiceStatus.VALIDATED, 1), else_=0)),
+        func.sum(case((Invoice.status == InvoiceStatus.REJECTED, 1), else_=0)),
+        func.avg(hours),
+        func.min(Invoice.validated_at),
+        func.max(Invoice.validated_at)
+    ).join(
+        Invoice, Invoice.validated_by == User.id
+    ).filter(
+        _timed_validations(scope)
+    ).group_by(
+        User.id, User.name
+    ).order_by(
+        total.desc(), User.id
+    ).all()
+    
+    validators = []
+    for user_id, name, count, validated, rejected, avg_hours, first, last in rows:
+        # Periodo activo de al menos un día
+        active_days = max((last - first).total_seconds() / 86400, 1.0)
+        validators.append({
+            'user_id': user_id,
+            'name': name,
+            'total': count,
+            'validated': int(validated or 0),
+            'rejected': int(rejected or 0),
+            'avg_validation_time_hours': round(float(avg_hours or 0), 2),
+            'validations_per_day': round(count / active_days, 2)
+        })
+    
+    return validators
+
+
+def cached_section(method):
+    """
+    Guardar el resultado de una sección del dashboard en la caché.
+    
+    La clave es el nombre del método con el alcance del servicio y sus
+    argumentos (incluidos los valores por defecto). La generación se toma antes de calcular, para no
+    guardar un resultado obtenido antes de una invalidación.
+    """
+    signature = inspect.signature(method)
+    
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.cache is None:
+            return method(self, *args, **kwargs)
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(list(bound.arguments.items())[1:])
+        key = f"{method.__name__}:{self.scope.cache_key()}:{json.dumps(arguments, sort_keys=True)}"
+        
+        value = self.cache.get(key)
+        if value is None:
+            generation = self.cache.generation()
+            value = method(self, *args, **kwargs)
+            self.cache.set(key, value, generation)
+        return value
+    
+    return wrapper
 
 
 class DashboardStatsService:
-    """Servicio para calcular estadísticas del dashboard."""
+    """Servicio para calcular estadísticas del dashboard dentro de un alcance."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, scope: Optional[DashboardScope] = None, use_cache: bool = True):
         self.db = db
+        self.scope = scope or GLOBAL_SCOPE
+        self.cache = get_dashboard_cache() if use_cache else None
+        self._aggregates: Optional[InvoiceAggregates] = None
+    
+    def get_invoice_aggregates(self) -> InvoiceAggregates:
+        """
+        Obtener los totales agregados, calculados una sola vez por servicio.
+        
+        Returns:
+            InvoiceAggregates compartido por las estadísticas básicas, las
+            distribuciones y el rendimiento de validación
+        """
+        if self._aggregates is None:
+            self._aggregates = aggregate_invoices(self.db, self.scope)
+        return self._aggregates
     
+    @cached_section
     def get_basic_stats(self) -> Dict[str, Any]:
         """
         Obtener estadísticas básicas del sistema.
@@ -25,78 +375,64 @@ class DashboardStatsService:
         Returns:
             Dict con estadísticas básicas
         """
-        # Contar usuarios
-        total_users = self.db.query(User).count()
-        
-        # Contar facturas por estado
-        invoices_by_status = self.db.query(
-            Invoice.status,
-            func.count(Invoice.id).label('count')
-        ).group_by(Invoice.status).all()
-        
-        status_counts = {status.value: count for status, count in invoices_by_status}
-        
-        # Calcular monto total
-        total_amount = self.db.query(func.sum(Invoice.amount)).scalar() or 0
-        
-        # Calcular monto por estado
-        amount_by_status = self.db.query(
-            Invoice.status,
-            func.sum(Invoice.amount).label('total')
-        ).group_by(Invoice.status).all()
-        
-        amount_by_status_dict = {status.value: total for status, total in amount_by_status}
+        aggregates = self.get_invoice_aggregates()
         
         return {
-            'total_users': total_users,
-            'total_invoices': sum(status_counts.values()),
-            'total_amount': float(total_amount),
-            'invoices_by_status': status_counts,
-            'amount_by_status': amount_by_status_dict
+            'total_users': aggregates.total_users,
+            'total_invoices': aggregates.total_invoices,
+            'total_amount': aggregates.total_amount,
+            'invoices_by_status': {status.value: count for status, (count, _) in aggregates.by_status.items()},
+            'amount_by_status': {status.value: total for status, (_, total) in aggregates.by_status.items()}
         }
     
+    @cached_section
     def get_monthly_trends(self, months: int = 6) -> List[Dict[str, Any]]:
         """
         Obtener tendencias mensuales de facturas.
         
+        Los meses se cuentan hacia atrás desde el mes de `end_date` del
+        alcance (o el actual), sin salir del rango del alcance.
+        
         Args:
-            months: Número de meses a incluir
+            months: Número de meses calendario a incluir, contando el último
             
         Returns:
             Lista de datos mensuales
         """
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=months * 30)
+        if months <= 0:
+            return []
+        
+        # Primer día del mes calendario más antiguo incluido
+        anchor = self.scope.end_date or date.today()
+        month_index = anchor.year * 12 + anchor.month - 1 - (months - 1)
+        start_day = date(month_index // 12, month_index % 12 + 1, 1)
         
-        # Obtener facturas por mes
+        year = extract('year', InvoiceDailyRollup.day)
+        month = extract('month', InvoiceDailyRollup.day)
         monthly_data = self.db.query(
-            extract('year', Invoice.date).label('year'),
-            extract('month', Invoice.date).label('month'),
-            func.count(Invoice.id).label('count'),
-            func.sum(Invoice.amount).label('total_amount')
+            year.label('year'),
+            month.label('month'),
+            func.sum(InvoiceDailyRollup.invoice_count).label('count'),
+            func.sum(InvoiceDailyRollup.total_amount).label('total_amount')
         ).filter(
-            Invoice.date >= start_date
-        ).group_by(
-            extract('year', Invoice.date),
-            extract('month', Invoice.date)
-        ).order_by(
-            extract('year', Invoice.date),
-            extract('month', Invoice.date)
-        ).all()
+            InvoiceDailyRollup.day >= start_day,
+            *self.scope.rollup_filters()
+        ).group_by(year, month).order_by(year, month).all()
         
         # Formatear datos
         trends = []
-        for year, month, count, total_amount in monthly_data:
+        for year_value, month_value, count, total_amount in monthly_data:
             trends.append({
-                'year': int(year),
-                'month': int(month),
-                'month_name': datetime(int(year), int(month), 1).strftime('%B'),
-                'count': count,
+                'year': int(year_value),
+                'month': int(month_value),
+                'month_name': datetime(int(year_value), int(month_value), 1).strftime('%B'),
+                'count': int(count or 0),
                 'total_amount': float(total_amount or 0)
             })
         
         return trends
     
+    @cached_section
     def get_user_stats(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Obtener estadísticas por usuario.
@@ -107,34 +443,40 @@ class DashboardStatsService:
         Returns:
             Lista de estadísticas por usuario
         """
+        invoice_count = func.sum(InvoiceDailyRollup.invoice_count)
+        total_amount = func.sum(InvoiceDailyRollup.total_amount)
         user_stats = self.db.query(
             User.id,
             User.name,
             User.email,
-            func.count(Invoice.id).label('invoice_count'),
-            func.sum(Invoice.amount).label('total_amount'),
-            func.avg(Invoice.amount).label('avg_amount')
+            invoice_count.label('invoice_count'),
+            total_amount.label('total_amount')
         ).join(
-            Invoice, User.id == Invoice.user_id
+            InvoiceDailyRollup, User.id == InvoiceDailyRollup.user_id
+        ).filter(
+            *self.scope.rollup_filters()
         ).group_by(
             User.id, User.name, User.email
         ).order_by(
-            func.sum(Invoice.amount).desc()
+            total_amount.desc()
         ).limit(limit).all()
         
         stats = []
-        for user_id, name, email, count, total, avg in user_stats:
+        for user_id, name, email, count, total in user_stats:
+            count = int(count or 0)
+            total = float(total or 0)
             stats.append({
                 'user_id': user_id,
                 'name': name,
                 'email': email,
                 'invoice_count': count,
-                'total_amount': float(total or 0),
-                'avg_amount': float(avg or 0)
+                'total_amount': total,
+                'avg_amount': total / count if count else 0.0
             })
         
         return stats
     
+    @cached_section
     def get_category_distribution(self) -> List[Dict[str, Any]]:
         """
         Obtener distribución de facturas por categoría.
@@ -142,16 +484,8 @@ class DashboardStatsService:
         Returns:
             Lista de distribución por categoría
         """
-        category_stats = self.db.query(
-            Invoice.category,
-            func.count(Invoice.id).label('count'),
-            func.sum(Invoice.amount).label('total_amount')
-        ).group_by(
-            Invoice.category
-        ).all()
-        
         distribution = []
-        for category, count, total_amount in category_stats:
+        for category, (count, total_amount) in self.get_invoice_aggregates().by_category.items():
             distribution.append({
                 'category': category.value,
                 'category_label': category.value.replace('_', ' ').title(),
@@ -161,6 +495,7 @@ class DashboardStatsService:
         
         return distribution
     
+    @cached_section
     def get_payment_method_distribution(self) -> List[Dict[str, Any]]:
         """
         Obtener distribución de facturas por método de pago.
@@ -168,16 +503,8 @@ class DashboardStatsService:
         Returns:
             Lista de distribución por método de pago
         """
-        payment_stats = self.db.query(
-            Invoice.payment_method,
-            func.count(Invoice.id).label('count'),
-            func.sum(Invoice.amount).label('total_amount')
-        ).group_by(
-            Invoice.payment_method
-        ).all()
-        
         distribution = []
-        for method, count, total_amount in payment_stats:
+        for method, (count, total_amount) in self.get_invoice_aggregates().by_payment_method.items():
             distribution.append({
                 'method': method.value,
                 'method_label': method.value.replace('_', ' ').title(),
@@ -187,41 +514,56 @@ class DashboardStatsService:
         
         return distribution
     
+    @cached_section
     def get_validation_performance(self) -> Dict[str, Any]:
         """
         Obtener métricas de rendimiento de validación.
         
+        Los conteos salen de la agregación compartida; los tiempos
+        (promedio y percentiles desde la carga hasta la validación) y el
+        rendimiento por validador se calculan en SQL sobre las facturas con
+        `validated_at`.
+        
         Returns:
             Dict con métricas de validación
         """
-        # Obtener facturas validadas con fechas de validación
-        validated_invoices = self.db.query(Invoice).filter(
-            Invoice.status.in_([InvoiceStatus.VALIDATED, InvoiceStatus.REJECTED])
-        ).all()
+        # Conteos por estado de la agregación compartida
+        by_status = self.get_invoice_aggregates().by_status
+        total_validated = sum(
+            by_status.get(status, (0, 0.0))[0]
+            for status in (InvoiceStatus.VALIDATED, InvoiceStatus.REJECTED)
+        )
         
-        if not validated_invoices:
+        if not total_validated:
             return {
                 'avg_validation_time_hours': 0,
+                'p50_validation_time_hours': 0,
+                'p90_validation_time_hours': 0,
+                'p99_validation_time_hours': 0,
+                'timed_validations': 0,
                 'total_validated': 0,
-                'validation_rate': 0
+                'validation_rate': 0,
+                'by_validator': []
             }
         
-        # Calcular tiempo promedio de validación (simulado)
-        # En un sistema real, tendríamos timestamps de validación
-        total_validated = len(validated_invoices)
-        pending_count = self.db.query(Invoice).filter(
-            Invoice.status == InvoiceStatus.PENDING
-        ).count()
-        
+        pending_count = by_status.get(InvoiceStatus.PENDING, (0, 0.0))[0]
         total_invoices = total_validated + pending_count
         validation_rate = (total_validated / total_invoices * 100) if total_invoices > 0 else 0
         
+        timing = aggregate_validation_timing(self.db, self.scope)
+        
         return {
-            'avg_validation_time_hours': 24,  # Simulado
+            'avg_validation_time_hours': round(timing.avg_hours, 2),
+            'p50_validation_time_hours': round(timing.percentiles[0.5], 2),
+            'p90_validation_time_hours': round(timing.percentiles[0.9], 2),
+            'p99_validation_time_hours': round(timing.percentiles[0.99], 2),
+            'timed_validations': timing.count,
             'total_validated': total_validated,
-            'validation_rate': round(validation_rate, 2)
+            'validation_rate': round(validation_rate, 2),
+            'by_validator': validator_throughput(self.db, self.scope)
         }
     
+    @cached_section
     def get_recent_activity(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Obtener actividad reciente del sistema.
@@ -234,6 +576,10 @@ class DashboardStatsService:
         """
         recent_invoices = self.db.query(Invoice).join(
             User, Invoice.user_id == User.id
+        ).options(
+            contains_eager(Invoice.user)
+        ).filter(
+            *self.scope.invoice_filters()
         ).order_by(
             Invoice.created_at.desc()
         ).limit(limit).all()
@@ -253,24 +599,197 @@ class DashboardStatsService:
         return activities
 
 
-def get_dashboard_stats(db: Session) -> Dict[str, Any]:
+# Secciones del dashboard y el método que las calcula, en el orden de la respuesta
+DASHBOARD_SECTIONS = {
+    'basic_stats': 'get_basic_stats',
+    'monthly_trends': 'get_monthly_trends',
+    'user_stats': 'get_user_stats',
+    'category_distribution': 'get_category_distribution',
+    'payment_method_distribution': 'get_payment_method_distribution',
+    'validation_performance': 'get_validation_performance',
+    'recent_activity': 'get_recent_activity',
+}
+
+# Grupos que se calculan en paralelo; las secciones de un grupo comparten la
+# sesión (las cuatro primeras comparten además la agregación de facturas)
+SECTION_GROUPS = (
+    ('basic_stats', 'category_distribution', 'payment_method_distribution', 'validation_performance'),
+    ('monthly_trends',),
+    ('user_stats',),
+    ('recent_activity',),
+)
+
+_executor = ThreadPoolExecutor(max_workers=settings.dashboard_workers, thread_name_prefix="dashboard")
+
+
+class _GroupRun:
+    """Progreso de un grupo de secciones, compartido entre su hilo y la petición que lo espera."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.started: Dict[str, float] = {}
+        self.finished: set = set()
+        self.cancelled = False
+
+    def start(self, name: str) -> bool:
+        """Registrar el inicio de una sección; False si el grupo ya se canceló."""
+        with self.condition:
+            if self.cancelled:
+                return False
+            self.started[name] = time.monotonic()
+            return True
+
+    def finish(self, name: str) -> None:
+        with self.condition:
+            self.finished.add(name)
+            self.condition.notify_all()
+
+    def wait(self, name: str, waiting_since: float, timeout: float) -> bool:
+        """
+        Esperar a que una sección termine, como máximo `timeout` segundos desde
+        su inicio (o desde `waiting_since` si todavía no empezó).
+
+        Returns:
+            bool: True si terminó; si no, el grupo queda cancelado
+        """
+        with self.condition:
+            while name not in self.finished:
+                limit = self.started.get(name, waiting_since) + timeout
+                remaining = limit - time.monotonic()
+                if remaining <= 0:
+                    self.cancelled = True
+                    return False
+                self.condition.wait(remaining)
+            return True
+
+
+def _supports_parallel_sessions(session_factory: Callable[[], Session]) -> bool:
+    """Determinar si el pool entrega conexiones distintas a cada sesión."""
+    bind = session_factory.kw.get("bind") if hasattr(session_factory, "kw") else None
+    return bind is not None and not isinstance(bind.pool, (StaticPool, SingletonThreadPool))
+
+
+def _apply_statement_timeout(db: Session, timeout: float) -> None:
+    """
+    Limitar cada consulta de la sesión a `timeout` segundos en PostgreSQL.
+
+    `SET LOCAL` solo dura hasta el fin de la transacción, así que se vuelve a
+    aplicar al comenzar cada una (también después de un rollback).
+    """
+    milliseconds = int(timeout * 1000)
+
+    @event.listens_for(db, "after_begin")
+    def set_statement_timeout(session, transaction, connection):
+        # Que la base de datos cancele la consulta en lugar de dejar el hilo ocupado
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {milliseconds}")
+
+
+def _run_section_group(
+    session_factory: Callable[[], Session],
+    sections: Tuple[str, ...],
+    results: Dict[str, Any],
+    errors: Dict[str, str],
+    timeout: Optional[float],
+    scope: DashboardScope = GLOBAL_SCOPE,
+    run: Optional[_GroupRun] = None
+) -> None:
+    """
+    Calcular un grupo de secciones con su propia sesión, guardando cada resultado al terminar.
+
+    Si la petición deja de esperar (`run` cancelado), las secciones restantes
+    del grupo no se calculan.
+    """
+    run = run or _GroupRun()
+    db = None
+    try:
+        db = session_factory()
+        if timeout and db.get_bind().dialect.name == "postgresql":
+            _apply_statement_timeout(db, timeout)
+        service = DashboardStatsService(db, scope)
+        for name in sections:
+            if not run.start(name):
+                break
+            try:
+                results[name] = getattr(service, DASHBOARD_SECTIONS[name])()
+            except Exception as e:
+                logger.exception(f"Error calculando la sección {name} del dashboard")
+                errors[name] = str(e)
+                db.rollback()
+            finally:
+                run.finish(name)
+    except Exception as e:
+        logger.exception("Error abriendo la sesión del dashboard")
+        for name in sections:
+            if name not in results:
+                errors.setdefault(name, str(e))
+            run.finish(name)
+    finally:
+        if db is not None:
+            db.close()
+
+
+def get_dashboard_stats(
+    session_factory: Callable[[], Session],
+    timeout: Optional[float] = None,
+    scope: Optional[DashboardScope] = None
+) -> Dict[str, Any]:
     """
     Función principal para obtener todas las estadísticas del dashboard.
     
+    Los grupos de secciones se calculan en paralelo en un pool de hilos
+    propio del dashboard, cada uno con una sesión propia. Cada sección tiene
+    `timeout` segundos desde que empieza (o desde que se encoló su grupo si
+    el pool está ocupado); las que no terminan a tiempo o que fallan se
+    devuelven como None y se informan en `section_errors`. Una sección
+    vencida cancela el resto de su grupo y en PostgreSQL `statement_timeout`
+    corta la consulta en curso. Con un pool de una sola conexión compartida
+    (StaticPool, p. ej. SQLite en memoria) las secciones se calculan en
+    secuencia.
+    
     Args:
-        db: Sesión de base de datos
+        session_factory: Fábrica de sesiones de base de datos
+        timeout: Segundos máximos por sección (por defecto `settings.dashboard_section_timeout`)
+        scope: Alcance de las estadísticas (por defecto todas las facturas)
         
     Returns:
         Dict con todas las estadísticas del dashboard
     """
-    service = DashboardStatsService(db)
+    if timeout is None:
+        timeout = settings.dashboard_section_timeout
+    scope = scope or GLOBAL_SCOPE
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    
+    if _supports_parallel_sessions(session_factory):
+        submitted = time.monotonic()
+        runs = []
+        for sections in SECTION_GROUPS:
+            run = _GroupRun()
+            future = _executor.submit(
+                _run_section_group, session_factory, sections, results, errors, timeout, scope, run
+            )
+            runs.append((sections, run, future))
+        for sections, run, future in runs:
+            waiting_since = submitted
+            for name in sections:
+                if not run.wait(name, waiting_since, timeout):
+                    # Si el grupo sigue en la cola, no llega a ejecutarse
+                    future.cancel()
+                    break
+                waiting_since = time.monotonic()
+    else:
+        for sections in SECTION_GROUPS:
+            _run_section_group(session_factory, sections, results, errors, None, scope)
+    
+    # Copia de los resultados en el momento del corte
+    finished = dict(results)
+    section_errors = dict(errors)
+    for name in DASHBOARD_SECTIONS:
+        if name not in finished and name not in section_errors:
+            section_errors[name] = "timeout"
     
     return {
-        'basic_stats': service.get_basic_stats(),
-        'monthly_trends': service.get_monthly_trends(),
-        'user_stats': service.get_user_stats(),
-        'category_distribution': service.get_category_distribution(),
-        'payment_method_distribution': service.get_payment_method_distribution(),
-        'validation_performance': service.get_validation_performance(),
-        'recent_activity': service.get_recent_activity()
+        **{name: finished.get(name) for name in DASHBOARD_SECTIONS},
+        'partial': bool(section_errors),
+        'section_errors': section_errors
     }
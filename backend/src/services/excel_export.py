@@ -1,96 +1,204 @@
 """
 Servicio para exportación de facturas a Excel.
-Genera archivos Excel con las facturas filtradas.
+Genera archivos Excel con las facturas filtradas y su resumen agregado. Los
+libros se escriben con xlsxwriter en modo de memoria constante.
 """
 
 import os
 from datetime import datetime
-from typing import List
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+from enum import Enum
+from typing import IO, Callable, Dict, Iterable, NamedTuple, Optional, Union
+import xlsxwriter
+from sqlalchemy import extract, func
+from sqlalchemy.orm import Session
 
-from src.models import Invoice
+from src.models import Invoice, User
 
 
-def export_invoices_to_excel(invoices: List[Invoice]) -> str:
+# Encabezados y anchos de columna del reporte de facturas
+EXPORT_HEADERS = [
+    "ID", "Colaborador", "Fecha", "Proveedor", "Monto",
+    "Método de Pago", "Categoría", "Estado", "Descripción", "Fecha de Registro"
+]
+COLUMN_WIDTHS = [8, 20, 12, 25, 12, 15, 15, 12, 30, 18]
+
+# Formato de moneda de la columna de montos
+CURRENCY_FORMAT = '"$"#,##0.00'
+
+# Filas leídas por lote del cursor de la base de datos
+EXPORT_BATCH_SIZE = 2000
+
+# Columnas exportadas: se leen como tuplas, sin construir objetos ORM
+EXPORT_COLUMNS = (
+    Invoice.id,
+    User.name.label("user_name"),
+    Invoice.date,
+    Invoice.provider,
+    Invoice.amount,
+    Invoice.payment_method,
+    Invoice.category,
+    Invoice.status,
+    Invoice.description,
+    Invoice.created_at,
+)
+
+
+class ExportTotals(NamedTuple):
+    """Totales de una exportación calculados en la base de datos."""
+    count: int
+    amount: float
+
+
+def invoice_export_query(db: Session):
+    """
+    Consulta base de la exportación con solo las columnas del reporte.
+
+    Args:
+        db: Sesión de base de datos
+
+    Returns:
+        Query: Consulta de tuplas sobre Invoice unida a User, lista para filtrar
+    """
+    return db.query(*EXPORT_COLUMNS).join(User, Invoice.user_id == User.id)
+
+
+def export_totals(query) -> ExportTotals:
+    """
+    Calcular el número de facturas y el monto total con una sola consulta SQL.
+
+    Args:
+        query: Consulta de exportación ya filtrada
+
+    Returns:
+        ExportTotals: Número de facturas y suma de montos
+    """
+    count, amount = query.with_entities(
+        func.count(Invoice.id), func.coalesce(func.sum(Invoice.amount), 0.0)
+    ).order_by(None).one()
+    return ExportTotals(count=count, amount=float(amount))
+
+
+def iter_export_rows(query, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Iterar las filas de exportación por lotes.
+
+    Con `yield_per` SQLAlchemy usa un cursor del lado del servidor en
+    PostgreSQL y solo mantiene en memoria un lote de filas a la vez.
+
+    Args:
+        query: Consulta de exportación ya filtrada
+        batch_size: Filas por lote
+
+    Returns:
+        Iterator de filas con los atributos de `EXPORT_COLUMNS`
+    """
+    return query.order_by(Invoice.date, Invoice.id).yield_per(batch_size)
+
+
+def _invoice_formats(workbook: xlsxwriter.Workbook) -> Dict[str, xlsxwriter.format.Format]:
+    """
+    Crear los formatos compartidos del reporte.
+
+    Cada formato se registra una sola vez en el libro y se reutiliza en todas
+    las celdas, en lugar de crear un estilo por celda.
+    """
+    return {
+        "title": workbook.add_format({
+            "bold": True, "font_size": 16, "align": "center", "valign": "vcenter",
+            "bg_color": "#D9E2F3"
+        }),
+        "subtitle": workbook.add_format({"italic": True, "align": "center", "valign": "vcenter"}),
+        "header": workbook.add_format({
+            "bold": True, "font_color": "#FFFFFF", "bg_color": "#366092",
+            "align": "center", "valign": "vcenter", "border": 1
+        }),
+        "cell": workbook.add_format({"border": 1}),
+        "amount": workbook.add_format({"border": 1, "num_format": CURRENCY_FORMAT}),
+        "total_label": workbook.add_format({"bold": True}),
+        "total": workbook.add_format({"bold": True, "num_format": CURRENCY_FORMAT}),
+    }
+
+
+def write_invoices_workbook(
+    rows: Iterable,
+    output: Union[str, IO[bytes]],
+    total_amount: float,
+    progress: Optional[Callable[[int], None]] = None,
+    progress_every: int = EXPORT_BATCH_SIZE
+) -> int:
+    """
+    Escribir el reporte de facturas en un libro Excel en memoria constante.
+
+    Las filas se escriben en orden (título, fecha de generación, encabezados,
+    datos y total) y xlsxwriter las vuelca a disco a medida que avanza, por lo
+    que la memoria no crece con el número de facturas.
+
+    Args:
+        rows: Filas de exportación (ver `EXPORT_COLUMNS`), normalmente un iterador
+        output: Ruta o archivo binario de destino
+        total_amount: Monto total calculado en la base de datos
+        progress: Función opcional que recibe el número de filas escritas
+        progress_every: Cada cuántas filas se informa el progreso
+
+    Returns:
+        int: Número de facturas escritas
+    """
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    try:
+        ws = workbook.add_worksheet("Facturas Boosting")
+        formats = _invoice_formats(workbook)
+        last_col = len(EXPORT_HEADERS) - 1
+
+        for col, width in enumerate(COLUMN_WIDTHS):
+            ws.set_column(col, col, width)
+
+        # Título y fecha de generación antes de los datos
+        ws.merge_range(0, 0, 0, last_col, "REPORTE DE FACTURAS - BOOSTING", formats["title"])
+        ws.merge_range(
+            1, 0, 1, last_col,
+            f"Generado el: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            formats["subtitle"]
+        )
+        ws.write_row(2, 0, EXPORT_HEADERS, formats["header"])
+
+        row = 3
+        for invoice in rows:
+            ws.write_number(row, 0, invoice.id, formats["cell"])
+            ws.write_string(row, 1, invoice.user_name, formats["cell"])
+            ws.write_string(row, 2, invoice.date.strftime("%Y-%m-%d"), formats["cell"])
+            ws.write_string(row, 3, invoice.provider, formats["cell"])
+            ws.write_number(row, 4, invoice.amount, formats["amount"])
+            ws.write_string(row, 5, invoice.payment_method.value, formats["cell"])
+            ws.write_string(row, 6, invoice.category.value, formats["cell"])
+            ws.write_string(row, 7, invoice.status.value, formats["cell"])
+            ws.write_string(row, 8, invoice.description or "", formats["cell"])
+            ws.write_string(row, 9, invoice.created_at.strftime("%Y-%m-%d %H:%M"), formats["cell"])
+            row += 1
+            if progress and (row - 3) % progress_every == 0:
+                progress(row - 3)
+
+        # Totales
+        ws.write_string(row, 3, "TOTAL:", formats["total_label"])
+        ws.write_number(row, 4, total_amount, formats["total"])
+    finally:
+        workbook.close()
+
+    if progress:
+        progress(row - 3)
+    return row - 3
+
+
+def export_invoices_to_excel(rows: Iterable, total_amount: float) -> str:
     """
     Exportar facturas a archivo Excel con formato profesional.
     
     Args:
-        invoices: Lista de facturas a exportar
+        rows: Filas de exportación (ver `EXPORT_COLUMNS`)
+        total_amount: Monto total calculado en la base de datos
         
     Returns:
         str: Ruta del archivo Excel generado
     """
-    # Crear workbook y worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Facturas Boosting"
-    
-    # Definir estilos
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    center_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Encabezados
-    headers = [
-        "ID", "Colaborador", "Fecha", "Proveedor", "Monto", 
-        "Método de Pago", "Categoría", "Estado", "Descripción", "Fecha de Registro"
-    ]
-    
-    # Escribir encabezados
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_alignment
-        cell.border = border
-    
-    # Escribir datos
-    for row, invoice in enumerate(invoices, 2):
-        ws.cell(row=row, column=1, value=invoice.id).border = border
-        ws.cell(row=row, column=2, value=invoice.user.name).border = border
-        ws.cell(row=row, column=3, value=invoice.date.strftime("%Y-%m-%d")).border = border
-        ws.cell(row=row, column=4, value=invoice.provider).border = border
-        ws.cell(row=row, column=5, value=f"${invoice.amount:,.2f}").border = border
-        ws.cell(row=row, column=6, value=invoice.payment_method.value).border = border
-        ws.cell(row=row, column=7, value=invoice.category.value).border = border
-        ws.cell(row=row, column=8, value=invoice.status.value).border = border
-        ws.cell(row=row, column=9, value=invoice.description or "").border = border
-        ws.cell(row=row, column=10, value=invoice.created_at.strftime("%Y-%m-%d %H:%M")).border = border
-    
-    # Ajustar ancho de columnas
-    column_widths = [8, 20, 12, 25, 12, 15, 15, 12, 30, 18]
-    for col, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    # Agregar información del reporte
-    ws.insert_rows(1)
-    ws.merge_cells(f"A1:{get_column_letter(len(headers))}1")
-    title_cell = ws.cell(row=1, column=1, value="REPORTE DE FACTURAS - BOOSTING")
-    title_cell.font = Font(bold=True, size=16)
-    title_cell.alignment = center_alignment
-    title_cell.fill = PatternFill(start_color="D9E2F3", end_color="D9E2F3", fill_type="solid")
-    
-    # Agregar fecha de generación
-    ws.insert_rows(2)
-    ws.merge_cells(f"A2:{get_column_letter(len(headers))}2")
-    date_cell = ws.cell(row=2, column=1, value=f"Generado el: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    date_cell.alignment = center_alignment
-    date_cell.font = Font(italic=True)
-    
-    # Agregar totales
-    total_row = len(invoices) + 4
-    ws.cell(row=total_row, column=4, value="TOTAL:").font = Font(bold=True)
-    ws.cell(row=total_row, column=5, value=f"${sum(invoice.amount for invoice in invoices):,.2f}").font = Font(bold=True)
-    
     # Generar nombre de archivo único
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"facturas_boosting_{timestamp}.xlsx"
@@ -99,73 +207,102 @@ def export_invoices_to_excel(invoices: List[Invoice]) -> str:
     # Crear directorio de exports si no existe
     os.makedirs("exports", exist_ok=True)
     
-    # Guardar archivo
-    wb.save(filepath)
+    write_invoices_workbook(rows, filepath, total_amount)
     
     return filepath
 
 
-def export_invoices_summary_to_excel(invoices: List[Invoice]) -> str:
+class InvoiceSummary(NamedTuple):
+    """Agregados del resumen de facturas calculados con GROUP BY."""
+    by_user: list
+    by_category: list
+    by_user_month: list
+    by_category_payment: list
+
+
+def summarize_invoices(query) -> InvoiceSummary:
+    """
+    Calcular los agregados del resumen en la base de datos.
+
+    Cada hoja es una consulta `GROUP BY` con `COUNT` y `SUM`, por lo que el
+    costo es lineal en el número de facturas y no se cargan objetos ORM.
+
+    Args:
+        query: Consulta de exportación ya filtrada (ver `invoice_export_query`)
+
+    Returns:
+        InvoiceSummary: Filas `(grupo..., total, cantidad)` por hoja
     """
-    Exportar resumen de facturas por usuario y categoría.
+    count = func.count(Invoice.id)
+    total = func.sum(Invoice.amount)
+    year = extract("year", Invoice.date)
+    month = extract("month", Invoice.date)
+
+    def grouped(*keys, order_by):
+        return query.with_entities(*keys, total, count).group_by(*keys).order_by(*order_by).all()
+
+    return InvoiceSummary(
+        by_user=[
+            (name, amount, number)
+            for _, name, amount, number in grouped(User.id, User.name, order_by=(total.desc(), User.name))
+        ],
+        by_category=grouped(Invoice.category, order_by=(total.desc(), Invoice.category)),
+        by_user_month=[
+            (name, f"{int(y):04d}-{int(m):02d}", amount, number)
+            for _, name, y, m, amount, number in grouped(
+                User.id, User.name, year, month, order_by=(User.name, User.id, year, month)
+            )
+        ],
+        by_category_payment=grouped(
+            Invoice.category, Invoice.payment_method, order_by=(Invoice.category, Invoice.payment_method)
+        ),
+    )
+
+
+def write_invoices_summary_workbook(summary: InvoiceSummary, output: Union[str, IO[bytes]]) -> None:
+    """
+    Escribir el resumen de facturas en un libro Excel, una hoja por agrupación.
+
+    Args:
+        summary: Agregados calculados por `summarize_invoices`
+        output: Ruta o archivo binario de destino
+    """
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    try:
+        formats = _invoice_formats(workbook)
+        sheets = [
+            ("Resumen por Usuario", ["Usuario"], summary.by_user),
+            ("Resumen por Categoría", ["Categoría"], summary.by_category),
+            ("Usuario por Mes", ["Usuario", "Mes"], summary.by_user_month),
+            ("Categoría por Pago", ["Categoría", "Método de Pago"], summary.by_category_payment),
+        ]
+        for title, group_headers, rows in sheets:
+            ws = workbook.add_worksheet(title)
+            headers = group_headers + ["Total Facturado", "Número de Facturas"]
+            for col in range(len(headers)):
+                ws.set_column(col, col, 22)
+            ws.write_row(0, 0, headers, formats["header"])
+
+            amount_col = len(group_headers)
+            for row, values in enumerate(rows, 1):
+                for col, value in enumerate(values[:amount_col]):
+                    ws.write_string(row, col, value.value if isinstance(value, Enum) else str(value), formats["cell"])
+                ws.write_number(row, amount_col, float(values[amount_col] or 0), formats["amount"])
+                ws.write_number(row, amount_col + 1, values[amount_col + 1], formats["cell"])
+    finally:
+        workbook.close()
+
+
+def export_invoices_summary_to_excel(summary: InvoiceSummary) -> str:
+    """
+    Exportar resumen de facturas por usuario, categoría, mes y método de pago.
     
     Args:
-        invoices: Lista de facturas a exportar
+        summary: Agregados calculados por `summarize_invoices`
         
     Returns:
         str: Ruta del archivo Excel generado
     """
-    wb = openpyxl.Workbook()
-    
-    # Hoja 1: Resumen por usuario
-    ws_users = wb.active
-    ws_users.title = "Resumen por Usuario"
-    
-    # Agrupar por usuario
-    user_totals = {}
-    for invoice in invoices:
-        user_name = invoice.user.name
-        if user_name not in user_totals:
-            user_totals[user_name] = 0
-        user_totals[user_name] += invoice.amount
-    
-    # Escribir resumen por usuario
-    headers = ["Usuario", "Total Facturado", "Número de Facturas"]
-    for col, header in enumerate(headers, 1):
-        ws_users.cell(row=1, column=col, value=header)
-    
-    row = 2
-    for user_name, total in user_totals.items():
-        count = len([inv for inv in invoices if inv.user.name == user_name])
-        ws_users.cell(row=row, column=1, value=user_name)
-        ws_users.cell(row=row, column=2, value=f"${total:,.2f}")
-        ws_users.cell(row=row, column=3, value=count)
-        row += 1
-    
-    # Hoja 2: Resumen por categoría
-    ws_categories = wb.create_sheet("Resumen por Categoría")
-    
-    # Agrupar por categoría
-    category_totals = {}
-    for invoice in invoices:
-        category = invoice.category.value
-        if category not in category_totals:
-            category_totals[category] = 0
-        category_totals[category] += invoice.amount
-    
-    # Escribir resumen por categoría
-    headers = ["Categoría", "Total Facturado", "Número de Facturas"]
-    for col, header in enumerate(headers, 1):
-        ws_categories.cell(row=1, column=col, value=header)
-    
-    row = 2
-    for category, total in category_totals.items():
-        count = len([inv for inv in invoices if inv.category.value == category])
-        ws_categories.cell(row=row, column=1, value=category)
-        ws_categories.cell(row=row, column=2, value=f"${total:,.2f}")
-        ws_categories.cell(row=row, column=3, value=count)
-        row += 1
-    
     # Generar nombre de archivo único
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"resumen_facturas_boosting_{timestamp}.xlsx"
@@ -174,7 +311,6 @@ def export_invoices_summary_to_excel(invoices: List[Invoice]) -> str:
     # Crear directorio de exports si no existe
     os.makedirs("exports", exist_ok=True)
     
-    # Guardar archivo
-    wb.save(filepath)
+    write_invoices_summary_workbook(summary, filepath)
     
     return filepath
@@ -0,0 +1,261 @@
+"""
+Servicio de trabajos de exportación de facturas en segundo plano.
+El cliente envía los filtros, recibe un ID de trabajo, consulta el progreso
+(filas escritas / total) y descarga el archivo desde el almacén de adjuntos,
+por lo que cualquier instancia puede servirlo. Las exportaciones con los
+mismos filtros dentro de la ventana de frescura reutilizan el resultado.
+
+Un trabajo en curso actualiza `updated_at` con cada lote escrito; si deja de
+avanzar (p. ej. el proceso que lo ejecutaba se reinició) se marca como
+fallido y no se reutiliza. Los trabajos y archivos más antiguos que
+`EXPORT_RETENTION` se eliminan al crear una exportación nueva.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import secrets
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.database import settings
+from src.models import ExportJob, ExportJobStatus, InvoiceStatus
+from src.services.attachment_storage import get_storage_backend
+from src.services.excel_export import (
+    invoice_export_query, export_totals, iter_export_rows, write_invoices_workbook
+)
+from src.services.invoice_search import apply_invoice_filters
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convertir los filtros de exportación a valores JSON, sin los vacíos.
+
+    Args:
+        filters: Filtros recibidos en la petición
+
+    Returns:
+        Dict: Filtros serializables
+    """
+    normalized = {}
+    for name, value in filters.items():
+        if value is None or value == "":
+            continue
+        if isinstance(value, Enum):
+            value = value.value
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        normalized[name] = value
+    return normalized
+
+
+def filters_key(filters: Dict[str, Any]) -> str:
+    """Hash estable de un conjunto de filtros normalizados."""
+    payload = json.dumps(filters, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def fail_stale_jobs(db: Session) -> int:
+    """
+    Marcar como fallidos los trabajos pendientes o en curso sin avance reciente.
+
+    Args:
+        db: Sesión de base de datos
+
+    Returns:
+        int: Trabajos marcados como fallidos
+    """
+    now = _utcnow()
+    cutoff = now - timedelta(seconds=settings.export_stale_after)
+    stale = db.query(ExportJob).filter(
+        ExportJob.status.in_([ExportJobStatus.PENDING, ExportJobStatus.RUNNING]),
+        func.coalesce(ExportJob.updated_at, ExportJob.created_at) < cutoff
+    ).all()
+    for job in stale:
+        logger.warning(f"Exportación {job.id} sin avance desde hace {settings.export_stale_after}s")
+        job.status = ExportJobStatus.FAILED
+        job.error = "El trabajo de exportación dejó de avanzar"
+        job.completed_at = now
+    if stale:
+        db.commit()
+    return len(stale)
+
+
+def purge_expired_jobs(db: Session) -> int:
+    """
+    Eliminar los trabajos terminados más antiguos que la retención y sus archivos.
+
+    Args:
+        db: Sesión de base de datos
+
+    Returns:
+        int: Trabajos eliminados
+    """
+    cutoff = _utcnow() - timedelta(seconds=settings.export_retention)
+    expired = db.query(ExportJob).filter(
+        ExportJob.status.in_([ExportJobStatus.COMPLETED, ExportJobStatus.FAILED]),
+        ExportJob.created_at < cutoff
+    ).all()
+    storage = get_storage_backend()
+    for job in expired:
+        if job.file_key:
+            try:
+                if storage.exists(job.file_key):
+                    storage.delete(job.file_key)
+            except Exception as e:
+                # Se reintenta en la próxima limpieza
+                logger.warning(f"No se pudo eliminar el archivo de la exportación {job.id}: {e}")
+                continue
+        db.delete(job)
+    if expired:
+        db.commit()
+    return len(expired)
+
+
+def find_fresh_job(db: Session, key: str) -> Optional[ExportJob]:
+    """
+    Buscar un trabajo reciente y no fallido con los mismos filtros.
+
+    Args:
+        db: Sesión de base de datos
+        key: Hash de los filtros
+
+    Returns:
+        ExportJob más reciente dentro de la ventana de frescura, o None
+    """
+    cutoff = _utcnow() - timedelta(seconds=settings.export_cache_ttl)
+    return db.query(ExportJob).filter(
+        ExportJob.filters_key == key,
+        ExportJob.created_at >= cutoff,
+        ExportJob.status != ExportJobStatus.FAILED
+    ).order_by(ExportJob.created_at.desc()).first()
+
+
+def submit_export_job(db: Session, filters: Dict[str, Any]) -> Tuple[ExportJob, bool]:
+    """
+    Crear un trabajo de exportación o reutilizar uno reciente.
+
+    Args:
+        db: Sesión de base de datos
+        filters: Filtros de la exportación
+
+    Returns:
+        Tuple con el trabajo y un indicador de si se reutilizó
+    """
+    normalized = normalize_filters(filters)
+    key = filters_key(normalized)
+
+    fail_stale_jobs(db)
+    existing = find_fresh_job(db, key)
+    if existing:
+        return existing, True
+
+    purge_expired_jobs(db)
+    now = _utcnow()
+    job = ExportJob(
+        id=uuid.uuid4().hex,
+        status=ExportJobStatus.PENDING,
+        filters=normalized,
+        filters_key=key,
+        rows_written=0,
+        created_at=now,
+        updated_at=now
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job, False
+
+
+def _query_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Reconstruir los tipos de los filtros guardados para aplicarlos a la consulta."""
+    return {
+        "user_id": filters.get("user_id"),
+        "status": InvoiceStatus(filters["status"]) if filters.get("status") else None,
+        "start_date": datetime.fromisoformat(filters["start_date"]) if filters.get("start_date") else None,
+        "end_date": datetime.fromisoformat(filters["end_date"]) if filters.get("end_date") else None,
+    }
+
+
+def run_export_job(job_id: str, session_factory: Callable[[], Session]) -> None:
+    """
+    Ejecutar un trabajo de exportación.
+
+    Usa una sesión para leer las facturas por lotes y otra para actualizar
+    el progreso del trabajo, de modo que los commits de progreso no cierren
+    el cursor de lectura.
+
+    Args:
+        job_id: ID del trabajo
+        session_factory: Fábrica de sesiones de base de datos
+    """
+    jobs_db = session_factory()
+    reader_db = session_factory()
+    temp_path = None
+    try:
+        job = jobs_db.get(ExportJob, job_id)
+        if job is None:
+            logger.warning(f"Trabajo de exportación no encontrado: {job_id}")
+            return
+
+        job.status = ExportJobStatus.RUNNING
+        job.updated_at = _utcnow()
+        jobs_db.commit()
+
+        query = apply_invoice_filters(invoice_export_query(reader_db), **_query_filters(job.filters))
+        totals = export_totals(query)
+        job.total_rows = totals.count
+        if not totals.count:
+            job.status = ExportJobStatus.FAILED
+            job.error = "No hay facturas para exportar con los filtros especificados"
+            job.completed_at = _utcnow()
+            jobs_db.commit()
+            return
+        jobs_db.commit()
+
+        def report_progress(rows_written: int) -> None:
+            job.rows_written = rows_written
+            job.updated_at = _utcnow()
+            jobs_db.commit()
+
+        fd, temp_path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        write_invoices_workbook(iter_export_rows(query), temp_path, totals.amount, progress=report_progress)
+
+        storage = get_storage_backend()
+        # Nombre no adivinable: la descarga solo debe pasar por el endpoint del trabajo
+        file_key = storage.artifact_key(f"facturas_boosting_{job.id}_{secrets.token_urlsafe(16)}.xlsx")
+        storage.put_file(temp_path, file_key)
+
+        job.file_key = file_key
+        job.status = ExportJobStatus.COMPLETED
+        job.completed_at = job.updated_at = _utcnow()
+        jobs_db.commit()
+        logger.info(f"Exportación {job_id} completada: {totals.count} facturas")
+    except Exception as e:
+        logger.exception(f"Error en la exportación {job_id}")
+        jobs_db.rollback()
+        job = jobs_db.get(ExportJob, job_id)
+        if job is not None:
+            job.status = ExportJobStatus.FAILED
+            job.error = str(e)
+            job.completed_at = _utcnow()
+            jobs_db.commit()
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        reader_db.close()
+        jobs_db.close()
@@ -0,0 +1,210 @@
+"""
+Respuesta de descarga de adjuntos con soporte de rangos y caché HTTP.
+Sirve un rango de bytes (`Range`/`If-Range`), responde 304 a peticiones
+condicionales (`If-None-Match`/`If-Modified-Since`) y, si el servidor ASGI lo
+permite, transfiere el archivo sin copias con la extensión `zerocopysend`.
+"""
+
+import hashlib
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# Tamaño de bloque cuando el servidor no soporta zerocopysend (64KB)
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def make_etag(sha256: Optional[str], stat_result: os.stat_result) -> str:
+    """
+    Construir un ETag fuerte para un adjunto.
+
+    Args:
+        sha256: Hash del contenido guardado en la factura, si existe
+        stat_result: Resultado de `os.stat` del archivo (para adjuntos antiguos)
+
+    Returns:
+        str: ETag entre comillas
+    """
+    if sha256:
+        return f'"{sha256}"'
+    base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    return f'"{hashlib.md5(base.encode()).hexdigest()}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Comparación débil de ETags, la que exige `If-None-Match`."""
+    if header.strip() == "*":
+        return True
+    candidates = [value.strip() for value in header.split(",")]
+    return etag in (value[2:] if value.startswith("W/") else value for value in candidates)
+
+
+def _not_modified_since(header: str, mtime: float) -> bool:
+    """Determinar si el archivo no ha cambiado desde la fecha de `If-Modified-Since`."""
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return since is not None and int(mtime) <= since.timestamp()
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpretar una cabecera `Range` de un único rango de bytes.
+
+    Args:
+        header: Valor de la cabecera `Range`
+        size: Tamaño total del archivo
+
+    Returns:
+        Tuple `(inicio, fin)` inclusivo, o None si la cabecera no es un rango
+        simple (se sirve el archivo completo)
+
+    Raises:
+        ValueError: Si el rango no es satisfacible
+    """
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Sufijo: los últimos N bytes
+        length = int(end)
+        if length == 0 or size == 0:
+            raise ValueError("Rango no satisfacible")
+        return max(size - length, 0), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or first > last:
+        raise ValueError("Rango no satisfacible")
+    return first, last
+
+
+class AttachmentResponse(Response):
+    """Respuesta de archivo local con rangos, ETag fuerte y respuestas 304."""
+
+    def __init__(
+        self,
+        path: str,
+        request_headers: Mapping[str, str],
+        stat_result: os.stat_result,
+        etag: str,
+        media_type: str,
+        filename: str
+    ):
+        self.path = path
+        self.media_type = media_type
+        self.background = None
+        self.offset = 0
+        self.count = 0
+        size = stat_result.st_size
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+
+        self.init_headers({
+            "etag": etag,
+            "last-modified": last_modified,
+            "accept-ranges": "bytes",
+            "cache-control": "private, no-cache",
+            "content-disposition": _content_disposition(filename),
+        })
+
+        if self._is_not_modified(request_headers, etag, stat_result.st_mtime):
+            self.status_code = 304
+            return
+
+        byte_range = None
+        range_header = request_headers.get("range")
+        if range_header and self._if_range_matches(request_headers, etag, last_modified):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                self.status_code = 416
+                self.headers["content-range"] = f"bytes */{size}"
+                return
+
+        if byte_range is None:
+            self.status_code = 200
+            self.count = size
+        else:
+            first, last = byte_range
+            self.status_code = 206
+            self.offset = first
+            self.count = last - first + 1
+            self.headers["content-range"] = f"bytes {first}-{last}/{size}"
+        self.headers["content-length"] = str(self.count)
+
+    @staticmethod
+    def _is_not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            return _etag_matches(if_none_match, etag)
+        if_modified_since = headers.get("if-modified-since")
+        return if_modified_since is not None and _not_modified_since(if_modified_since, mtime)
+
+    @staticmethod
+    def _if_range_matches(headers: Mapping[str, str], etag: str, last_modified: str) -> bool:
+        """`If-Range` exige coincidencia fuerte; si no coincide se envía el archivo completo."""
+        if_range = headers.get("if-range")
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            return if_range == etag
+        return if_range == last_modified
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if self.status_code in (304, 416) or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            # El servidor envía el archivo con sendfile() sin pasar por Python
+            with open(self.path, "rb") as handle:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": handle,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as handle:
+            await handle.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await handle.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+            if remaining > 0:
+                # El archivo se truncó mientras se enviaba
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _content_disposition(filename: str) -> str:
+    """Cabecera `Content-Disposition` de descarga, codificando nombres no ASCII."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
@@ -0,0 +1,71 @@
+"""
+Servicio de los rollups diarios de facturas.
+La tabla `invoice_daily_rollups` se mantiene de forma incremental en cada
+flush de la sesión (ver `src.models`); este módulo la reconstruye desde la
+tabla de facturas, necesario tras cargas masivas o actualizaciones con
+`query.update()`/`query.delete()`, que no pasan por el mantenimiento
+incremental.
+"""
+
+from sqlalchemy import Date, cast, func, insert
+from sqlalchemy.orm import Session
+
+from src.models import Invoice, InvoiceDailyRollup
+
+
+def invoice_day(db: Session):
+    """
+    Expresión SQL del día de la fecha de una factura.
+
+    En PostgreSQL el día se toma explícitamente en UTC (`timezone('UTC', date)`)
+    y no en la zona de la sesión, igual que el mantenimiento incremental.
+
+    Args:
+        db: Sesión de base de datos
+
+    Returns:
+        Expresión compatible con el motor de la sesión
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite no tiene tipo fecha: DATE() devuelve el texto 'YYYY-MM-DD'
+        return func.date(Invoice.date)
+    return cast(func.timezone("UTC", Invoice.date), Date)
+
+
+def rebuild_invoice_rollups(db: Session) -> int:
+    """
+    Reconstruir todos los rollups diarios con un único INSERT ... SELECT.
+
+    Args:
+        db: Sesión de base de datos (el commit queda a cargo del llamador)
+
+    Returns:
+        int: Número de filas de rollup generadas
+    """
+    day = invoice_day(db)
+    grouped = db.query(
+        day,
+        Invoice.user_id,
+        Invoice.category,
+        Invoice.payment_method,
+        Invoice.status,
+        func.count(Invoice.id),
+        func.sum(Invoice.amount)
+    ).group_by(
+        day, Invoice.user_id, Invoice.category, Invoice.payment_method, Invoice.status
+    )
+
+    db.query(InvoiceDailyRollup).delete(synchronize_session=False)
+    db.execute(insert(InvoiceDailyRollup).from_select(
+        [
+            InvoiceDailyRollup.day,
+            InvoiceDailyRollup.user_id,
+            InvoiceDailyRollup.category,
+            InvoiceDailyRollup.payment_method,
+            InvoiceDailyRollup.status,
+            InvoiceDailyRollup.invoice_count,
+            InvoiceDailyRollup.total_amount,
+        ],
+        grouped.statement
+    ))
+    return db.query(func.count()).select_from(InvoiceDailyRollup).scalar()
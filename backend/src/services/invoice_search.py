@@ -0,0 +1,137 @@
+"""
+Servicio de búsqueda de texto y filtros comunes sobre facturas.
+En PostgreSQL usa la columna `search_vector` (tsvector en español) y los
+índices trigram; en otros motores (SQLite en pruebas) recurre a ILIKE.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, literal_column, or_
+
+from src.models import Invoice, InvoiceStatus, ExpenseCategory, PaymentMethod
+
+# Configuración de texto de PostgreSQL usada por la columna search_vector
+SEARCH_CONFIG = "spanish"
+
+search_vector = literal_column("invoices.search_vector")
+
+
+def _dialect_name(query) -> str:
+    """Obtener el nombre del motor de base de datos de una consulta."""
+    return query.session.get_bind().dialect.name
+
+
+def _ts_query(search_text: str):
+    """Construir la consulta tsquery a partir del texto del usuario."""
+    return func.websearch_to_tsquery(SEARCH_CONFIG, search_text)
+
+
+def apply_provider_filter(query, provider: str):
+    """
+    Filtrar por subcadena del proveedor.
+
+    En PostgreSQL el ILIKE se resuelve con el índice trigram del proveedor.
+
+    Args:
+        query: Consulta de SQLAlchemy sobre Invoice
+        provider: Texto a buscar en el proveedor
+
+    Returns:
+        Query: Consulta filtrada
+    """
+    return query.filter(Invoice.provider.ilike(f"%{provider}%"))
+
+
+def apply_text_search(query, search_text: str):
+    """
+    Filtrar facturas por texto en proveedor, descripción, NIT o texto OCR.
+
+    Args:
+        query: Consulta de SQLAlchemy sobre Invoice
+        search_text: Texto de búsqueda del usuario
+
+    Returns:
+        Query: Consulta filtrada
+    """
+    like = f"%{search_text}%"
+    substring_match = or_(
+        Invoice.provider.ilike(like),
+        Invoice.description.ilike(like),
+    )
+
+    dialect = _dialect_name(query)
+    if dialect == "postgresql":
+        return query.filter(or_(
+            search_vector.op("@@")(_ts_query(search_text)),
+            substring_match,
+        ))
+
+    conditions = [substring_match, Invoice.nit.ilike(like)]
+    if dialect == "sqlite":
+        conditions.append(func.json_extract(Invoice.ocr_data, "$.raw_text").ilike(like))
+    return query.filter(or_(*conditions))
+
+
+def search_rank(query, search_text: str) -> Optional[object]:
+    """
+    Expresión de relevancia para ordenar resultados de búsqueda.
+
+    Args:
+        query: Consulta de SQLAlchemy sobre Invoice
+        search_text: Texto de búsqueda del usuario
+
+    Returns:
+        Expresión `ts_rank` en PostgreSQL, o None si el motor no la soporta
+    """
+    if _dialect_name(query) != "postgresql":
+        return None
+    return func.ts_rank(search_vector, _ts_query(search_text))
+
+
+def apply_invoice_filters(
+    query,
+    user_id: Optional[int] = None,
+    status: Optional[InvoiceStatus] = None,
+    category: Optional[ExpenseCategory] = None,
+    payment_method: Optional[PaymentMethod] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    provider: Optional[str] = None,
+    search_text: Optional[str] = None
+):
+    """
+    Aplicar los filtros comunes de facturas a una consulta.
+    
+    Args:
+        query: Consulta de SQLAlchemy sobre Invoice
+        user_id: Filtrar por usuario
+        status: Filtrar por estado
+        category: Filtrar por categoría
+        payment_method: Filtrar por método de pago
+        start_date: Fecha de inicio
+        end_date: Fecha de fin
+        provider: Filtrar por proveedor
+        search_text: Búsqueda por texto en proveedor, descripción, NIT o texto OCR
+        
+    Returns:
+        Query: Consulta con los filtros aplicados
+    """
+    if user_id:
+        query = query.filter(Invoice.user_id == user_id)
+    if status:
+        query = query.filter(Invoice.status == status)
+    if category:
+        query = query.filter(Invoice.category == category)
+    if payment_method:
+        query = query.filter(Invoice.payment_method == payment_method)
+    if start_date:
+        query = query.filter(Invoice.date >= start_date)
+    if end_date:
+        query = query.filter(Invoice.date <= end_date)
+    if provider:
+        query = apply_provider_filter(query, provider)
+    if search_text:
+        # Búsqueda por texto en proveedor, descripción, NIT o texto OCR
+        query = apply_text_search(query, search_text)
+    return query
@@ -0,0 +1,234 @@
+"""
+Caché persistente de resultados de OCR.
+Los usuarios reenvían la misma factura cuando la confianza es baja y cada
+envío volvía a ejecutar Tesseract. El resultado (texto y campos extraídos) se
+guarda en un archivo SQLite con la clave del contenido del archivo, la
+configuración de Tesseract y la versión del parser, así que los reenvíos
+responden en milisegundos. El archivo se comparte entre los procesos del pool
+de OCR y sobrevive a los reinicios; al superar el tamaño máximo se eliminan
+las entradas usadas hace más tiempo (LRU).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from src.database import settings
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque para calcular el hash de los archivos (1MB)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_results (
+    key TEXT PRIMARY KEY,
+    raw_text TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_ocr_results_last_used_at ON ocr_results (last_used_at);
+CREATE TABLE IF NOT EXISTS ocr_cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def file_sha256(file_path: str) -> str:
+    """Calcular el SHA-256 del contenido de un archivo por bloques."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as source:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ocr_cache_key(
+    content_sha256: str, suffix: str, config: str, lang: str, parser_version: int, keywords_digest: str = ""
+) -> str:
+    """
+    Clave de caché de un resultado de OCR.
+
+    Args:
+        content_sha256: Hash del contenido del archivo
+        suffix: Extensión del archivo (define si se procesa como imagen o PDF)
+        config: Configuración de Tesseract
+        lang: Idiomas de Tesseract
+        parser_version: Versión de la extracción de campos
+        keywords_digest: Huella de la tabla de palabras clave de categorías
+
+    Returns:
+        str: Hash hexadecimal de todos los componentes
+    """
+    payload = "|".join([content_sha256, suffix.lower(), config, lang, str(parser_version), keywords_digest])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class OCRResultCache:
+    """Caché LRU en SQLite de los resultados de OCR, con tamaño máximo en bytes."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_bytes: int = 100 * 1024 * 1024):
+        """
+        Args:
+            path: Archivo SQLite de la caché (se crea si no existe)
+            max_bytes: Tamaño máximo de los resultados guardados
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    with sqlite3.connect(self.path, timeout=5) as connection:
+                        connection.execute("PRAGMA journal_mode=WAL")
+                        connection.executescript(_SCHEMA)
+                    self._ready = True
+        connection = sqlite3.connect(self.path, timeout=5)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _increment(connection: sqlite3.Connection, name: str, amount: int = 1) -> None:
+        connection.execute(
+            "INSERT INTO ocr_cache_stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtener un resultado guardado y marcarlo como usado.
+
+        Returns:
+            Dict con los campos extraídos y `raw_text`, o None si no está
+        """
+        try:
+            with self._connect() as connection:
+                row = connection.execute(
+                    "SELECT raw_text, fields FROM ocr_results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self._increment(connection, "misses")
+                    return None
+                connection.execute("UPDATE ocr_results SET last_used_at = ? WHERE key = ?", (time.time(), key))
+                self._increment(connection, "hits")
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Caché de OCR no disponible: {e}")
+            return None
+        result = json.loads(row[1])
+        result["raw_text"] = row[0]
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Guardar un resultado y eliminar los menos usados si se supera el tamaño máximo.
+
+        Args:
+            key: Clave de `ocr_cache_key`
+            result: Campos extraídos, incluido `raw_text`
+        """
+        fields = {name: value for name, value in result.items() if name != "raw_text"}
+        raw_text = result.get("raw_text") or ""
+        payload = json.dumps(fields)
+        size = len(raw_text.encode("utf-8")) + len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO ocr_results (key, raw_text, fields, size, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, raw_text, payload, size, now, now)
+                )
+                self._evict(connection)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"No se pudo guardar en la caché de OCR: {e}")
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """Eliminar las entradas usadas hace más tiempo hasta cumplir el tamaño máximo."""
+        excess = connection.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        keys = []
+        for key, size in connection.execute("SELECT key, size FROM ocr_results ORDER BY last_used_at, created_at"):
+            keys.append(key)
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany("DELETE FROM ocr_results WHERE key = ?", [(key,) for key in keys])
+        self._increment(connection, "evictions", len(keys))
+
+    def clear(self) -> None:
+        """Eliminar todos los resultados guardados y reiniciar los contadores."""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM ocr_results")
+            connection.execute("DELETE FROM ocr_cache_stats")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtener aciertos, fallos, tasa de aciertos y ocupación de la caché."""
+        try:
+            with self._connect() as connection:
+                counters = dict(connection.execute("SELECT name, value FROM ocr_cache_stats"))
+                entries, total_bytes = connection.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_results"
+                ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Caché de OCR no disponible: {e}")
+            return {"backend": self.name, "available": False}
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "backend": self.name,
+            "available": True,
+            "entries": entries,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": counters.get("evictions", 0),
+        }
+
+
+_cache: Optional[OCRResultCache] = None
+
+
+def get_ocr_cache() -> Optional[OCRResultCache]:
+    """
+    Obtener la caché de OCR configurada.
+
+    Returns:
+        OCRResultCache en `settings.ocr_cache_path`, o None si está deshabilitada
+    """
+    global _cache
+    if _cache is None and settings.ocr_cache_path:
+        _cache = OCRResultCache(settings.ocr_cache_path, max_bytes=settings.ocr_cache_max_mb * 1024 * 1024)
+    return _cache
+
+
+def set_ocr_cache(cache: Optional[OCRResultCache]) -> None:
+    """Reemplazar la caché de OCR (None vuelve a la configuración)."""
+    global _cache
+    _cache = cache
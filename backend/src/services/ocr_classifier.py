@@ -0,0 +1,231 @@
+"""
+Clasificador de categorías de gasto por palabras clave.
+`OCRService.classify_expense` recorría cada categoría y cada palabra con
+`in` sobre el texto y devolvía la primera coincidencia en el orden del
+diccionario. Aquí todas las palabras clave se compilan en un trie expresado
+como una sola expresión regular, que el motor de `re` recorre en una pasada
+encontrando todas las apariciones; cada aparición suma el peso de su palabra
+a la categoría de `ExpenseCategory` correspondiente y gana la de mayor puntaje.
+
+La tabla puede venir de un archivo JSON (`OCR_CATEGORY_KEYWORDS_PATH`) con la
+forma `{"transporte": {"TAXI": 2, "BUS": 1}, "hospedaje": ["HOTEL"]}`; se
+vuelve a cargar cuando el archivo cambia, también en los procesos del pool de
+OCR y en los workers de Celery, sin reiniciar.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, Mapping, Optional, Tuple, Union
+
+from src.database import settings
+from src.models import ExpenseCategory
+from src.services.ocr_extractor import WHITESPACE_RE
+
+logger = logging.getLogger(__name__)
+
+# Marca de archivo de palabras clave inexistente (evita repetir el aviso)
+_MISSING = -1.0
+
+KeywordTable = Mapping[Union[ExpenseCategory, str], Union[Mapping[str, int], Iterable[str]]]
+
+# Tabla por defecto: palabra clave -> peso. Las marcas y términos inequívocos
+# pesan más que las palabras genéricas que aparecen en cualquier recibo.
+DEFAULT_CATEGORY_KEYWORDS: Dict[ExpenseCategory, Dict[str, int]] = {
+    ExpenseCategory.MEALS: {
+        "RESTAURANTE": 2, "ALMUERZO": 2, "COMIDA": 1, "CAFETERIA": 2, "BAR": 1, "PIZZA": 2, "HAMBURGUESA": 2,
+    },
+    ExpenseCategory.TRANSPORT: {
+        "TAXI": 2, "UBER": 2, "BUS": 1, "PEAJE": 2, "TRANSMILENIO": 2, "SITP": 2, "METRO": 1,
+        # Combustible
+        "GASOLINA": 2, "ACPM": 2, "EDS": 1, "GL": 1, "PETROBRAS": 2, "TERPEL": 2, "ESSO": 2, "SHELL": 2,
+    },
+    ExpenseCategory.ACCOMMODATION: {
+        "HOTEL": 2, "HOSTAL": 2, "ALOJAMIENTO": 2, "HOSPEDAJE": 2, "MOTEL": 2,
+    },
+    ExpenseCategory.SUPPLIES: {
+        # Papelería
+        "PAPELERÍA": 2, "PAPELERIA": 2, "ÚTILES": 1, "UTILES": 1, "OFICINA": 1, "PAPEL": 1, "LAPIZ": 1, "BOLIGRAFO": 1,
+        # Farmacia
+        "FARMACIA": 2, "MEDICINA": 1, "MEDICAMENTO": 1, "DROGUERIA": 2,
+        # Supermercado
+        "SUPERMERCADO": 2, "MARKET": 1, "TIENDA": 1, "ALMACEN": 1, "EXITO": 2, "CARULLA": 2,
+        "SUMINISTROS": 2,
+    },
+    ExpenseCategory.COMMUNICATION: {
+        "CELULAR": 2, "TELEFONIA": 2, "INTERNET": 2, "RECARGA": 1, "MINUTOS": 1, "MOVISTAR": 2, "CLARO": 1, "TIGO": 2,
+    },
+    ExpenseCategory.OTHER: {
+        "VARIOS": 1, "SERVICIOS": 1,
+    },
+}
+
+
+def _normalize_keyword(keyword: str) -> str:
+    return WHITESPACE_RE.sub(" ", keyword.strip().upper())
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Expresar un conjunto de palabras como un trie en sintaxis de `re` (sin prefijos repetidos)."""
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Una palabra que termina aquí hace opcional el resto (se prefiere la más larga)
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class KeywordClassifier:
+    """Clasificador de gastos por puntaje ponderado de palabras clave, recargable en caliente."""
+
+    def __init__(self, keywords: Optional[KeywordTable] = None, path: Optional[str] = None):
+        """
+        Args:
+            keywords: Tabla categoría -> palabras (con peso o lista con peso 1)
+            path: Archivo JSON con la tabla; si existe, reemplaza a `keywords`
+                y se vuelve a cargar cuando cambia
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self.load(keywords if keywords is not None else DEFAULT_CATEGORY_KEYWORDS)
+        self.reload()
+
+    def load(self, keywords: KeywordTable) -> None:
+        """
+        Reemplazar la tabla de palabras clave y recompilar el autómata.
+
+        Raises:
+            ValueError: Si una categoría no existe en `ExpenseCategory` o un peso no es positivo
+        """
+        weights: Dict[str, Tuple[ExpenseCategory, int]] = {}
+        # Orden de la tabla para desempatar puntajes iguales
+        order: Dict[ExpenseCategory, int] = {}
+        for category, entries in keywords.items():
+            try:
+                category = ExpenseCategory(category)
+            except ValueError:
+                raise ValueError(f"Categoría de gasto desconocida: {category}")
+            order.setdefault(category, len(order))
+            if not isinstance(entries, Mapping):
+                entries = {keyword: 1 for keyword in entries}
+            for keyword, weight in entries.items():
+                keyword = _normalize_keyword(keyword)
+                if not keyword:
+                    continue
+                if not isinstance(weight, int) or weight <= 0:
+                    raise ValueError(f"Peso inválido para '{keyword}': {weight}")
+                weights[keyword] = (category, weight)
+
+        pattern = re.compile(rf"(?<!\w)({_trie_pattern(weights)})(?!\w)") if weights else None
+        table = {
+            "order": [category.value for category in order],
+            "weights": sorted((keyword, category.value, weight) for keyword, (category, weight) in weights.items()),
+        }
+        digest = hashlib.sha256(json.dumps(table, ensure_ascii=False).encode("utf-8")).hexdigest()
+        with self._lock:
+            self._weights, self._pattern, self._order, self._digest = weights, pattern, order, digest
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Volver a leer el archivo de palabras clave si cambió desde la última carga.
+
+        Si el archivo no se puede leer o no es válido se conserva la tabla actual.
+
+        Args:
+            force: Leer el archivo aunque no haya cambiado
+
+        Returns:
+            bool: True si se cargó una tabla nueva
+        """
+        if not self.path:
+            return False
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            # Avisar una sola vez mientras el archivo no exista
+            if self._mtime != _MISSING:
+                logger.warning(f"No se pudo leer la tabla de categorías {self.path}: {e}")
+                self._mtime = _MISSING
+            return False
+        if not force and mtime == self._mtime:
+            return False
+        # Una versión inválida no se vuelve a intentar hasta que el archivo cambie
+        self._mtime = mtime
+        try:
+            with open(self.path, encoding="utf-8") as source:
+                self.load(json.load(source))
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo cargar la tabla de categorías {self.path}: {e}")
+            return False
+        logger.info(f"Tabla de categorías cargada desde {self.path}")
+        return True
+
+    def digest(self) -> str:
+        """
+        Huella de la tabla vigente (recargada si el archivo cambió).
+
+        Forma parte de la clave de la caché de OCR: cambiar la tabla invalida
+        las categorías sugeridas guardadas.
+        """
+        self.reload()
+        with self._lock:
+            return self._digest
+
+    def scores(self, text: str) -> Dict[ExpenseCategory, int]:
+        """
+        Puntaje de cada categoría con al menos una palabra clave en el texto.
+
+        Args:
+            text: Texto extraído de la factura
+
+        Returns:
+            Dict categoría -> suma de los pesos de todas las apariciones
+        """
+        self.reload()
+        with self._lock:
+            weights, pattern = self._weights, self._pattern
+        totals: Dict[ExpenseCategory, int] = {}
+        if pattern is None:
+            return totals
+        for keyword in pattern.findall(WHITESPACE_RE.sub(" ", text.upper())):
+            category, weight = weights[keyword]
+            totals[category] = totals.get(category, 0) + weight
+        return totals
+
+    def classify(self, text: str) -> ExpenseCategory:
+        """
+        Categoría con mayor puntaje (en empate, la primera de la tabla).
+
+        Returns:
+            ExpenseCategory: La categoría ganadora, u OTHER si no hay palabras clave
+        """
+        totals = self.scores(text)
+        if not totals:
+            return ExpenseCategory.OTHER
+        order = self._order
+        return max(totals, key=lambda category: (totals[category], -order.get(category, len(order))))
+
+
+_classifier: Optional[KeywordClassifier] = None
+
+
+def get_keyword_classifier() -> KeywordClassifier:
+    """Obtener el clasificador configurado (tabla por defecto o `settings.ocr_category_keywords_path`)."""
+    global _classifier
+    if _classifier is None:
+        _classifier = KeywordClassifier(path=settings.ocr_category_keywords_path or None)
+    return _classifier
@@ -0,0 +1,221 @@
+"""
+Ejecutor de OCR fuera del bucle de eventos.
+Tesseract es síncrono y ocupa la CPU durante segundos por factura, así que
+los trabajos se envían a un pool de procesos acotado al número de núcleos.
+El número de trabajos en curso y en espera está limitado (las peticiones que
+lo superan reciben 429) y cada trabajo tiene un tiempo máximo (504). Si un
+proceso del pool muere (OOM, fallo de Tesseract o poppler) el pool se
+reemplaza y la petición afectada recibe 503.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from src.database import settings
+from src.services.ocr_service import ocr_service
+
+logger = logging.getLogger(__name__)
+
+
+class OCRQueueFullError(Exception):
+    """El ejecutor de OCR tiene todos sus trabajos ocupados."""
+
+
+class OCRTimeoutError(Exception):
+    """Un trabajo de OCR superó el tiempo máximo."""
+
+
+class OCRPoolBrokenError(Exception):
+    """Un proceso del pool de OCR murió durante el trabajo."""
+
+
+def _init_worker(tesseract_timeout: float) -> None:
+    """Inicializar un proceso del pool: Tesseract se corta al mismo tiempo máximo."""
+    ocr_service.tesseract_timeout = tesseract_timeout
+
+
+def _process_invoice_file(file_path: str) -> Dict[str, Any]:
+    """Procesar una factura en el proceso (o hilo) del pool."""
+    return ocr_service.process_invoice_file(file_path)
+
+
+class OCRExecutor:
+    """Pool acotado para ejecutar OCR con control de cola y tiempo máximo."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        timeout: float = 60.0,
+        use_processes: bool = True
+    ):
+        """
+        Args:
+            max_workers: Procesos del pool (por defecto, núcleos disponibles)
+            max_pending: Trabajos en espera además de los que se ejecutan
+                (por defecto, el doble de procesos)
+            timeout: Segundos máximos por trabajo
+            use_processes: Si es False usa hilos (pruebas o entornos sin fork)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending if max_pending is not None else self.max_workers * 2
+        self.timeout = timeout
+        self.use_processes = use_processes
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.pool_restarts = 0
+
+    @property
+    def capacity(self) -> int:
+        """Trabajos admitidos a la vez (en ejecución y en espera)."""
+        return self.max_workers + self.max_pending
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.use_processes:
+                    # spawn: no se heredan los hilos ni el bucle de eventos del servidor
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.timeout,)
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ocr")
+            return self._pool
+
+    def _discard_pool(self, pool: Executor) -> None:
+        """Descartar un pool roto; el siguiente trabajo crea uno nuevo."""
+        with self._lock:
+            # Otra petición pudo haberlo reemplazado ya
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self.pool_restarts += 1
+        logger.error("Un proceso del pool de OCR murió; se recrea el pool")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, file_path: str) -> Tuple[Executor, Future]:
+        """Enviar el trabajo; si el pool quedó roto por una caída anterior, se recrea una vez."""
+        for _ in range(2):
+            pool = self._get_pool()
+            try:
+                return pool, pool.submit(_process_invoice_file, file_path)
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+        raise OCRPoolBrokenError("El servicio de OCR no está disponible")
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise OCRQueueFullError("El servicio de OCR está saturado")
+            self._in_flight += 1
+
+    def _release(self, future=None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if future is not None and not future.cancelled() and future.exception() is None:
+                self.completed += 1
+
+    async def process_invoice_file(self, file_path: str) -> Dict[str, Any]:
+        """
+        Procesar una factura con OCR sin bloquear el bucle de eventos.
+
+        El cupo del trabajo se libera cuando el pool termina, no cuando el
+        cliente deja de esperar, para que la contrapresión refleje el trabajo real.
+
+        Args:
+            file_path: Ruta del archivo de factura
+
+        Returns:
+            Dict con los datos extraídos (ver `OCRService.process_invoice_file`)
+
+        Raises:
+            OCRQueueFullError: Si no hay cupo para el trabajo
+            OCRTimeoutError: Si el trabajo supera el tiempo máximo
+            OCRPoolBrokenError: Si un proceso del pool murió durante el trabajo
+        """
+        self._acquire()
+        try:
+            pool, future = self._submit(file_path)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise OCRPoolBrokenError("Un proceso de OCR terminó inesperadamente. Intente de nuevo")
+        except asyncio.TimeoutError:
+            # Si el trabajo aún no empezó se descarta; si está en curso, Tesseract
+            # se corta con su propio tiempo máximo en el proceso del pool
+            with self._lock:
+                self.timed_out += 1
+            logger.warning(f"OCR superó {self.timeout}s: {file_path}")
+            raise OCRTimeoutError(f"El OCR superó el tiempo máximo de {self.timeout:g} segundos")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtener la ocupación y los contadores del ejecutor."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "capacity": self.capacity,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "pool_restarts": self.pool_restarts,
+            }
+
+    def shutdown(self) -> None:
+        """Cerrar el pool sin esperar los trabajos pendientes."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executor: Optional[OCRExecutor] = None
+
+
+def get_ocr_executor() -> OCRExecutor:
+    """
+    Obtener el ejecutor de OCR configurado.
+
+    Returns:
+        OCRExecutor según `settings.ocr_workers`, `settings.ocr_max_pending` y `settings.ocr_timeout`
+    """
+    global _executor
+    if _executor is None:
+        _executor = OCRExecutor(
+            max_workers=settings.ocr_workers or None,
+            max_pending=settings.ocr_max_pending if settings.ocr_max_pending >= 0 else None,
+            timeout=settings.ocr_timeout
+        )
+    return _executor
+
+
+def set_ocr_executor(executor: Optional[OCRExecutor]) -> None:
+    """Reemplazar el ejecutor de OCR (None vuelve a la configuración)."""
+    global _executor
+    _executor = executor
+
+
+def shutdown_ocr_executor() -> None:
+    """Cerrar el pool de OCR si se llegó a crear (al apagar la aplicación)."""
+    if _executor is not None:
+        _executor.shutdown()
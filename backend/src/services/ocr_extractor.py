@@ -0,0 +1,80 @@
+"""
+Motor de extracción de campos para el texto OCR.
+Los extractores de `OCRService` recorrían sus patrones con `re.findall`, que
+busca el patrón en la caché de `re` en cada llamada y recorre el texto
+completo aunque solo se use la primera coincidencia. Aquí cada patrón se
+compila una sola vez y se busca con `search`, que se detiene en la primera
+coincidencia; los patrones de un campo se evalúan en orden de prioridad solo
+hasta que uno produce un valor válido.
+
+Una única alternancia con grupos con nombre no conserva la prioridad entre
+patrones (gana la coincidencia más a la izquierda, no el primer patrón), y
+evaluar todos los patrones en cada posición con lookaheads resultó varias
+veces más lento en `scripts/benchmark_ocr_extraction.py`.
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, Pattern, Tuple, Union
+
+# Espacios consecutivos (incluidos saltos de línea) del texto OCR
+WHITESPACE_RE = re.compile(r'\s+')
+
+FindallItem = Union[str, Tuple[str, ...]]
+
+
+def findall_item(match: "re.Match[str]") -> FindallItem:
+    """
+    Convertir una coincidencia en el elemento que devolvería `re.findall`.
+
+    Args:
+        match: Coincidencia de `search`
+
+    Returns:
+        El texto completo si el patrón no tiene grupos, el grupo si tiene uno
+        y la tupla de grupos si tiene varios (los que no participan valen '')
+    """
+    groups = match.groups(default='')
+    if not groups:
+        return match.group(0)
+    if len(groups) == 1:
+        return groups[0]
+    return groups
+
+
+class FieldExtractor:
+    """Patrones precompilados de extracción de campos, con búsqueda de la primera coincidencia."""
+
+    def __init__(self, flags: int = re.IGNORECASE):
+        """
+        Args:
+            flags: Flags de compilación de todos los patrones
+        """
+        self.flags = flags
+        self._compiled: Dict[str, Pattern[str]] = {}
+
+    def compile(self, pattern: str) -> Pattern[str]:
+        """Obtener el patrón compilado, compilándolo la primera vez."""
+        compiled = self._compiled.get(pattern)
+        if compiled is None:
+            compiled = self._compiled[pattern] = re.compile(pattern, self.flags)
+        return compiled
+
+    def first_matches(self, patterns: Iterable[str], text: str) -> Iterator[FindallItem]:
+        """
+        Recorrer, en orden de prioridad, la primera coincidencia de cada patrón.
+
+        Equivale a tomar `re.findall(pattern, text, flags)[0]` de cada patrón
+        que coincide, pero sin recorrer el resto del texto ni evaluar los
+        patrones siguientes si el consumidor se detiene antes.
+
+        Args:
+            patterns: Patrones del campo, del más al menos prioritario
+            text: Texto normalizado de la factura
+
+        Yields:
+            El primer elemento de `re.findall` de cada patrón que coincide
+        """
+        for pattern in patterns:
+            match = self.compile(pattern).search(text)
+            if match is not None:
+                yield findall_item(match)
@@ -0,0 +1,138 @@
+"""
+Servicio de trabajos de OCR en segundo plano.
+La API guarda el archivo en el almacén de adjuntos, registra el trabajo y lo
+encola en Celery (cola `ocr_queue`); el cliente recibe el ID del trabajo y
+consulta su estado. El worker ejecuta el OCR, guarda el resultado en el
+trabajo y, si el trabajo pertenece a una factura, completa `Invoice.ocr_data`
+y `Invoice.ocr_confidence`.
+"""
+
+import logging
+import os
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.models import Invoice, OCRJob, OCRJobStatus
+from src.services.attachment_storage import get_storage_backend, release_file
+from src.services.ocr_service import ocr_service
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def create_ocr_job(db: Session, user_id: int, file_key: str, invoice_id: Optional[int] = None) -> OCRJob:
+    """
+    Registrar un trabajo de OCR pendiente.
+
+    Args:
+        db: Sesión de base de datos
+        user_id: Usuario que sube la factura
+        file_key: Clave del archivo en el almacén de adjuntos
+        invoice_id: Factura que recibirá los datos extraídos (opcional)
+
+    Returns:
+        OCRJob: Trabajo creado
+    """
+    job = OCRJob(
+        id=uuid.uuid4().hex,
+        status=OCRJobStatus.PENDING,
+        user_id=user_id,
+        invoice_id=invoice_id,
+        file_key=file_key,
+        created_at=_utcnow()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def fail_ocr_job(db: Session, job: OCRJob, error: str) -> None:
+    """Marcar un trabajo como fallido."""
+    job.status = OCRJobStatus.FAILED
+    job.error = error
+    job.completed_at = _utcnow()
+    db.commit()
+
+
+def _local_copy(file_key: str) -> Tuple[str, bool]:
+    """
+    Obtener una ruta local del archivo para Tesseract.
+
+    Returns:
+        Tuple con la ruta y un indicador de si es una copia temporal
+    """
+    storage = get_storage_backend()
+    local_path = storage.local_path(file_key)
+    if local_path:
+        return local_path, False
+
+    fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(file_key)[1])
+    with os.fdopen(fd, "wb") as temp_file:
+        for chunk in storage.iter_chunks(file_key):
+            temp_file.write(chunk)
+    return temp_path, True
+
+
+def run_ocr_job(job_id: str, session_factory: Callable[[], Session]) -> None:
+    """
+    Ejecutar un trabajo de OCR.
+
+    Los trabajos terminados se ignoran, de modo que una reentrega del broker
+    no repite el OCR. Al terminar, el archivo se elimina del almacén si
+    ninguna factura ni otro trabajo pendiente lo referencia.
+
+    Args:
+        job_id: ID del trabajo
+        session_factory: Fábrica de sesiones de base de datos
+    """
+    db = session_factory()
+    local_path, is_temp = None, False
+    try:
+        job = db.get(OCRJob, job_id)
+        if job is None:
+            logger.warning(f"Trabajo de OCR no encontrado: {job_id}")
+            return
+        if job.finished:
+            return
+
+        job.status = OCRJobStatus.RUNNING
+        job.started_at = _utcnow()
+        db.commit()
+
+        local_path, is_temp = _local_copy(job.file_key)
+        result = ocr_service.process_invoice_file(local_path)
+
+        job.result = result
+        job.confidence = result.get("confidence")
+        if job.invoice_id is not None:
+            invoice = db.get(Invoice, job.invoice_id)
+            if invoice is not None:
+                invoice.ocr_data = result
+                invoice.ocr_confidence = job.confidence
+        job.status = OCRJobStatus.COMPLETED
+        job.completed_at = _utcnow()
+        db.commit()
+        logger.info(f"OCR {job_id} completado, confianza {job.confidence}")
+    except Exception as e:
+        logger.exception(f"Error en el OCR {job_id}")
+        db.rollback()
+        job = db.get(OCRJob, job_id)
+        if job is not None:
+            fail_ocr_job(db, job, str(e))
+    finally:
+        if is_temp and os.path.exists(local_path):
+            os.remove(local_path)
+        try:
+            job = db.get(OCRJob, job_id)
+            if job is not None and job.finished:
+                release_file(db, job.file_key)
+        finally:
+            db.close()
@@ -4,7 +4,6 @@ Utiliza Tesseract OCR para extraer texto de imágenes y PDFs de facturas.
 """
 
 import os
-import re
 import logging
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
@@ -14,10 +13,19 @@ import fitz  # PyMuPDF para PDFs
 import io
 from pathlib import Path
 
+from src.services.ocr_cache import get_ocr_cache, file_sha256, ocr_cache_key
+from src.services.ocr_extractor import FieldExtractor, WHITESPACE_RE
+from src.services.ocr_classifier import get_keyword_classifier
+from src.models import ExpenseCategory
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Versión de la extracción de campos; incrementarla al cambiar los patrones
+# o las reglas invalida los resultados guardados en la caché de OCR
+PARSER_VERSION = 2
+
 
 class OCRService:
     """Servicio para procesamiento OCR de facturas físicas."""
@@ -26,19 +34,13 @@ class OCRService:
         """Inicializar el servicio OCR."""
         # Configurar Tesseract (ajustar según el sistema)
         self.tesseract_config = '--oem 3 --psm 6'
+        self.tesseract_lang = 'spa+eng'  # Español e inglés
+        # Segundos antes de cortar Tesseract (0 = sin límite); lo fija el pool de OCR
+        self.tesseract_timeout = 0
         self.supported_formats = ['.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.pdf']
         
-        # Diccionario de categorías por keywords (mejorado)
-        self.categories = {
-            "alimentacion": ["RESTAURANTE", "ALMUERZO", "COMIDA", "CAFETERIA", "BAR", "PIZZA", "HAMBURGUESA"],
-            "combustible": ["GASOLINA", "ACPM", "EDS", "GL", "PETROBRAS", "TERPEL", "ESSO", "SHELL"],
-            "transporte": ["TAXI", "UBER", "BUS", "PEAJE", "TRANSMILENIO", "SITP", "METRO"],
-            "hospedaje": ["HOTEL", "HOSTAL", "ALOJAMIENTO", "HOSPEDAJE", "MOTEL"],
-            "papeleria": ["PAPELERÍA", "ÚTILES", "OFICINA", "PAPEL", "LAPIZ", "BOLIGRAFO"],
-            "farmacia": ["FARMACIA", "MEDICINA", "MEDICAMENTO", "DROGUERIA"],
-            "supermercado": ["SUPERMERCADO", "MARKET", "TIENDA", "ALMACEN", "EXITO", "CARULLA"],
-            "otros": ["VARIOS", "SUMINISTROS", "SERVICIOS"]
-        }
+        # Clasificador de categorías por palabras clave ponderadas (tabla recargable)
+        self.classifier = get_keyword_classifier()
         
         # Patrones mejorados para extraer información de facturas
         self.patterns = {
@@ -80,23 +82,20 @@ class OCRService:
                 r'método de pago[:\s]*([^\n\r]+)',
             ]
         }
+        # Patrones compilados una sola vez; se buscan en orden de prioridad
+        self.extractor = FieldExtractor()
     
-    def classify_expense(self, text: str) -> str:
+    def classify_expense(self, text: str) -> ExpenseCategory:
         """
-        Clasifica el gasto según keywords predefinidos.
+        Clasifica el gasto según el puntaje ponderado de las palabras clave.
         
         Args:
             text: Texto extraído de la factura
             
         Returns:
-            str: Categoría del gasto
+            ExpenseCategory: Categoría con mayor puntaje (OTHER si no hay coincidencias)
         """
-        text_upper = text.upper()
-        for category, keywords in self.categories.items():
-            for keyword in keywords:
-                if keyword in text_upper:
-                    return category.upper()
-        return "OTROS"
+        return self.classifier.classify(text)
     
     def is_supported_format(self, filename: str) -> bool:
         """
@@ -133,7 +132,8 @@ class OCRService:
             text = pytesseract.image_to_string(
                 image, 
                 config=self.tesseract_config,
-                lang='spa+eng'  # Español e inglés
+                lang=self.tesseract_lang,
+                timeout=self.tesseract_timeout
             ).upper()  # Convertir a mayúsculas para mejor matching
             
             logger.info(f"Texto extraído de imagen: {len(text)} caracteres")
@@ -174,7 +174,8 @@ class OCRService:
                     ocr_text = pytesseract.image_to_string(
                         img, 
                         config=self.tesseract_config,
-                        lang='spa+eng'
+                        lang=self.tesseract_lang,
+                        timeout=self.tesseract_timeout
                     )
                     text += ocr_text + "\n"
             
@@ -231,7 +232,7 @@ class OCRService:
         }
         
         # Limpiar texto
-        clean_text = re.sub(r'\s+', ' ', text.lower())
+        clean_text = WHITESPACE_RE.sub(' ', text.lower())
         
         # Extraer monto
         amount = self._extract_amount(clean_text)
@@ -265,7 +266,7 @@ class OCRService:
         
         # Clasificar categoría automáticamente
         category = self.classify_expense(text)
-        extracted_data['category'] = category
+        extracted_data['category'] = category.value
         
         # Calcular confianza basada en datos extraídos
         confidence = self._calculate_confidence(extracted_data)
@@ -275,80 +276,68 @@ class OCRService:
     
     def _extract_amount(self, text: str) -> Optional[float]:
         """Extraer monto de la factura."""
-        for pattern in self.patterns['amount']:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                try:
-                    # Manejar patrones con grupos múltiples
-                    if isinstance(matches[0], tuple):
-                        amount_str = matches[0][1] if len(matches[0]) > 1 else matches[0][0]
-                    else:
-                        amount_str = matches[0]
-                    
-                    amount_str = amount_str.strip()
-                    # Remover comas y puntos (formato colombiano: 1.000.000,50)
-                    amount_str = amount_str.replace('.', '').replace(',', '.')
-                    amount = float(amount_str)
-                    if amount > 0:
-                        return amount
-                except ValueError:
-                    continue
+        for match in self.extractor.first_matches(self.patterns['amount'], text):
+            try:
+                # Manejar patrones con grupos múltiples
+                if isinstance(match, tuple):
+                    amount_str = match[1] if len(match) > 1 else match[0]
+                else:
+                    amount_str = match
+                
+                amount_str = amount_str.strip()
+                # Remover comas y puntos (formato colombiano: 1.000.000,50)
+                amount_str = amount_str.replace('.', '').replace(',', '.')
+                amount = float(amount_str)
+                if amount > 0:
+                    return amount
+            except ValueError:
+                continue
         return None
     
     def _extract_provider(self, text: str) -> Optional[str]:
         """Extraer nombre del proveedor."""
-        for pattern in self.patterns['provider']:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                provider = matches[0].strip()
-                # Filtrar resultados muy cortos o que contengan palabras clave
-                if len(provider) > 2 and not any(keyword in provider.lower() for keyword in ['fecha', 'total', 'factura', 'visible']):
-                    return provider.title()
+        for match in self.extractor.first_matches(self.patterns['provider'], text):
+            provider = match.strip()
+            # Filtrar resultados muy cortos o que contengan palabras clave
+            if len(provider) > 2 and not any(keyword in provider.lower() for keyword in ['fecha', 'total', 'factura', 'visible']):
+                return provider.title()
         return None
     
     def _extract_date(self, text: str) -> Optional[str]:
         """Extraer fecha de la factura."""
-        for pattern in self.patterns['date']:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                date_str = matches[0].strip()
-                try:
-                    # Intentar parsear la fecha
-                    parsed_date = self._parse_date(date_str)
-                    if parsed_date:
-                        return parsed_date.isoformat()
-                except ValueError:
-                    continue
+        for match in self.extractor.first_matches(self.patterns['date'], text):
+            date_str = match.strip()
+            try:
+                # Intentar parsear la fecha
+                parsed_date = self._parse_date(date_str)
+                if parsed_date:
+                    return parsed_date.isoformat()
+            except ValueError:
+                continue
         return None
     
     def _extract_invoice_number(self, text: str) -> Optional[str]:
         """Extraer número de factura."""
-        for pattern in self.patterns['invoice_number']:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                invoice_num = matches[0].strip()
-                if len(invoice_num) > 0:
-                    return invoice_num
+        for match in self.extractor.first_matches(self.patterns['invoice_number'], text):
+            invoice_num = match.strip()
+            if len(invoice_num) > 0:
+                return invoice_num
         return None
     
     def _extract_nit(self, text: str) -> Optional[str]:
         """Extraer NIT de la factura."""
-        for pattern in self.patterns['nit']:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                nit = matches[0].strip()
-                if len(nit) > 0:
-                    return nit
+        for match in self.extractor.first_matches(self.patterns['nit'], text):
+            nit = match.strip()
+            if len(nit) > 0:
+                return nit
         return None
     
     def _extract_payment_method(self, text: str) -> Optional[str]:
         """Extraer método de pago de la factura."""
-        for pattern in self.patterns['payment_method']:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                method = matches[0].strip()
-                if len(method) > 0:
-                    return method
+        for match in self.extractor.first_matches(self.patterns['payment_method'], text):
+            method = match.strip()
+            if len(method) > 0:
+                return method
         return None
     
     def _parse_date(self, date_str: str) -> Optional[datetime]:
@@ -388,15 +377,34 @@ class OCRService:
             confidence += 0.1
         if extracted_data['payment_method']:
             confidence += 0.05
-        if extracted_data['category'] and extracted_data['category'] != 'OTROS':
+        if extracted_data['category'] and extracted_data['category'] != ExpenseCategory.OTHER.value:
             confidence += 0.05
         
         return round(min(confidence, 1.0), 2)
     
+    def cache_key(self, file_path: str) -> str:
+        """
+        Clave de caché del OCR de un archivo: contenido, configuración, versión
+        del parser y tabla de palabras clave de categorías.
+        
+        Args:
+            file_path: Ruta del archivo de factura
+            
+        Returns:
+            str: Clave para la caché de OCR
+        """
+        return ocr_cache_key(
+            file_sha256(file_path), Path(file_path).suffix, self.tesseract_config, self.tesseract_lang, PARSER_VERSION,
+            self.classifier.digest()
+        )
+    
     def process_invoice_file(self, file_path: str) -> Dict[str, Any]:
         """
         Procesar un archivo de factura completo.
         
+        Si el mismo contenido ya se procesó con la misma configuración, el
+        resultado se toma de la caché de OCR sin ejecutar Tesseract.
+        
         Args:
             file_path: Ruta del archivo de factura
             
@@ -408,14 +416,23 @@ class OCRService:
             if not self.is_supported_format(file_path):
                 raise ValueError(f"Formato de archivo no soportado: {Path(file_path).suffix}")
             
-            # Extraer texto
-            text = self.extract_text_from_file(file_path)
+            cache = get_ocr_cache()
+            cache_key = self.cache_key(file_path) if cache is not None and os.path.exists(file_path) else None
+            invoice_data = cache.get(cache_key) if cache_key else None
             
-            if not text.strip():
-                raise ValueError("No se pudo extraer texto del archivo")
-            
-            # Extraer datos estructurados
-            invoice_data = self.extract_invoice_data(text)
+            if invoice_data is not None:
+                text = invoice_data['raw_text']
+            else:
+                # Extraer texto
+                text = self.extract_text_from_file(file_path)
+                
+                if not text.strip():
+                    raise ValueError("No se pudo extraer texto del archivo")
+                
+                # Extraer datos estructurados
+                invoice_data = self.extract_invoice_data(text)
+                if cache_key:
+                    cache.set(cache_key, invoice_data)
             
             # Agregar metadatos
             invoice_data.update({
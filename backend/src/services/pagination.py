@@ -0,0 +1,45 @@
+"""
+Utilidades de paginación por cursor (keyset) para listados de facturas.
+Codifica y decodifica el cursor opaco que identifica la última fila vista.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(date: datetime, invoice_id: int) -> str:
+    """
+    Codificar la posición `(date, id)` de la última factura en un cursor opaco.
+
+    Args:
+        date: Fecha de la última factura de la página
+        invoice_id: ID de la última factura de la página
+
+    Returns:
+        str: Cursor seguro para usar en URLs
+    """
+    payload = json.dumps({"d": date.isoformat(), "i": invoice_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decodificar un cursor generado por `encode_cursor`.
+
+    Args:
+        cursor: Cursor opaco recibido del cliente
+
+    Returns:
+        Tuple con la fecha y el ID de la última factura vista
+
+    Raises:
+        ValueError: Si el cursor está mal formado
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["d"]), int(payload["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
@@ -0,0 +1,147 @@
+"""
+Servicio de exportación de facturas en flujo (CSV y NDJSON).
+Genera el archivo por bloques a medida que las filas salen del cursor de la
+base de datos y, opcionalmente, lo comprime con gzip sobre la marcha, sin
+mantener el archivo completo en memoria ni escribirlo en disco.
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Callable, Iterable, Iterator
+
+from sqlalchemy.orm import Session
+
+# Filas por bloque enviado al cliente
+STREAM_FLUSH_ROWS = 500
+
+# Nivel de compresión gzip (equilibrio entre CPU y tamaño)
+GZIP_LEVEL = 6
+
+# Nombres de campo de CSV y NDJSON, en el orden de `EXPORT_COLUMNS`
+STREAM_FIELDS = [
+    "id", "user_name", "date", "provider", "amount",
+    "payment_method", "category", "status", "description", "created_at"
+]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _row_values(row) -> list:
+    """Convertir una fila de exportación a valores serializables."""
+    return [
+        row.id,
+        row.user_name,
+        row.date.isoformat(),
+        row.provider,
+        row.amount,
+        row.payment_method.value,
+        row.category.value,
+        row.status.value,
+        row.description or "",
+        row.created_at.isoformat() if row.created_at else None,
+    ]
+
+
+def iter_csv(rows: Iterable, flush_rows: int = STREAM_FLUSH_ROWS) -> Iterator[bytes]:
+    """
+    Generar un CSV por bloques de filas.
+
+    Args:
+        rows: Filas de exportación (ver `EXPORT_COLUMNS`)
+        flush_rows: Filas por bloque
+
+    Returns:
+        Iterator de bloques en UTF-8
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(STREAM_FIELDS)
+    pending = 0
+    for row in rows:
+        writer.writerow(_row_values(row))
+        pending += 1
+        if pending >= flush_rows:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson(rows: Iterable, flush_rows: int = STREAM_FLUSH_ROWS) -> Iterator[bytes]:
+    """
+    Generar NDJSON (un objeto JSON por línea) por bloques de filas.
+
+    Args:
+        rows: Filas de exportación (ver `EXPORT_COLUMNS`)
+        flush_rows: Filas por bloque
+
+    Returns:
+        Iterator de bloques en UTF-8
+    """
+    lines = []
+    for row in rows:
+        record = dict(zip(STREAM_FIELDS, _row_values(row)))
+        lines.append(json.dumps(record, ensure_ascii=False))
+        if len(lines) >= flush_rows:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = GZIP_LEVEL) -> Iterator[bytes]:
+    """
+    Comprimir un flujo de bloques con gzip sobre la marcha.
+
+    Args:
+        chunks: Bloques sin comprimir
+        level: Nivel de compresión
+
+    Returns:
+        Iterator de bloques en formato gzip
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(
+    export_format: str,
+    session_factory: Callable[[], Session],
+    build_rows: Callable[[Session], Iterable],
+    compress: bool = False
+) -> Iterator[bytes]:
+    """
+    Generar una exportación completa con su propia sesión de base de datos.
+
+    La sesión se abre al empezar a enviar y se cierra al terminar (o si el
+    cliente corta la conexión), independiente de la sesión de la petición.
+
+    Args:
+        export_format: "csv" o "ndjson"
+        session_factory: Fábrica de sesiones de base de datos
+        build_rows: Función que recibe la sesión y devuelve el iterador de filas
+        compress: Si es True, el flujo se comprime con gzip
+
+    Returns:
+        Iterator de bloques de la respuesta
+    """
+    encoders = {"csv": iter_csv, "ndjson": iter_ndjson}
+    db = session_factory()
+    try:
+        chunks = encoders[export_format](build_rows(db))
+        if compress:
+            chunks = gzip_stream(chunks)
+        for chunk in chunks:
+            yield chunk
+    finally:
+        db.close()
@@ -0,0 +1 @@
+# Tareas de Celery del sistema de control de facturas
@@ -0,0 +1,31 @@
+"""
+Tareas de Celery para la importación de facturas desde Gmail (cola `gmail_queue`).
+"""
+
+import logging
+
+from src.celery_app import celery_app
+from src.database import SessionLocal
+from src.services.gmail_service import process_gmail_invoices
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name="src.tasks.gmail_tasks.process_gmail_invoices")
+def process_gmail_invoices_task(limit: int = 10) -> int:
+    """
+    Procesar correos de Gmail para extraer facturas.
+
+    Args:
+        limit: Número máximo de correos a procesar
+
+    Returns:
+        int: Número de facturas procesadas
+    """
+    db = SessionLocal()
+    try:
+        processed_invoices = process_gmail_invoices(db, limit)
+        logger.info(f"Gmail: {len(processed_invoices)} facturas procesadas")
+        return len(processed_invoices)
+    finally:
+        db.close()
@@ -0,0 +1,21 @@
+"""
+Tareas de Celery para el procesamiento OCR de facturas (cola `ocr_queue`).
+"""
+
+from src.celery_app import celery_app
+from src.database import SessionLocal
+from src.services.ocr_jobs import run_ocr_job
+
+
+@celery_app.task(name="src.tasks.ocr_tasks.process_ocr_job", ignore_result=True)
+def process_ocr_job(job_id: str) -> None:
+    """
+    Ejecutar un trabajo de OCR registrado por la API.
+
+    El estado y el resultado se guardan en la tabla `ocr_jobs`, que es la
+    que consulta el cliente, así que la tarea no guarda resultado en Celery.
+
+    Args:
+        job_id: ID del trabajo
+    """
+    run_ocr_job(job_id, SessionLocal)
@@ -4,14 +4,18 @@ Define fixtures comunes para testing.
 """
 
 import pytest
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from src.main import app
 from src.database import get_db, Base
 from src.models import User, Invoice, UserRole, PaymentMethod, ExpenseCategory, InvoiceStatus
+from src.services.count_cache import invoice_count_cache
+from src.services.dashboard_cache import invalidate_dashboard_cache
+from src.services.ocr_cache import OCRResultCache, set_ocr_cache
 
 # Base de datos de prueba en memoria
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -35,6 +39,25 @@ def override_get_db():
 app.dependency_overrides[get_db] = override_get_db
 
 
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Vaciar las cachés en proceso entre pruebas."""
+    invoice_count_cache.invalidate()
+    invalidate_dashboard_cache()
+    yield
+    invoice_count_cache.invalidate()
+    invalidate_dashboard_cache()
+
+
+@pytest.fixture(autouse=True)
+def isolated_ocr_cache(tmp_path):
+    """Caché de OCR vacía por prueba, fuera del directorio del proyecto."""
+    cache = OCRResultCache(str(tmp_path / "ocr_results.sqlite3"))
+    set_ocr_cache(cache)
+    yield cache
+    set_ocr_cache(None)
+
+
 @pytest.fixture
 def client():
     """Cliente de prueba para la API."""
@@ -44,6 +67,18 @@ def client():
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture
+def db_session():
+    """Sesión directa sobre la base de datos de prueba."""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
 @pytest.fixture
 def test_user():
     """Usuario de prueba."""
@@ -61,8 +96,8 @@ def test_invoice():
         "date": "2024-01-15T10:30:00",
         "provider": "Restaurante El Buen Sabor",
         "amount": 25.50,
-        "payment_method": PaymentMethod.CARD,
-        "category": ExpenseCategory.MEALS,
+        "payment_method": PaymentMethod.TARJETA_BST.value,
+        "category": ExpenseCategory.MEALS.value,
         "description": "Almuerzo de trabajo"
     }
 
@@ -97,3 +132,40 @@ def create_test_user(db_session):
     db_session.commit()
     db_session.refresh(user)
     return user
+
+
+def create_test_invoice(db_session, user_id, **overrides):
+    """Crear factura de prueba en la base de datos."""
+    from datetime import datetime
+    
+    data = {
+        "user_id": user_id,
+        "date": datetime(2024, 1, 15, 10, 30),
+        "provider": "Proveedor de Prueba",
+        "amount": 100.0,
+        "payment_method": PaymentMethod.CASH,
+        "category": ExpenseCategory.OTHER,
+        "status": InvoiceStatus.PENDING,
+    }
+    data.update(overrides)
+    
+    invoice = Invoice(**data)
+    db_session.add(invoice)
+    db_session.commit()
+    db_session.refresh(invoice)
+    return invoice
+
+
+@contextmanager
+def count_queries():
+    """Contar las sentencias SQL ejecutadas sobre la base de datos de prueba."""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
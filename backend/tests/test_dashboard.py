@@ -4,12 +4,13 @@ Pruebas unitarias para estadísticas y métricas del dashboard.
 """
 
 import pytest
+from datetime import date, datetime, timedelta
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
 from src.main import app
 from src.models import User, Invoice, InvoiceStatus, ExpenseCategory, PaymentMethod
-from tests.conftest import create_test_user, create_test_invoice
+from tests.conftest import create_test_user, create_test_invoice, count_queries
 
 client = TestClient(app)
 
@@ -252,6 +253,806 @@ class TestDashboardStats:
         assert len(data["recent_activity"]) <= 5
 
 
+class TestDashboardQueryCount:
+    """Tests para el número de consultas del dashboard."""
+    
+    def test_recent_activity_loads_users_with_join(self, client, db_session):
+        """
+        Caso de éxito: Actividad reciente sin consultas N+1.
+        
+        Verifica que el nombre de cada usuario sale del mismo JOIN.
+        """
+        for i in range(5):
+            user = User(name=f"Colaborador {i}", email=f"colaborador{i}@boosting.com")
+            db_session.add(user)
+            db_session.commit()
+            create_test_invoice(db_session, user.id)
+        
+        with count_queries() as statements:
+            response = client.get("/api/v1/dashboard/recent-activity?limit=5")
+        
+        assert response.status_code == 200
+        assert len(response.json()["recent_activity"]) == 5
+        assert len(statements) == 1
+
+    
+    def test_dashboard_stats_query_count(self, client, db_session):
+        """
+        Caso de éxito: Estadísticas completas con pocas consultas.
+        
+        Verifica que básicas, distribuciones y validación comparten una sola
+        agregación (4 consultas en total con tendencias, usuarios y actividad).
+        """
+        user = create_test_user(db_session)
+        create_test_invoice(db_session, user.id)
+        
+        with count_queries() as statements:
+            response = client.get("/api/v1/dashboard/stats")
+        
+        assert response.status_code == 200
+        assert len(statements) == 4
+
+
+class TestDashboardAggregation:
+    """Tests para la agregación consolidada del dashboard."""
+    
+    def _seed(self, db_session):
+        """Crear facturas con varios estados, categorías y métodos de pago."""
+        user = create_test_user(db_session)
+        create_test_invoice(db_session, user.id, amount=100.0, status=InvoiceStatus.PENDING,
+                            category=ExpenseCategory.MEALS, payment_method=PaymentMethod.CASH)
+        create_test_invoice(db_session, user.id, amount=200.0, status=InvoiceStatus.VALIDATED,
+                            category=ExpenseCategory.MEALS, payment_method=PaymentMethod.TARJETA_BST)
+        create_test_invoice(db_session, user.id, amount=50.0, status=InvoiceStatus.REJECTED,
+                            category=ExpenseCategory.TRANSPORT, payment_method=PaymentMethod.CASH)
+        create_test_invoice(db_session, user.id, amount=25.0, status=InvoiceStatus.VALIDATED,
+                            category=ExpenseCategory.OTHER, payment_method=PaymentMethod.TRANSFER)
+    
+    def test_aggregate_invoices_single_query(self, db_session):
+        """
+        Caso de éxito: Totales y distribuciones en una consulta.
+        
+        Verifica los totales por estado, categoría y método de pago.
+        """
+        from src.services.dashboard_stats import aggregate_invoices
+        
+        self._seed(db_session)
+        
+        with count_queries() as statements:
+            aggregates = aggregate_invoices(db_session)
+        
+        assert len(statements) == 1
+        assert aggregates.total_users == 1
+        assert aggregates.total_invoices == 4
+        assert aggregates.total_amount == 375.0
+        assert aggregates.by_status[InvoiceStatus.VALIDATED] == (2, 225.0)
+        assert aggregates.by_category[ExpenseCategory.MEALS] == (2, 300.0)
+        assert aggregates.by_payment_method[PaymentMethod.CASH] == (2, 150.0)
+        assert list(aggregates.by_category) == [
+            ExpenseCategory.TRANSPORT, ExpenseCategory.MEALS, ExpenseCategory.OTHER
+        ]
+    
+    def test_sections_match_aggregation(self, client, db_session):
+        """
+        Caso de éxito: Secciones del dashboard sobre la agregación.
+        
+        Verifica las estadísticas básicas, distribuciones y validación.
+        """
+        self._seed(db_session)
+        
+        data = client.get("/api/v1/dashboard/stats").json()
+        
+        assert data["basic_stats"]["invoices_by_status"] == {
+            InvoiceStatus.PENDING.value: 1, InvoiceStatus.VALIDATED.value: 2, InvoiceStatus.REJECTED.value: 1
+        }
+        assert data["basic_stats"]["amount_by_status"][InvoiceStatus.VALIDATED.value] == 225.0
+        categories = {item["category"]: item for item in data["category_distribution"]}
+        assert categories[ExpenseCategory.MEALS.value]["count"] == 2
+        methods = {item["method"]: item for item in data["payment_method_distribution"]}
+        assert methods[PaymentMethod.TRANSFER.value]["total_amount"] == 25.0
+        assert data["validation_performance"]["total_validated"] == 3
+        assert data["validation_performance"]["validation_rate"] == 75.0
+    
+    def test_empty_database_counts_users(self, db_session):
+        """
+        Caso borde: Usuarios sin facturas.
+        
+        Verifica que el conteo de usuarios no depende de que existan facturas.
+        """
+        from src.services.dashboard_stats import aggregate_invoices
+        
+        create_test_user(db_session)
+        
+        aggregates = aggregate_invoices(db_session)
+        
+        assert aggregates.total_users == 1
+        assert aggregates.total_invoices == 0
+        assert aggregates.by_status == {}
+
+
+class TestInvoiceDailyRollups:
+    """Tests para los rollups diarios de facturas."""
+    
+    def _rollups(self, db_session):
+        """Filas de rollup como diccionario clave -> (conteo, monto)."""
+        from src.models import InvoiceDailyRollup
+        
+        db_session.expire_all()
+        return {
+            (row.day, row.user_id, row.category, row.payment_method, row.status):
+                (row.invoice_count, row.total_amount)
+            for row in db_session.query(InvoiceDailyRollup).all()
+        }
+    
+    def test_rollups_follow_invoice_writes(self, db_session):
+        """
+        Caso de éxito: Mantenimiento incremental.
+        
+        Verifica los rollups al crear, modificar y eliminar facturas.
+        """
+        user = create_test_user(db_session)
+        first = create_test_invoice(db_session, user.id, amount=100.0, date=datetime(2024, 1, 15, 10, 30))
+        create_test_invoice(db_session, user.id, amount=50.0, date=datetime(2024, 1, 15, 18, 0))
+        
+        key = (date(2024, 1, 15), user.id, ExpenseCategory.OTHER, PaymentMethod.CASH, InvoiceStatus.PENDING)
+        assert self._rollups(db_session) == {key: (2, 150.0)}
+        
+        first.status = InvoiceStatus.VALIDATED
+        first.amount = 120.0
+        db_session.commit()
+        validated_key = key[:4] + (InvoiceStatus.VALIDATED,)
+        assert self._rollups(db_session) == {key: (1, 50.0), validated_key: (1, 120.0)}
+        
+        db_session.delete(first)
+        db_session.commit()
+        assert self._rollups(db_session) == {key: (1, 50.0)}
+    
+    def test_rebuild_matches_incremental(self, db_session):
+        """
+        Caso de éxito: Reconstrucción de los rollups.
+        
+        Verifica que el backfill reproduce los rollups incrementales.
+        """
+        from src.models import InvoiceDailyRollup
+        from src.services.invoice_rollups import rebuild_invoice_rollups
+        
+        user = create_test_user(db_session)
+        create_test_invoice(db_session, user.id, amount=10.0, date=datetime(2024, 2, 1, 8, 0))
+        create_test_invoice(db_session, user.id, amount=20.0, date=datetime(2024, 2, 1, 23, 59),
+                            status=InvoiceStatus.REJECTED)
+        create_test_invoice(db_session, user.id, amount=30.0, date=datetime(2024, 3, 5, 12, 0),
+                            category=ExpenseCategory.MEALS)
+        incremental = self._rollups(db_session)
+        
+        db_session.query(InvoiceDailyRollup).delete()
+        db_session.commit()
+        assert rebuild_invoice_rollups(db_session) == 3
+        db_session.commit()
+        
+        assert self._rollups(db_session) == incremental
+
+    def test_offset_aware_late_evening_date(self, db_session):
+        """
+        Caso borde: Fecha con offset al final del día.
+
+        Verifica que crear, modificar y eliminar una factura con fecha
+        `21:00-05:00` descuenta del mismo día que la reconstrucción.
+        """
+        from datetime import timezone, timedelta
+        from src.services.invoice_rollups import rebuild_invoice_rollups
+
+        def rebuilt():
+            incremental = self._rollups(db_session)
+            rebuild_invoice_rollups(db_session)
+            db_session.commit()
+            assert self._rollups(db_session) == incremental
+            return incremental
+
+        user = create_test_user(db_session)
+        bogota = timezone(timedelta(hours=-5))
+        invoice = create_test_invoice(db_session, user.id, amount=80.0, date=datetime(2024, 1, 15, 21, 0, tzinfo=bogota))
+        assert sum(count for count, _ in rebuilt().values()) == 1
+
+        invoice = db_session.get(type(invoice), invoice.id)
+        invoice.amount = 90.0
+        db_session.commit()
+        assert list(rebuilt().values()) == [(1, 90.0)]
+
+        db_session.delete(invoice)
+        db_session.commit()
+        assert rebuilt() == {}
+
+    def test_postgresql_day_is_taken_in_utc(self):
+        """
+        Caso borde: Zona de la sesión de PostgreSQL distinta de UTC.
+
+        Verifica que la reconstrucción toma el día en UTC de forma explícita
+        y no con `CAST(date AS DATE)`, que depende del `TimeZone` de la sesión.
+        """
+        from unittest.mock import Mock
+        from sqlalchemy.dialects import postgresql
+        from src.services.invoice_rollups import invoice_day
+
+        dialect = postgresql.dialect()
+        db = Mock()
+        db.get_bind.return_value.dialect = dialect
+
+        sql = str(invoice_day(db).compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+        assert sql == "CAST(timezone('UTC', invoices.date) AS DATE)"
+
+    def test_monthly_trends_use_calendar_months(self, db_session):
+        """
+        Caso borde: Meses calendario en las tendencias.
+        
+        Verifica que se incluye desde el primer día del mes más antiguo.
+        """
+        from src.services.dashboard_stats import DashboardStatsService
+        
+        user = create_test_user(db_session)
+        today = date.today()
+        current_month = datetime(today.year, today.month, 1, 9, 0)
+        previous_month = (current_month - timedelta(days=1)).replace(day=1)
+        older_month = (previous_month - timedelta(days=1)).replace(day=1)
+        create_test_invoice(db_session, user.id, amount=10.0, date=current_month)
+        create_test_invoice(db_session, user.id, amount=20.0, date=previous_month)
+        create_test_invoice(db_session, user.id, amount=40.0, date=older_month)
+        
+        service = DashboardStatsService(db_session)
+        trends = service.get_monthly_trends(months=2)
+        
+        assert [(item["year"], item["month"], item["total_amount"]) for item in trends] == [
+            (previous_month.year, previous_month.month, 20.0),
+            (current_month.year, current_month.month, 10.0),
+        ]
+        assert service.get_monthly_trends(months=0) == []
+
+
+class FakeRedis:
+    """Cliente Redis en memoria con las operaciones que usa la caché."""
+    
+    def __init__(self):
+        self.values = {}
+        self.available = True
+    
+    def _check(self):
+        if not self.available:
+            raise ConnectionError("Redis no disponible")
+    
+    def get(self, key):
+        self._check()
+        return self.values.get(key)
+    
+    def mget(self, *keys):
+        self._check()
+        return [self.values.get(key) for key in keys]
+    
+    def set(self, key, value, ex=None):
+        self._check()
+        self.values[key] = value.encode() if isinstance(value, str) else value
+    
+    def incr(self, key):
+        self._check()
+        self.values[key] = str(int(self.values.get(key) or 0) + 1).encode()
+        return int(self.values[key])
+
+
+class TestValidationPerformance:
+    """Tests para las métricas de tiempo de validación."""
+    
+    HOURS = [1.0, 2.0, 4.0, 8.0, 30.0]
+    
+    def _seed(self, db_session):
+        """Crear facturas validadas con tiempos de validación conocidos."""
+        from src.models import User, UserRole
+        
+        owner = create_test_user(db_session)
+        validator = User(name="Validador", email="validador@boosting.com", role=UserRole.ADMIN)
+        db_session.add(validator)
+        db_session.commit()
+        created = datetime(2024, 3, 1, 8, 0)
+        for index, hours in enumerate(self.HOURS):
+            create_test_invoice(
+                db_session, owner.id,
+                status=InvoiceStatus.REJECTED if index == 0 else InvoiceStatus.VALIDATED,
+                created_at=created,
+                validated_at=created + timedelta(hours=hours),
+                validated_by=validator.id
+            )
+        # Validada antes del registro de tiempos y pendiente
+        create_test_invoice(db_session, owner.id, status=InvoiceStatus.VALIDATED)
+        create_test_invoice(db_session, owner.id, status=InvoiceStatus.PENDING)
+        return validator
+    
+    @staticmethod
+    def _percentile(values, p):
+        """Percentil con interpolación lineal (como percentile_cont)."""
+        ordered = sorted(values)
+        rank = p * (len(ordered) - 1)
+        lower = int(rank)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+    
+    def test_validation_timing_in_sql(self, db_session):
+        """
+        Caso de éxito: Promedio y percentiles del tiempo de validación.
+        
+        Verifica los valores con una consulta y sin cargar facturas.
+        """
+        from src.services.dashboard_stats import aggregate_validation_timing
+        
+        self._seed(db_session)
+        
+        with count_queries() as statements:
+            timing = aggregate_validation_timing(db_session)
+        
+        assert len(statements) == 1
+        assert timing.count == len(self.HOURS)
+        assert timing.avg_hours == pytest.approx(sum(self.HOURS) / len(self.HOURS), abs=1e-3)
+        for p in (0.5, 0.9, 0.99):
+            assert timing.percentiles[p] == pytest.approx(self._percentile(self.HOURS, p), abs=1e-3)
+    
+    def test_validation_performance_section(self, db_session):
+        """
+        Caso de éxito: Sección de rendimiento de validación.
+        
+        Verifica los conteos, percentiles y el rendimiento por validador.
+        """
+        from src.services.dashboard_stats import DashboardStatsService
+        
+        validator = self._seed(db_session)
+        
+        performance = DashboardStatsService(db_session, use_cache=False).get_validation_performance()
+        
+        assert performance["total_validated"] == 6
+        assert performance["timed_validations"] == 5
+        assert performance["validation_rate"] == round(6 / 7 * 100, 2)
+        assert performance["p50_validation_time_hours"] == 4.0
+        assert performance["by_validator"] == [{
+            "user_id": validator.id,
+            "name": "Validador",
+            "total": 5,
+            "validated": 4,
+            "rejected": 1,
+            "avg_validation_time_hours": 9.0,
+            "validations_per_day": round(5 / (29 / 24), 2)
+        }]
+    
+    def test_validate_records_validator(self, client, created_user, created_invoice):
+        """
+        Caso de éxito: Registro de la validación.
+        
+        Verifica que validar guarda el momento y el usuario validador.
+        """
+        response = client.patch(
+            f"/api/v1/invoices/{created_invoice['id']}/validate",
+            data={"new_status": "validada", "validated_by": created_user["id"]}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["validated_by"] == created_user["id"]
+        assert data["validated_at"] is not None
+        
+        performance = client.get("/api/v1/dashboard/validation-performance").json()["validation_performance"]
+        assert performance["timed_validations"] == 1
+        assert performance["by_validator"][0]["user_id"] == created_user["id"]
+    
+    def test_validate_unknown_validator(self, client, created_invoice):
+        """
+        Caso de fallo: Validador inexistente.
+        
+        Verifica que se rechaza un validador que no existe.
+        """
+        response = client.patch(
+            f"/api/v1/invoices/{created_invoice['id']}/validate",
+            data={"new_status": "validada", "validated_by": 999}
+        )
+        
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Usuario validador no encontrado"
+
+
+class TestDashboardScope:
+    """Tests para las estadísticas por rango de fechas, colaborador y categoría."""
+    
+    def _seed(self, db_session):
+        """Crear facturas de dos colaboradores en distintos trimestres y categorías."""
+        from src.models import User, UserRole
+        
+        ana = create_test_user(db_session)
+        luis = User(name="Luis", email="luis@boosting.com", role=UserRole.COLLABORATOR)
+        db_session.add(luis)
+        db_session.commit()
+        create_test_invoice(db_session, ana.id, amount=100.0, date=datetime(2024, 1, 10, 9, 0),
+                            category=ExpenseCategory.MEALS)
+        create_test_invoice(db_session, ana.id, amount=40.0, date=datetime(2024, 3, 31, 23, 59),
+                            category=ExpenseCategory.TRANSPORT)
+        create_test_invoice(db_session, ana.id, amount=70.0, date=datetime(2024, 4, 1, 8, 0),
+                            category=ExpenseCategory.MEALS)
+        create_test_invoice(db_session, luis.id, amount=500.0, date=datetime(2024, 2, 15, 12, 0),
+                            category=ExpenseCategory.MEALS)
+        return ana, luis
+    
+    def test_scoped_basic_stats(self, client, db_session):
+        """
+        Caso de éxito: Estadísticas de un trimestre y un colaborador.
+        
+        Verifica que el rango es inclusivo y que se filtra por usuario.
+        """
+        ana, _ = self._seed(db_session)
+        
+        response = client.get(
+            "/api/v1/dashboard/basic-stats",
+            params={"start_date": "2024-01-01", "end_date": "2024-03-31", "user_id": ana.id}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_invoices"] == 2
+        assert data["total_amount"] == 140.0
+        assert data["total_users"] == 1
+    
+    def test_scoped_sections(self, client, db_session):
+        """
+        Caso de éxito: Secciones filtradas por categoría.
+        
+        Verifica distribuciones, usuarios, tendencias y actividad con el mismo alcance.
+        """
+        self._seed(db_session)
+        params = {"category": ExpenseCategory.MEALS.value, "end_date": "2024-03-31"}
+        
+        data = client.get("/api/v1/dashboard/stats", params=params).json()
+        
+        assert data["partial"] is False
+        assert [item["category"] for item in data["category_distribution"]] == [ExpenseCategory.MEALS.value]
+        assert data["basic_stats"]["total_amount"] == 600.0
+        assert [user["name"] for user in data["user_stats"]] == ["Luis", "Test User"]
+        assert [(item["month"], item["total_amount"]) for item in data["monthly_trends"]] == [
+            (1, 100.0), (2, 500.0)
+        ]
+        assert sorted(item["amount"] for item in data["recent_activity"]) == [100.0, 500.0]
+        
+        trends = client.get("/api/v1/dashboard/trends", params={**params, "months": 2}).json()["trends"]
+        assert [item["month"] for item in trends] == [2]
+    
+    def test_scoped_results_cached_separately(self, client, db_session):
+        """
+        Caso borde: Caché por alcance.
+        
+        Verifica que el resultado global y el filtrado no se mezclan.
+        """
+        _, luis = self._seed(db_session)
+        
+        global_stats = client.get("/api/v1/dashboard/basic-stats").json()
+        scoped = client.get("/api/v1/dashboard/basic-stats", params={"user_id": luis.id}).json()
+        scoped_again = client.get("/api/v1/dashboard/basic-stats", params={"user_id": luis.id}).json()
+        
+        assert global_stats["total_invoices"] == 4
+        assert scoped["total_invoices"] == 1
+        assert scoped_again == scoped
+    
+    def test_invalid_date_range(self, client, db_session):
+        """
+        Caso de fallo: Rango de fechas invertido.
+        
+        Verifica que se rechaza una fecha de inicio posterior a la de fin.
+        """
+        response = client.get(
+            "/api/v1/dashboard/stats", params={"start_date": "2024-04-01", "end_date": "2024-03-31"}
+        )
+        
+        assert response.status_code == 400
+
+
+class TestDashboardCache:
+    """Tests para la caché de estadísticas del dashboard."""
+    
+    def test_repeated_stats_served_from_cache(self, client, db_session):
+        """
+        Caso de éxito: Segunda carga del dashboard.
+        
+        Verifica que la segunda petición no consulta la base de datos.
+        """
+        user = create_test_user(db_session)
+        create_test_invoice(db_session, user.id)
+        
+        before = client.get("/api/v1/dashboard/cache-stats").json()
+        first = client.get("/api/v1/dashboard/stats").json()
+        with count_queries() as statements:
+            second = client.get("/api/v1/dashboard/stats").json()
+        
+        assert second == first
+        assert statements == []
+        stats = client.get("/api/v1/dashboard/cache-stats").json()
+        assert stats["backend"] == "memory"
+        assert stats["hits"] - before["hits"] == 7
+        assert stats["misses"] - before["misses"] == 7
+        assert stats["entries"] == 7
+    
+    def test_invoice_write_invalidates_cache(self, client, created_user, test_invoice):
+        """
+        Caso de éxito: Invalidación al escribir facturas.
+        
+        Verifica que crear, validar y eliminar facturas actualiza las estadísticas.
+        """
+        def basic_stats():
+            return client.get("/api/v1/dashboard/basic-stats").json()
+        
+        assert basic_stats()["total_invoices"] == 0
+        
+        invoice_data = {**test_invoice, "user_id": created_user["id"]}
+        invoice = client.post("/api/v1/invoices/upload", data=invoice_data).json()
+        assert basic_stats()["total_invoices"] == 1
+        
+        client.patch(f"/api/v1/invoices/{invoice['id']}/validate", data={"new_status": "validada"})
+        assert basic_stats()["invoices_by_status"] == {InvoiceStatus.VALIDATED.value: 1}
+        
+        client.delete(f"/api/v1/invoices/{invoice['id']}")
+        assert basic_stats()["total_invoices"] == 0
+    
+    def test_sections_cached_by_arguments(self, db_session):
+        """
+        Caso borde: Argumentos de las secciones.
+        
+        Verifica que los valores por defecto comparten la clave de la caché.
+        """
+        from src.services.dashboard_stats import DashboardStatsService
+        
+        create_test_user(db_session)
+        service = DashboardStatsService(db_session)
+        
+        with count_queries() as statements:
+            service.get_user_stats()
+            service.get_user_stats(10)
+            service.get_user_stats(limit=10)
+            service.get_user_stats(5)
+        
+        assert len(statements) == 2
+    
+    def test_memory_cache_expiration_and_generation(self):
+        """
+        Caso borde: Expiración e invalidación concurrente.
+        
+        Verifica el TTL, el límite de entradas y que se descartan los valores
+        calculados antes de una invalidación.
+        """
+        from src.services.dashboard_cache import MemoryDashboardCache
+        
+        cache = MemoryDashboardCache(ttl_seconds=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+        
+        cache = MemoryDashboardCache(ttl_seconds=60, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        assert cache.get("a") is None
+        assert cache.get("c") == "c"
+        
+        generation = cache.generation()
+        cache.invalidate()
+        cache.set("d", "antes", generation)
+        assert cache.get("d") is None
+    
+    def test_redis_cache_generation(self):
+        """
+        Caso de éxito: Caché compartida en Redis.
+        
+        Verifica que la invalidación por generación alcanza a otras instancias.
+        """
+        from src.services.dashboard_cache import RedisDashboardCache
+        
+        client = FakeRedis()
+        cache_a = RedisDashboardCache(client=client)
+        cache_b = RedisDashboardCache(client=client)
+        
+        cache_a.set("basic", {"total_invoices": 3}, cache_a.generation())
+        assert cache_b.get("basic") == {"total_invoices": 3}
+        
+        generation = cache_a.generation()
+        cache_b.invalidate()
+        assert cache_a.get("basic") is None
+        cache_a.set("basic", {"total_invoices": 2}, generation)
+        assert cache_b.get("basic") is None
+        assert cache_b.get_stats() == {"entries": None, "hits": 1, "misses": 1}
+    
+    def test_redis_failure_backoff(self, monkeypatch):
+        """
+        Caso de fallo: Redis caído durante varias peticiones.
+        
+        Verifica que tras un error no se vuelve a llamar a Redis hasta que pasa la espera,
+        salvo para invalidar.
+        """
+        from src.services import dashboard_cache
+        from src.services.dashboard_cache import RedisDashboardCache
+        
+        redis_client = FakeRedis()
+        calls = []
+        check = redis_client._check
+        redis_client._check = lambda: (calls.append(1), check())
+        cache = RedisDashboardCache(client=redis_client, failure_backoff=30)
+        now = [1000.0]
+        monkeypatch.setattr(dashboard_cache.time, "monotonic", lambda: now[0])
+        
+        redis_client.available = False
+        assert cache.generation() is None
+        assert cache.get("basic") is None
+        cache.set("basic", {"total_invoices": 1}, 0)
+        assert len(calls) == 1
+        
+        cache.invalidate()
+        assert len(calls) == 2
+        
+        redis_client.available = True
+        now[0] += 31
+        assert cache.generation() == 0
+    
+    def test_redis_unavailable_falls_back_to_database(self, client, db_session):
+        """
+        Caso de fallo: Redis no disponible.
+        
+        Verifica que el dashboard se calcula desde la base de datos.
+        """
+        from src.services.dashboard_cache import RedisDashboardCache, set_dashboard_cache
+        
+        redis_client = FakeRedis()
+        redis_client.available = False
+        set_dashboard_cache(RedisDashboardCache(client=redis_client))
+        try:
+            user = create_test_user(db_session)
+            create_test_invoice(db_session, user.id)
+            
+            response = client.get("/api/v1/dashboard/basic-stats")
+            
+            assert response.status_code == 200
+            assert response.json()["total_invoices"] == 1
+        finally:
+            set_dashboard_cache(None)
+
+
+class TestDashboardConcurrency:
+    """Tests para el cálculo en paralelo de las secciones del dashboard."""
+    
+    @pytest.fixture
+    def parallel_factory(self, db_session):
+        """Fábrica de sesiones con un pool de conexiones independientes sobre la base de prueba."""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from tests.conftest import SQLALCHEMY_DATABASE_URL
+        
+        parallel_engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+        yield sessionmaker(autocommit=False, autoflush=False, bind=parallel_engine)
+        parallel_engine.dispose()
+    
+    def test_parallel_matches_sequential(self, db_session, parallel_factory):
+        """
+        Caso de éxito: Secciones en paralelo.
+        
+        Verifica que el resultado coincide con el cálculo en secuencia.
+        """
+        from sqlalchemy.orm import sessionmaker
+        from src.services.dashboard_cache import invalidate_dashboard_cache
+        from src.services.dashboard_stats import get_dashboard_stats
+        from tests.conftest import engine
+        
+        user = create_test_user(db_session)
+        create_test_invoice(db_session, user.id, amount=80.0)
+        create_test_invoice(db_session, user.id, amount=20.0, status=InvoiceStatus.VALIDATED)
+        
+        parallel = get_dashboard_stats(parallel_factory)
+        invalidate_dashboard_cache()
+        sequential = get_dashboard_stats(sessionmaker(bind=engine))
+        
+        assert parallel["partial"] is False
+        assert parallel["section_errors"] == {}
+        assert parallel == sequential
+        assert parallel["basic_stats"]["total_amount"] == 100.0
+    
+    def test_slow_section_returns_partial_result(self, db_session, parallel_factory, monkeypatch):
+        """
+        Caso borde: Sección lenta.
+        
+        Verifica que el resto de secciones se devuelve sin esperar a la lenta.
+        """
+        import time
+        from src.services.dashboard_stats import DashboardStatsService, get_dashboard_stats
+        
+        def slow_trends(self, months=6):
+            time.sleep(1)
+            return []
+        
+        monkeypatch.setattr(DashboardStatsService, "get_monthly_trends", slow_trends)
+        create_test_user(db_session)
+        
+        started = time.monotonic()
+        stats = get_dashboard_stats(parallel_factory, timeout=0.3)
+        elapsed = time.monotonic() - started
+        
+        assert elapsed < 0.9
+        assert stats["partial"] is True
+        assert stats["section_errors"] == {"monthly_trends": "timeout"}
+        assert stats["monthly_trends"] is None
+        assert stats["basic_stats"]["total_users"] == 1
+
+    def test_timeout_applies_per_section(self, db_session, parallel_factory, monkeypatch):
+        """
+        Caso borde: Varias secciones lentas en el mismo grupo.
+
+        Verifica que cada sección tiene su propio tiempo máximo aunque el grupo tarde más en total.
+        """
+        import time
+        from src.services.dashboard_stats import DashboardStatsService, get_dashboard_stats
+
+        def slowly(method):
+            def wrapper(self, *args, **kwargs):
+                time.sleep(0.2)
+                return method(self, *args, **kwargs)
+            return wrapper
+
+        for name in ("get_basic_stats", "get_category_distribution", "get_payment_method_distribution"):
+            monkeypatch.setattr(DashboardStatsService, name, slowly(getattr(DashboardStatsService, name)))
+        create_test_user(db_session)
+
+        stats = get_dashboard_stats(parallel_factory, timeout=0.35)
+
+        assert stats["partial"] is False
+        assert stats["basic_stats"]["total_users"] == 1
+
+    def test_timed_out_section_cancels_rest_of_group(self, db_session, parallel_factory, monkeypatch):
+        """
+        Caso borde: Sección vencida dentro de un grupo.
+
+        Verifica que las secciones siguientes del grupo no se calculan después del corte.
+        """
+        import time
+        from src.services.dashboard_stats import DashboardStatsService, get_dashboard_stats
+
+        calls = []
+
+        def slow_basic_stats(self):
+            time.sleep(0.6)
+            return {}
+
+        def category_distribution(self):
+            calls.append("category_distribution")
+            return []
+
+        monkeypatch.setattr(DashboardStatsService, "get_basic_stats", slow_basic_stats)
+        monkeypatch.setattr(DashboardStatsService, "get_category_distribution", category_distribution)
+
+        stats = get_dashboard_stats(parallel_factory, timeout=0.2)
+        time.sleep(0.6)
+
+        assert calls == []
+        assert stats["section_errors"] == {
+            name: "timeout"
+            for name in ("basic_stats", "category_distribution", "payment_method_distribution", "validation_performance")
+        }
+        assert stats["monthly_trends"] is not None
+
+    def test_failing_section_reported(self, client, db_session, monkeypatch):
+        """
+        Caso de fallo: Error en una sección.
+        
+        Verifica que el error se informa y las demás secciones se devuelven.
+        """
+        from src.services.dashboard_stats import DashboardStatsService
+        
+        def broken_user_stats(self, limit=10):
+            raise RuntimeError("consulta fallida")
+        
+        monkeypatch.setattr(DashboardStatsService, "get_user_stats", broken_user_stats)
+        
+        response = client.get("/api/v1/dashboard/stats")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["partial"] is True
+        assert data["section_errors"] == {"user_stats": "consulta fallida"}
+        assert data["user_stats"] is None
+        assert data["basic_stats"]["total_invoices"] == 0
+
+
 class TestDashboardErrorHandling:
     """Tests para manejo de errores en el dashboard."""
     
@@ -5,7 +5,9 @@ Cubre casos de éxito, borde y fallo.
 
 import pytest
 from fastapi.testclient import TestClient
+from datetime import datetime
 from src.models import PaymentMethod, ExpenseCategory, InvoiceStatus
+from tests.conftest import create_test_invoice, count_queries
 
 
 class TestInvoiceEndpoints:
@@ -618,4 +620,1328 @@ class TestInvoiceFileDownload:
         response = client.get(f"/api/v1/invoices/{created_invoice['id']}/download")
         
         # El comportamiento depende de si la factura tiene archivo o no
-        assert response.status_code in [200, 404]
\ No newline at end of file
+        assert response.status_code in [200, 404]
+
+class TestInvoiceCursorPagination:
+    """Tests para la paginación por cursor (keyset) de facturas."""
+    
+    def _seed_invoices(self, db_session, user_id, count=5):
+        """Crear facturas con fechas distintas y una fecha repetida."""
+        dates = [datetime(2024, 1, day, 10, 0) for day in range(1, count)]
+        dates.append(dates[-1])  # Empate de fecha para probar el desempate por id
+        return [
+            create_test_invoice(db_session, user_id, date=date, provider=f"Proveedor {i}")
+            for i, date in enumerate(dates)
+        ]
+    
+    def test_cursor_pagination_walks_all_pages(self, client, created_user, db_session):
+        """
+        Caso de éxito: Recorrer todas las páginas con el cursor.
+        
+        Verifica que no se repiten ni se omiten facturas y que el orden es (date, id) descendente.
+        """
+        invoices = self._seed_invoices(db_session, created_user["id"])
+        expected_ids = [
+            inv.id for inv in sorted(invoices, key=lambda inv: (inv.date, inv.id), reverse=True)
+        ]
+        
+        seen_ids = []
+        response = client.get("/api/v1/invoices/?pagination=cursor&size=2")
+        while True:
+            assert response.status_code == 200
+            data = response.json()
+            assert data["total"] is None
+            seen_ids.extend(item["id"] for item in data["items"])
+            if not data["next_cursor"]:
+                break
+            response = client.get(f"/api/v1/invoices/?size=2&cursor={data['next_cursor']}")
+        
+        assert seen_ids == expected_ids
+    
+    def test_cursor_pagination_with_total(self, client, created_user, db_session):
+        """
+        Caso de éxito: Solicitar el total en modo cursor.
+        
+        Verifica que include_total=true calcula el total y las páginas.
+        """
+        self._seed_invoices(db_session, created_user["id"])
+        
+        response = client.get("/api/v1/invoices/?pagination=cursor&size=2&include_total=true")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 5
+        assert data["pages"] == 3
+        assert data["next_cursor"] is not None
+    
+    def test_cursor_pagination_respects_filters(self, client, created_user, db_session):
+        """
+        Caso de éxito: Filtros combinados con el cursor.
+        
+        Verifica que el cursor solo recorre las facturas filtradas.
+        """
+        self._seed_invoices(db_session, created_user["id"])
+        create_test_invoice(db_session, created_user["id"], status=InvoiceStatus.VALIDATED)
+        
+        response = client.get(f"/api/v1/invoices/?pagination=cursor&size=10&status={InvoiceStatus.VALIDATED.value}")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["items"]) == 1
+        assert data["next_cursor"] is None
+    
+    def test_cursor_pagination_invalid_cursor(self, client):
+        """
+        Caso de fallo: Cursor mal formado.
+        
+        Verifica que se devuelve error 400 para cursores inválidos.
+        """
+        response = client.get("/api/v1/invoices/?cursor=no-es-un-cursor")
+        
+        assert response.status_code == 400
+        assert "Cursor" in response.json()["detail"]
+    
+    def test_offset_pagination_skips_total(self, client, created_user, db_session):
+        """
+        Caso de borde: Omitir el conteo en modo offset.
+        
+        Verifica que include_total=false no calcula el total.
+        """
+        self._seed_invoices(db_session, created_user["id"])
+        
+        response = client.get("/api/v1/invoices/?page=1&size=2&include_total=false")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["items"]) == 2
+        assert data["total"] is None
+        assert data["pages"] is None
+    
+    def test_count_invoices_success(self, client, created_user, db_session):
+        """
+        Caso de éxito: Contar facturas por separado.
+        
+        Verifica que el endpoint de conteo aplica los mismos filtros que el listado.
+        """
+        self._seed_invoices(db_session, created_user["id"])
+        
+        response = client.get(f"/api/v1/invoices/count?user_id={created_user['id']}")
+        
+        assert response.status_code == 200
+        assert response.json()["total"] == 5
+
+
+class TestInvoiceCountCache:
+    """Tests para la caché de totales del listado de facturas."""
+    
+    def test_count_is_cached_per_filter_set(self, client, created_user, db_session):
+        """
+        Caso de éxito: Reutilizar el total de un conjunto de filtros.
+        
+        Verifica que el total se sirve desde la caché mientras no haya escrituras por la API.
+        """
+        create_test_invoice(db_session, created_user["id"], provider="Taxi Express")
+        
+        response = client.get("/api/v1/invoices/?provider=taxi")
+        assert response.json()["total"] == 1
+        
+        # Escritura directa en la base de datos: la caché no se entera
+        create_test_invoice(db_session, created_user["id"], provider="Taxi Libre")
+        response = client.get("/api/v1/invoices/?provider=TAXI")
+        assert response.json()["total"] == 1
+        
+        # Otro conjunto de filtros se cuenta por separado
+        response = client.get("/api/v1/invoices/?provider=libre")
+        assert response.json()["total"] == 1
+    
+    def test_count_cache_invalidated_on_write(self, client, created_user, db_session, test_invoice):
+        """
+        Caso de éxito: Invalidar la caché al crear facturas.
+        
+        Verifica que crear una factura por la API refresca los totales.
+        """
+        response = client.get("/api/v1/invoices/")
+        assert response.json()["total"] == 0
+        
+        invoice_data = {**test_invoice, "user_id": created_user["id"]}
+        assert client.post("/api/v1/invoices/upload", data=invoice_data).status_code == 201
+        
+        response = client.get("/api/v1/invoices/")
+        assert response.json()["total"] == 1
+    
+    def test_count_cache_invalidated_on_delete(self, client, created_invoice):
+        """
+        Caso de éxito: Invalidar la caché al eliminar facturas.
+        
+        Verifica que eliminar una factura refresca los totales.
+        """
+        assert client.get("/api/v1/invoices/count").json()["total"] == 1
+        
+        client.delete(f"/api/v1/invoices/{created_invoice['id']}")
+        
+        assert client.get("/api/v1/invoices/count").json()["total"] == 0
+    
+    def test_estimate_falls_back_to_exact_count(self, client, created_invoice):
+        """
+        Caso de borde: Estimación sin soporte del motor.
+        
+        Verifica que en SQLite estimate=true devuelve el total exacto.
+        """
+        response = client.get("/api/v1/invoices/?estimate=true")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert data["total_is_estimate"] is False
+    
+    def test_count_cache_expires(self):
+        """
+        Caso de borde: Expiración por TTL.
+        
+        Verifica que una entrada vencida se descarta.
+        """
+        from src.services.count_cache import CountCache
+        
+        cache = CountCache(ttl_seconds=0)
+        cache.set({"status": InvoiceStatus.PENDING}, 3)
+        
+        assert cache.get({"status": InvoiceStatus.PENDING}) is None
+        assert cache.get_stats()["misses"] == 1
+
+    def test_count_cache_shared_generation(self):
+        """
+        Caso de éxito: Invalidación entre procesos.
+
+        Verifica que un cambio de la generación compartida descarta los totales de otra instancia
+        y que sin generación disponible no se usa la caché.
+        """
+        from src.services.count_cache import CountCache
+
+        shared = {"generation": 0}
+        source = lambda: shared["generation"]
+        worker_a = CountCache(shared_generation=source)
+        worker_b = CountCache(shared_generation=source)
+        filters = {"status": InvoiceStatus.PENDING}
+
+        generation = worker_a.generation()
+        worker_a.set(filters, 3, generation)
+        assert worker_a.get(filters) == 3
+
+        # Escritura atendida por la otra instancia
+        shared["generation"] += 1
+        worker_b.invalidate()
+        assert worker_a.get(filters) is None
+        worker_a.set(filters, 3, generation)
+        assert worker_a.get(filters) is None
+
+        shared["generation"] = None
+        worker_a.set(filters, 4)
+        assert worker_a.get(filters) is None
+
+    def test_count_cache_key_normalization(self):
+        """
+        Caso de borde: Normalización de filtros.
+        
+        Verifica que filtros vacíos, enums y mayúsculas no generan claves distintas.
+        """
+        from src.services.count_cache import CountCache
+        
+        key_a = CountCache.make_key({"status": InvoiceStatus.PENDING, "provider": " Taxi ", "user_id": None})
+        key_b = CountCache.make_key({"provider": "taxi", "status": "pendiente", "search_text": ""})
+        
+        assert key_a == key_b
+
+
+class TestInvoiceEagerLoading:
+    """Tests para la carga del usuario sin consultas N+1."""
+    
+    def _seed_invoices_for_many_users(self, db_session, count):
+        """Crear facturas repartidas entre varios usuarios."""
+        from src.models import User
+        
+        users = []
+        for i in range(count):
+            user = User(name=f"Colaborador {i}", email=f"colaborador{i}@boosting.com")
+            db_session.add(user)
+            users.append(user)
+        db_session.commit()
+        for user in users:
+            create_test_invoice(db_session, user.id)
+    
+    @pytest.mark.parametrize("query_string", ["", "pagination=cursor&"])
+    def test_list_query_count_independent_of_page_size(self, client, db_session, query_string):
+        """
+        Caso de éxito: Número fijo de consultas por página.
+        
+        Verifica que serializar una página no carga cada usuario por separado.
+        """
+        self._seed_invoices_for_many_users(db_session, 12)
+        
+        statement_counts = []
+        for size in (2, 10):
+            with count_queries() as statements:
+                response = client.get(f"/api/v1/invoices/?{query_string}size={size}&include_total=false")
+            assert response.status_code == 200
+            assert len(response.json()["items"]) == size
+            assert all(item["user"]["name"] for item in response.json()["items"])
+            statement_counts.append(len(statements))
+        
+        assert statement_counts[0] == statement_counts[1] == 1
+    
+    def test_detail_loads_user_in_single_query(self, client, db_session):
+        """
+        Caso de éxito: Detalle de factura con su usuario.
+        
+        Verifica que el detalle se resuelve con una sola consulta.
+        """
+        self._seed_invoices_for_many_users(db_session, 1)
+        invoice_id = client.get("/api/v1/invoices/").json()["items"][0]["id"]
+        
+        with count_queries() as statements:
+            response = client.get(f"/api/v1/invoices/{invoice_id}")
+        
+        assert response.status_code == 200
+        assert response.json()["user"]["name"] == "Colaborador 0"
+        assert len(statements) == 1
+
+
+class TestInvoiceTextSearch:
+    """Tests para la búsqueda de texto de facturas."""
+    
+    def test_search_matches_nit(self, client, created_user, db_session):
+        """
+        Caso de éxito: Buscar por NIT.
+        
+        Verifica que search_text también busca en el NIT de la factura.
+        """
+        create_test_invoice(db_session, created_user["id"], nit="900123456-7")
+        create_test_invoice(db_session, created_user["id"], nit="800000000-1")
+        
+        response = client.get("/api/v1/invoices/?search_text=900123456")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert data["items"][0]["nit"] == "900123456-7"
+    
+    def test_search_matches_ocr_raw_text(self, client, created_user, db_session):
+        """
+        Caso de éxito: Buscar en el texto extraído por OCR.
+        
+        Verifica que search_text encuentra facturas por su texto OCR.
+        """
+        create_test_invoice(
+            db_session, created_user["id"],
+            ocr_data={"raw_text": "PEAJE AUTOPISTA NORTE CASETA 3"}
+        )
+        create_test_invoice(db_session, created_user["id"], ocr_data={"raw_text": "HOTEL CENTRAL"})
+        
+        response = client.get("/api/v1/invoices/?search_text=autopista")
+        
+        assert response.status_code == 200
+        assert response.json()["total"] == 1
+    
+    def test_search_uses_full_text_on_postgres(self, db_session):
+        """
+        Caso de éxito: Consulta de texto completo en PostgreSQL.
+        
+        Verifica que en PostgreSQL se usa la columna tsvector y el ranking.
+        """
+        from unittest.mock import patch
+        from sqlalchemy.dialects import postgresql
+        from src.models import Invoice
+        from src.services import invoice_search
+        
+        query = db_session.query(Invoice)
+        with patch.object(invoice_search, "_dialect_name", return_value="postgresql"):
+            filtered = invoice_search.apply_text_search(query, "almuerzo trabajo")
+            rank = invoice_search.search_rank(query, "almuerzo trabajo")
+        
+        sql = str(filtered.order_by(rank.desc()).statement.compile(dialect=postgresql.dialect()))
+        assert "invoices.search_vector @@ websearch_to_tsquery" in sql
+        assert "ts_rank(invoices.search_vector" in sql
+        assert "ILIKE" in sql
+
+
+class TestInvoiceUploadStreaming:
+    """Tests para la carga de archivos adjuntos por bloques."""
+    
+    @pytest.fixture
+    def upload_dir(self, tmp_path, monkeypatch):
+        """Directorio temporal de cargas."""
+        from src.database import settings
+        
+        monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+        return tmp_path
+    
+    def test_upload_with_file_success(self, client, created_user, test_invoice, upload_dir):
+        """
+        Caso de éxito: Subir factura con archivo adjunto.
+        
+        Verifica que el archivo se guarda completo en el directorio de cargas.
+        """
+        content = b"%PDF-1.4 factura de prueba" * 1000
+        invoice_data = {**test_invoice, "user_id": created_user["id"]}
+        
+        response = client.post(
+            "/api/v1/invoices/upload",
+            data=invoice_data,
+            files={"file": ("factura.pdf", content, "application/pdf")}
+        )
+        
+        assert response.status_code == 201
+        saved = list(upload_dir.rglob("*.pdf"))
+        assert len(saved) == 1
+        assert saved[0].read_bytes() == content
+    
+    def test_upload_file_too_large(self, client, created_user, test_invoice, upload_dir, monkeypatch):
+        """
+        Caso de fallo: Archivo que supera el tamaño máximo.
+        
+        Verifica que se rechaza la carga y no queda ningún archivo parcial.
+        """
+        from src.database import settings
+        
+        monkeypatch.setattr(settings, "max_file_size", 1024)
+        invoice_data = {**test_invoice, "user_id": created_user["id"]}
+        
+        response = client.post(
+            "/api/v1/invoices/upload",
+            data=invoice_data,
+            files={"file": ("factura.pdf", b"x" * 4096, "application/pdf")}
+        )
+        
+        assert response.status_code == 400
+        assert "demasiado grande" in response.json()["detail"]
+        assert not any(path.is_file() for path in upload_dir.rglob("*"))
+    
+    def test_store_upload_hashes_in_chunks(self, tmp_path):
+        """
+        Caso de éxito: Hash SHA-256 calculado por bloques.
+        
+        Verifica que el hash y el tamaño coinciden con el contenido completo.
+        """
+        import asyncio
+        import hashlib
+        import io
+        from fastapi import UploadFile
+        from src.services.attachment_storage import store_upload, set_storage_backend, LocalStorageBackend
+        
+        content = bytes(range(256)) * 50
+        upload = UploadFile(io.BytesIO(content), filename="recibo.png")
+        
+        set_storage_backend(LocalStorageBackend(root=str(tmp_path)))
+        try:
+            stored = asyncio.run(store_upload(
+                upload, suffix=".png", max_size=len(content), chunk_size=1000
+            ))
+        finally:
+            set_storage_backend(None)
+        
+        assert stored.size == len(content)
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+        assert stored.path == f"{tmp_path}/{stored.sha256[:2]}/{stored.sha256}.png"
+        with open(stored.path, "rb") as saved:
+            assert saved.read() == content
+
+
+class TestInvoiceAttachmentDeduplication:
+    """Tests para el almacén de adjuntos direccionado por contenido."""
+    
+    @pytest.fixture
+    def upload_dir(self, tmp_path, monkeypatch):
+        """Directorio temporal de cargas."""
+        from src.database import settings
+        
+        monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+        return tmp_path
+    
+    def _upload(self, client, user_id, test_invoice, content):
+        """Subir una factura con el contenido indicado como adjunto."""
+        response = client.post(
+            "/api/v1/invoices/upload",
+            data={**test_invoice, "user_id": user_id},
+            files={"file": ("recibo.pdf", content, "application/pdf")}
+        )
+        assert response.status_code == 201
+        return response.json()
+    
+    def test_identical_uploads_share_blob(self, client, created_user, test_invoice, upload_dir):
+        """
+        Caso de éxito: Deduplicar cargas idénticas.
+        
+        Verifica que dos facturas con el mismo archivo apuntan al mismo blob.
+        """
+        first = self._upload(client, created_user["id"], test_invoice, b"mismo recibo")
+        second = self._upload(client, created_user["id"], test_invoice, b"mismo recibo")
+        third = self._upload(client, created_user["id"], test_invoice, b"otro recibo")
+        
+        assert first["file_path"] == second["file_path"]
+        assert third["file_path"] != first["file_path"]
+        assert len([path for path in upload_dir.rglob("*.pdf")]) == 2
+    
+    def test_blob_deleted_with_last_reference(self, client, created_user, test_invoice, upload_dir):
+        """
+        Caso de éxito: Conteo de referencias al eliminar facturas.
+        
+        Verifica que el blob solo se elimina cuando se borra la última factura que lo usa.
+        """
+        import os
+        
+        first = self._upload(client, created_user["id"], test_invoice, b"recibo compartido")
+        second = self._upload(client, created_user["id"], test_invoice, b"recibo compartido")
+        blob = first["file_path"]
+        
+        assert client.delete(f"/api/v1/invoices/{first['id']}").status_code == 204
+        assert os.path.exists(blob)
+        
+        assert client.delete(f"/api/v1/invoices/{second['id']}").status_code == 204
+        assert not os.path.exists(blob)
+
+    def test_pending_ocr_job_keeps_blob(self, client, created_user, test_invoice, upload_dir):
+        """
+        Caso de éxito: Un trabajo de OCR activo también referencia el blob.
+
+        Verifica que borrar la última factura no elimina un archivo que un trabajo pendiente va a leer.
+        """
+        import os
+        from tests.conftest import TestingSessionLocal
+        from src.services.ocr_jobs import create_ocr_job
+
+        invoice = self._upload(client, created_user["id"], test_invoice, b"recibo en cola")
+        db = TestingSessionLocal()
+        try:
+            create_ocr_job(db, created_user["id"], invoice["file_path"])
+        finally:
+            db.close()
+
+        assert client.delete(f"/api/v1/invoices/{invoice['id']}").status_code == 204
+        assert os.path.exists(invoice["file_path"])
+
+    def test_storage_failure_keeps_delete(self, client, created_user, test_invoice, upload_dir, monkeypatch):
+        """
+        Caso de éxito: Un fallo del almacén no impide borrar la factura.
+
+        Verifica que el borrado responde 204, que el blob queda huérfano y que la sesión se revierte.
+        """
+        import os
+        from src.services.attachment_storage import LocalStorageBackend
+
+        invoice = self._upload(client, created_user["id"], test_invoice, b"recibo huerfano")
+
+        def broken_delete(self, key):
+            raise OSError("almacén no disponible")
+
+        monkeypatch.setattr(LocalStorageBackend, "delete", broken_delete)
+
+        assert client.delete(f"/api/v1/invoices/{invoice['id']}").status_code == 204
+        assert client.get(f"/api/v1/invoices/{invoice['id']}").status_code == 404
+        assert os.path.exists(invoice["file_path"])
+
+    def test_store_locks_blob_before_dedup(self, tmp_path, monkeypatch):
+        """
+        Caso de éxito: Bloqueo por contenido antes de deduplicar.
+
+        Verifica que la clave se bloquea en la sesión antes de comprobar o escribir el blob.
+        """
+        import os
+        from src.services import attachment_storage
+        from src.services.attachment_storage import store_file, set_storage_backend, LocalStorageBackend
+
+        source = tmp_path / "factura.png"
+        source.write_bytes(b"imagen de factura")
+        locked = []
+        monkeypatch.setattr(
+            attachment_storage, "lock_blob",
+            lambda db, key: locked.append((db, key, os.path.exists(key)))
+        )
+
+        set_storage_backend(LocalStorageBackend(root=str(tmp_path / "blobs")))
+        try:
+            session = object()
+            stored = store_file(str(source), ".png", db=session)
+        finally:
+            set_storage_backend(None)
+
+        assert locked == [(session, stored.path, False)]
+
+    def test_store_file_is_content_addressed(self, tmp_path):
+        """
+        Caso de éxito: Guardar un archivo local por su hash.
+        
+        Verifica que la ruta del blob se deriva del SHA-256 del contenido.
+        """
+        import hashlib
+        from src.services.attachment_storage import store_file, set_storage_backend, LocalStorageBackend
+        
+        source = tmp_path / "factura.PNG"
+        source.write_bytes(b"imagen de factura")
+        sha256 = hashlib.sha256(b"imagen de factura").hexdigest()
+        
+        set_storage_backend(LocalStorageBackend(root=str(tmp_path / "blobs")))
+        try:
+            stored = store_file(str(source), ".PNG")
+            assert stored.sha256 == sha256
+            assert stored.path == f"{tmp_path / 'blobs'}/{sha256[:2]}/{sha256}.png"
+            assert store_file(str(source), ".png").path == stored.path
+        finally:
+            set_storage_backend(None)
+
+
+class TestInvoiceDownloadRanges:
+    """Tests para descargas parciales y condicionales de adjuntos."""
+    
+    CONTENT = bytes(range(256)) * 4
+    
+    @pytest.fixture
+    def uploaded(self, client, created_user, test_invoice, tmp_path, monkeypatch):
+        """Factura con un adjunto PDF guardado en un directorio temporal."""
+        from src.database import settings
+        
+        monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+        response = client.post(
+            "/api/v1/invoices/upload",
+            data={**test_invoice, "user_id": created_user["id"]},
+            files={"file": ("recibo.pdf", self.CONTENT, "application/pdf")}
+        )
+        assert response.status_code == 201
+        return response.json()
+    
+    def _url(self, invoice):
+        return f"/api/v1/invoices/{invoice['id']}/download"
+    
+    def test_full_download_has_strong_etag(self, client, uploaded):
+        """
+        Caso de éxito: Descarga completa con ETag fuerte.
+        
+        Verifica que el ETag es el hash del contenido y que se anuncian rangos.
+        """
+        import hashlib
+        
+        response = client.get(self._url(uploaded))
+        
+        assert response.status_code == 200
+        assert response.content == self.CONTENT
+        assert response.headers["etag"] == f'"{hashlib.sha256(self.CONTENT).hexdigest()}"'
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.headers["content-length"] == str(len(self.CONTENT))
+    
+    def test_byte_range(self, client, uploaded):
+        """
+        Caso de éxito: Descarga de un rango de bytes.
+        
+        Verifica la respuesta 206 con el fragmento y Content-Range.
+        """
+        response = client.get(self._url(uploaded), headers={"Range": "bytes=100-199"})
+        
+        assert response.status_code == 206
+        assert response.content == self.CONTENT[100:200]
+        assert response.headers["content-range"] == f"bytes 100-199/{len(self.CONTENT)}"
+        assert response.headers["content-length"] == "100"
+    
+    def test_suffix_and_open_ranges(self, client, uploaded):
+        """
+        Caso borde: Rangos por sufijo y abiertos.
+        
+        Verifica `bytes=-N` (últimos N bytes) y `bytes=N-` (hasta el final).
+        """
+        suffix = client.get(self._url(uploaded), headers={"Range": "bytes=-24"})
+        open_range = client.get(self._url(uploaded), headers={"Range": "bytes=1000-"})
+        
+        assert suffix.status_code == 206
+        assert suffix.content == self.CONTENT[-24:]
+        assert open_range.content == self.CONTENT[1000:]
+    
+    def test_unsatisfiable_range(self, client, uploaded):
+        """
+        Caso de fallo: Rango fuera del archivo.
+        
+        Verifica la respuesta 416 con el tamaño total.
+        """
+        response = client.get(self._url(uploaded), headers={"Range": "bytes=5000-6000"})
+        
+        assert response.status_code == 416
+        assert response.headers["content-range"] == f"bytes */{len(self.CONTENT)}"
+    
+    def test_if_none_match_returns_304(self, client, uploaded):
+        """
+        Caso de éxito: Revalidación con If-None-Match.
+        
+        Verifica que un ETag vigente devuelve 304 sin cuerpo.
+        """
+        etag = client.get(self._url(uploaded)).headers["etag"]
+        
+        response = client.get(self._url(uploaded), headers={"If-None-Match": etag})
+        stale = client.get(self._url(uploaded), headers={"If-None-Match": '"otro"'})
+        
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert stale.status_code == 200
+    
+    def test_if_modified_since_returns_304(self, client, uploaded):
+        """
+        Caso de éxito: Revalidación con If-Modified-Since.
+        
+        Verifica que la fecha de Last-Modified devuelve 304.
+        """
+        last_modified = client.get(self._url(uploaded)).headers["last-modified"]
+        
+        response = client.get(self._url(uploaded), headers={"If-Modified-Since": last_modified})
+        
+        assert response.status_code == 304
+    
+    def test_if_range_mismatch_sends_full_file(self, client, uploaded):
+        """
+        Caso borde: If-Range con un ETag distinto.
+        
+        Verifica que se ignora el rango y se envía el archivo completo.
+        """
+        response = client.get(
+            self._url(uploaded),
+            headers={"Range": "bytes=0-9", "If-Range": '"otro"'}
+        )
+        
+        assert response.status_code == 200
+        assert response.content == self.CONTENT
+    
+    def test_zerocopysend_extension(self, uploaded):
+        """
+        Caso de éxito: Transferencia sin copias.
+        
+        Verifica que con la extensión ASGI zerocopysend se envía el archivo
+        abierto con el desplazamiento del rango en lugar de los bytes.
+        """
+        import asyncio
+        import io
+        import os
+        from src.services.file_response import AttachmentResponse
+        
+        stat_result = os.stat(uploaded["file_path"])
+        response = AttachmentResponse(
+            path=uploaded["file_path"],
+            request_headers={"range": "bytes=10-19"},
+            stat_result=stat_result,
+            etag='"x"',
+            media_type="application/pdf",
+            filename="recibo.pdf"
+        )
+        messages = []
+        
+        async def send(message):
+            if message["type"] == "http.response.zerocopysend":
+                # El servidor recibe el objeto archivo y usa su descriptor para sendfile()
+                handle = message["file"]
+                assert isinstance(handle, io.IOBase) and not handle.closed
+                message = {**message, "data": os.pread(handle.fileno(), message["count"], message["offset"])}
+            messages.append(message)
+        
+        scope = {"type": "http", "extensions": {"http.response.zerocopysend": {}}}
+        asyncio.run(response(scope, None, send))
+        
+        assert messages[0]["status"] == 206
+        assert len(messages) == 2
+        zerocopy = messages[1]
+        assert set(zerocopy) == {"type", "file", "offset", "count", "more_body", "data"}
+        assert zerocopy["type"] == "http.response.zerocopysend"
+        assert zerocopy["offset"] == 10
+        assert zerocopy["count"] == 10
+        assert zerocopy["more_body"] is False
+        assert zerocopy["data"] == self.CONTENT[10:20]
+        assert zerocopy["file"].closed
+
+
+class TestInvoiceExcelExport:
+    """Tests para la exportación de facturas a Excel en memoria constante."""
+    
+    def _load_rows(self, content):
+        """Leer las filas de un libro Excel recibido."""
+        import io
+        import openpyxl
+        
+        workbook = openpyxl.load_workbook(io.BytesIO(content))
+        return list(workbook["Facturas Boosting"].iter_rows(values_only=True))
+    
+    def test_download_streams_workbook(self, client, created_user, db_session):
+        """
+        Caso de éxito: Descargar el Excel en la respuesta.
+        
+        Verifica el título, los encabezados, las filas y el total sin insertar filas.
+        """
+        create_test_invoice(db_session, created_user["id"], provider="Proveedor A", amount=100.0)
+        create_test_invoice(db_session, created_user["id"], provider="Proveedor B", amount=50.5)
+        
+        response = client.get("/api/v1/invoices/export/excel?download=true")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith(
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+        assert "attachment" in response.headers["content-disposition"]
+        rows = self._load_rows(response.content)
+        assert rows[0][0] == "REPORTE DE FACTURAS - BOOSTING"
+        assert rows[1][0].startswith("Generado el:")
+        assert rows[2][0] == "ID" and rows[2][9] == "Fecha de Registro"
+        assert {rows[3][3], rows[4][3]} == {"Proveedor A", "Proveedor B"}
+        assert rows[5][3] == "TOTAL:"
+        assert rows[5][4] == 150.5
+    
+    def test_download_applies_status_filter(self, client, created_user, db_session):
+        """
+        Caso de éxito: Exportar filtrando por estado.
+        
+        Verifica que el filtro `status` se aplica a la exportación.
+        """
+        create_test_invoice(db_session, created_user["id"], provider="Pendiente")
+        create_test_invoice(db_session, created_user["id"], provider="Validada", status=InvoiceStatus.VALIDATED)
+        
+        response = client.get(
+            f"/api/v1/invoices/export/excel?download=true&status={InvoiceStatus.VALIDATED.value}"
+        )
+        
+        assert response.status_code == 200
+        rows = self._load_rows(response.content)
+        assert rows[3][3] == "Validada"
+        assert rows[4][3] == "TOTAL:"
+    
+    def test_shared_formats(self, tmp_path, created_user, db_session):
+        """
+        Caso borde: Formatos compartidos.
+        
+        Verifica que el número de estilos del libro no crece con el número de filas.
+        """
+        import zipfile
+        from src.models import Invoice
+        from src.services.excel_export import write_invoices_workbook, invoice_export_query, iter_export_rows
+        
+        for day in range(1, 21):
+            create_test_invoice(db_session, created_user["id"], date=datetime(2024, 1, day))
+        query = invoice_export_query(db_session)
+        
+        small, large = tmp_path / "small.xlsx", tmp_path / "large.xlsx"
+        assert write_invoices_workbook(iter_export_rows(query.filter(Invoice.date == datetime(2024, 1, 1))), str(small), 100.0) == 1
+        assert write_invoices_workbook(iter_export_rows(query), str(large), 2000.0) == 20
+        
+        def styles(path):
+            with zipfile.ZipFile(path) as archive:
+                return archive.read("xl/styles.xml")
+        
+        assert styles(small) == styles(large)
+
+    def test_rows_are_batched_tuples(self, created_user, db_session):
+        """
+        Caso de éxito: Lectura por lotes de tuplas.
+        
+        Verifica que las filas se leen ordenadas, como tuplas con solo las
+        columnas exportadas y sin consultas adicionales por fila.
+        """
+        from src.models import Invoice
+        from src.services.excel_export import invoice_export_query, iter_export_rows, EXPORT_COLUMNS
+        
+        for day in range(1, 8):
+            create_test_invoice(db_session, created_user["id"], date=datetime(2024, 1, 8 - day))
+        query = invoice_export_query(db_session)
+        
+        with count_queries() as queries:
+            rows = list(iter_export_rows(query, batch_size=3))
+        
+        assert len(queries) == 1
+        assert len(rows) == 7
+        assert not isinstance(rows[0], Invoice)
+        assert len(rows[0]) == len(EXPORT_COLUMNS)
+        assert rows[0].user_name == created_user["name"]
+        assert [row.date.day for row in rows] == list(range(1, 8))
+    
+    def test_totals_computed_in_sql(self, created_user, db_session):
+        """
+        Caso de éxito: Totales de la exportación.
+        
+        Verifica el número de facturas y la suma de montos con los filtros aplicados.
+        """
+        from src.models import Invoice
+        from src.services.excel_export import invoice_export_query, export_totals
+        
+        create_test_invoice(db_session, created_user["id"], amount=10.25)
+        create_test_invoice(db_session, created_user["id"], amount=20.5)
+        create_test_invoice(db_session, created_user["id"], amount=99.0, status=InvoiceStatus.REJECTED)
+        query = invoice_export_query(db_session).filter(Invoice.status == InvoiceStatus.PENDING)
+        
+        totals = export_totals(query)
+        empty = export_totals(query.filter(Invoice.amount > 1000))
+        
+        assert totals.count == 2
+        assert totals.amount == pytest.approx(30.75)
+        assert (empty.count, empty.amount) == (0, 0.0)
+
+
+class TestInvoiceExportJobs:
+    """Tests para los trabajos de exportación en segundo plano."""
+    
+    @pytest.fixture(autouse=True)
+    def upload_dir(self, tmp_path, monkeypatch):
+        """Directorios temporales del almacén de archivos y de las exportaciones."""
+        from src.database import settings
+        
+        monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+        monkeypatch.setattr(settings, "export_dir", str(tmp_path / "exports"))
+        return tmp_path / "uploads"
+    
+    def test_job_completes_and_downloads(self, client, created_user, db_session):
+        """
+        Caso de éxito: Crear, consultar y descargar una exportación.
+        
+        Verifica el progreso final y que el archivo se sirve desde el almacén.
+        """
+        import io
+        import openpyxl
+        
+        for day in range(1, 4):
+            create_test_invoice(db_session, created_user["id"], date=datetime(2024, 1, day))
+        
+        response = client.post("/api/v1/invoices/export/jobs")
+        
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+        job = client.get(f"/api/v1/invoices/export/jobs/{job_id}").json()
+        assert job["status"] == "completado"
+        assert job["total_rows"] == 3
+        assert job["rows_written"] == 3
+        assert job["progress"] == 1.0
+        
+        download = client.get(f"/api/v1/invoices/export/jobs/{job_id}/download")
+        assert download.status_code == 200
+        assert f'facturas_boosting_{job_id}.xlsx' in download.headers["content-disposition"]
+        sheet = openpyxl.load_workbook(io.BytesIO(download.content))["Facturas Boosting"]
+        assert sheet.max_row == 7  # título, fecha, encabezados, 3 filas y total
+    
+    def test_export_file_not_published_in_uploads(self, client, created_user, db_session, upload_dir):
+        """
+        Caso borde: Archivo de exportación fuera de /uploads.
+        
+        Verifica que el archivo no queda en el directorio público y que su nombre no se deduce del ID.
+        """
+        import os
+        from src.database import settings
+        from src.models import ExportJob
+        
+        create_test_invoice(db_session, created_user["id"])
+        job_id = client.post("/api/v1/invoices/export/jobs").json()["id"]
+        file_key = db_session.get(ExportJob, job_id).file_key
+        
+        assert os.path.exists(file_key)
+        assert os.path.dirname(file_key) == settings.export_dir
+        assert not any(path.is_file() for path in upload_dir.rglob("*"))
+        assert os.path.basename(file_key) != f"facturas_boosting_{job_id}.xlsx"
+    
+    def test_identical_filters_reuse_job(self, client, created_user, db_session):
+        """
+        Caso de éxito: Reutilizar una exportación reciente.
+        
+        Verifica que los mismos filtros devuelven el mismo trabajo y otros filtros crean uno nuevo.
+        """
+        create_test_invoice(db_session, created_user["id"])
+        url = f"/api/v1/invoices/export/jobs?user_id={created_user['id']}"
+        
+        first = client.post(url)
+        second = client.post(url)
+        other = client.post(f"{url}&status={InvoiceStatus.PENDING.value}")
+        
+        assert second.status_code == 200
+        assert second.json()["reused"] is True
+        assert second.json()["id"] == first.json()["id"]
+        assert other.status_code == 202
+        assert other.json()["id"] != first.json()["id"]
+    
+    def test_expired_job_is_regenerated(self, client, created_user, db_session, monkeypatch):
+        """
+        Caso borde: Ventana de frescura vencida.
+        
+        Verifica que fuera de la ventana se genera una exportación nueva.
+        """
+        from src.database import settings
+        
+        create_test_invoice(db_session, created_user["id"])
+        monkeypatch.setattr(settings, "export_cache_ttl", 0)
+        
+        first = client.post("/api/v1/invoices/export/jobs").json()
+        second = client.post("/api/v1/invoices/export/jobs").json()
+        
+        assert second["id"] != first["id"]
+        assert second["reused"] is False
+
+    def test_stale_running_job_is_not_reused(self, db_session):
+        """
+        Caso borde: Trabajo en curso sin avance.
+
+        Verifica que un trabajo que dejó de avanzar se marca como fallido y no se reutiliza.
+        """
+        from datetime import timedelta, timezone
+        from src.models import ExportJob, ExportJobStatus
+        from src.services import export_jobs
+
+        stuck, _ = export_jobs.submit_export_job(db_session, {})
+        stuck.status = ExportJobStatus.RUNNING
+        stuck.updated_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        db_session.commit()
+
+        job, reused = export_jobs.submit_export_job(db_session, {})
+
+        assert reused is False
+        assert job.id != stuck.id
+        db_session.expire_all()
+        stuck = db_session.get(ExportJob, stuck.id)
+        assert stuck.status == ExportJobStatus.FAILED
+        assert "dejó de avanzar" in stuck.error
+
+    def test_expired_exports_are_purged(self, client, created_user, db_session, monkeypatch):
+        """
+        Caso de éxito: Limpieza de exportaciones vencidas.
+
+        Verifica que al crear una exportación se eliminan los trabajos y archivos fuera de la retención.
+        """
+        import os
+        from datetime import timedelta, timezone
+        from src.database import settings
+        from src.models import ExportJob
+        from src.services.attachment_storage import get_storage_backend
+
+        create_test_invoice(db_session, created_user["id"])
+        old_id = client.post("/api/v1/invoices/export/jobs").json()["id"]
+        old_job = db_session.get(ExportJob, old_id)
+        file_key = old_job.file_key
+        assert get_storage_backend().exists(file_key)
+
+        old_job.created_at = datetime.now(timezone.utc) - timedelta(days=2)
+        db_session.commit()
+        monkeypatch.setattr(settings, "export_retention", 3600)
+
+        response = client.post(f"/api/v1/invoices/export/jobs?user_id={created_user['id']}")
+
+        assert response.status_code == 202
+        db_session.expire_all()
+        assert db_session.get(ExportJob, old_id) is None
+        assert not os.path.exists(file_key)
+
+    def test_job_without_invoices_fails(self, client):
+        """
+        Caso de fallo: Exportación sin facturas.
+        
+        Verifica que el trabajo termina como fallido y no se puede descargar.
+        """
+        job_id = client.post("/api/v1/invoices/export/jobs").json()["id"]
+        
+        job = client.get(f"/api/v1/invoices/export/jobs/{job_id}").json()
+        download = client.get(f"/api/v1/invoices/export/jobs/{job_id}/download")
+        
+        assert job["status"] == "fallido"
+        assert "No hay facturas" in job["error"]
+        assert download.status_code == 409
+    
+    def test_job_not_found(self, client):
+        """
+        Caso de fallo: Trabajo inexistente.
+        
+        Verifica que se devuelve 404.
+        """
+        response = client.get("/api/v1/invoices/export/jobs/noexiste")
+        
+        assert response.status_code == 404
+    
+    def test_progress_is_reported_by_batches(self, created_user, db_session, monkeypatch):
+        """
+        Caso de éxito: Progreso por lotes.
+        
+        Verifica que el trabajo actualiza las filas escritas durante la escritura.
+        """
+        from functools import partial
+        from sqlalchemy.orm import sessionmaker
+        from src.services import export_jobs
+        
+        for day in range(1, 6):
+            create_test_invoice(db_session, created_user["id"], date=datetime(2024, 1, day))
+        reported = []
+        monkeypatch.setattr(
+            export_jobs, "write_invoices_workbook",
+            partial(self._recording_writer, reported)
+        )
+        job, _ = export_jobs.submit_export_job(db_session, {})
+        
+        export_jobs.run_export_job(job.id, sessionmaker(bind=db_session.get_bind()))
+        
+        assert reported == [2, 4, 5]
+    
+    @staticmethod
+    def _recording_writer(reported, rows, output, total_amount, progress):
+        from src.services.excel_export import write_invoices_workbook
+        
+        def record(rows_written):
+            reported.append(rows_written)
+            progress(rows_written)
+        
+        return write_invoices_workbook(rows, output, total_amount, progress=record, progress_every=2)
+
+
+class TestInvoiceStreamingExport:
+    """Tests para las exportaciones CSV y NDJSON en flujo."""
+    
+    def test_csv_export(self, client, created_user, db_session):
+        """
+        Caso de éxito: Exportar a CSV.
+        
+        Verifica el encabezado y las filas en orden de fecha.
+        """
+        import csv
+        import io
+        
+        create_test_invoice(db_session, created_user["id"], provider="Segunda, S.A.", date=datetime(2024, 2, 1))
+        create_test_invoice(db_session, created_user["id"], provider="Primera", date=datetime(2024, 1, 1))
+        
+        response = client.get("/api/v1/invoices/export/csv", headers={"Accept-Encoding": "identity"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "content-encoding" not in response.headers
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [row["provider"] for row in rows] == ["Primera", "Segunda, S.A."]
+        assert rows[0]["user_name"] == created_user["name"]
+        assert rows[0]["status"] == InvoiceStatus.PENDING.value
+    
+    def test_ndjson_export_with_filter(self, client, created_user, db_session):
+        """
+        Caso de éxito: Exportar a NDJSON con filtro de estado.
+        
+        Verifica que cada línea es un objeto JSON y que se aplica el filtro.
+        """
+        import json
+        
+        create_test_invoice(db_session, created_user["id"], provider="Pendiente")
+        create_test_invoice(db_session, created_user["id"], provider="Validada", status=InvoiceStatus.VALIDATED)
+        
+        response = client.get(
+            f"/api/v1/invoices/export/ndjson?status={InvoiceStatus.VALIDATED.value}",
+            headers={"Accept-Encoding": "identity"}
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert len(records) == 1
+        assert records[0]["provider"] == "Validada"
+        assert records[0]["amount"] == 100.0
+    
+    def test_gzip_when_accepted(self, client, created_user, db_session):
+        """
+        Caso de éxito: Compresión gzip sobre la marcha.
+        
+        Verifica que el cuerpo viaja comprimido si el cliente acepta gzip.
+        """
+        import gzip
+        
+        create_test_invoice(db_session, created_user["id"], provider="Comprimida")
+        
+        with client.stream("GET", "/api/v1/invoices/export/csv", headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join(response.iter_raw())
+        
+        assert response.headers["content-encoding"] == "gzip"
+        assert b"Comprimida" in gzip.decompress(raw)
+    
+    def test_empty_export_has_header_only(self, client):
+        """
+        Caso borde: Exportación sin facturas.
+        
+        Verifica que el CSV contiene solo el encabezado.
+        """
+        response = client.get("/api/v1/invoices/export/csv", headers={"Accept-Encoding": "identity"})
+        
+        assert response.status_code == 200
+        assert response.text.strip() == "id,user_name,date,provider,amount,payment_method,category,status,description,created_at"
+    
+    def test_encoders_flush_in_blocks(self):
+        """
+        Caso de éxito: Generación por bloques.
+        
+        Verifica que los codificadores emiten un bloque cada `flush_rows` filas
+        y que gzip_stream produce un gzip válido del flujo completo.
+        """
+        import gzip
+        from types import SimpleNamespace
+        from src.services.stream_export import iter_csv, iter_ndjson, gzip_stream
+        
+        rows = [
+            SimpleNamespace(
+                id=i, user_name="Ana", date=datetime(2024, 1, 1), provider=f"P{i}", amount=1.0,
+                payment_method=PaymentMethod.CASH, category=ExpenseCategory.OTHER,
+                status=InvoiceStatus.PENDING, description=None, created_at=datetime(2024, 1, 2)
+            )
+            for i in range(5)
+        ]
+        
+        csv_chunks = list(iter_csv(iter(rows), flush_rows=2))
+        ndjson_chunks = list(iter_ndjson(iter(rows), flush_rows=2))
+        
+        assert len(csv_chunks) == 3
+        assert len(ndjson_chunks) == 3
+        assert gzip.decompress(b"".join(gzip_stream(iter(csv_chunks)))) == b"".join(csv_chunks)
+
+
+class TestInvoiceColumnarExport:
+    """Tests para las exportaciones Parquet y Arrow IPC."""
+    
+    def test_parquet_has_typed_columns(self, client, created_user, db_session):
+        """
+        Caso de éxito: Exportar a Parquet.
+        
+        Verifica monto numérico, fecha como timestamp y enums como diccionario.
+        """
+        import io
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        create_test_invoice(db_session, created_user["id"], amount=1234.5, date=datetime(2024, 3, 1, 8, 0))
+        create_test_invoice(db_session, created_user["id"], amount=10.0, category=ExpenseCategory.MEALS)
+        
+        response = client.get("/api/v1/invoices/export/parquet")
+        
+        assert response.status_code == 200
+        assert "attachment" in response.headers["content-disposition"]
+        table = pq.read_table(io.BytesIO(response.content))
+        assert table.num_rows == 2
+        assert table.schema.field("amount").type == pa.float64()
+        assert pa.types.is_timestamp(table.schema.field("date").type)
+        assert pa.types.is_dictionary(table.schema.field("category").type)
+        assert table.column("amount").to_pylist() == [10.0, 1234.5]
+        assert table.column("category").to_pylist() == [ExpenseCategory.MEALS.value, ExpenseCategory.OTHER.value]
+        assert table.column("date").to_pylist()[1].replace(tzinfo=None) == datetime(2024, 3, 1, 8, 0)
+    
+    def test_arrow_export_with_filter(self, client, created_user, db_session):
+        """
+        Caso de éxito: Exportar a Arrow IPC con filtro de estado.
+        
+        Verifica que el archivo se lee con pyarrow y respeta el filtro.
+        """
+        import pyarrow.ipc as ipc
+        
+        create_test_invoice(db_session, created_user["id"], provider="Pendiente")
+        create_test_invoice(db_session, created_user["id"], provider="Rechazada", status=InvoiceStatus.REJECTED)
+        
+        response = client.get(f"/api/v1/invoices/export/arrow?status={InvoiceStatus.REJECTED.value}")
+        
+        assert response.status_code == 200
+        table = ipc.open_file(response.content).read_all()
+        assert table.column("provider").to_pylist() == ["Rechazada"]
+        assert table.column("status").to_pylist() == [InvoiceStatus.REJECTED.value]
+    
+    def test_multiple_record_batches(self, tmp_path, created_user, db_session):
+        """
+        Caso borde: Varios lotes de registros.
+        
+        Verifica que los lotes comparten el diccionario de enums (requisito de
+        Arrow IPC) y que Parquet escribe un grupo de filas por lote.
+        """
+        import pyarrow.ipc as ipc
+        import pyarrow.parquet as pq
+        from src.services.excel_export import invoice_export_query, iter_export_rows
+        from src.services.columnar_export import write_invoices_parquet, write_invoices_arrow
+        
+        statuses = [InvoiceStatus.PENDING, InvoiceStatus.VALIDATED, InvoiceStatus.REJECTED]
+        for day in range(1, 8):
+            create_test_invoice(
+                db_session, created_user["id"], date=datetime(2024, 1, day), status=statuses[day % 3]
+            )
+        query = invoice_export_query(db_session)
+        
+        parquet_path, arrow_path = tmp_path / "f.parquet", tmp_path / "f.arrow"
+        assert write_invoices_parquet(iter_export_rows(query), str(parquet_path), batch_size=3) == 7
+        assert write_invoices_arrow(iter_export_rows(query), str(arrow_path), batch_size=3) == 7
+        
+        assert pq.ParquetFile(str(parquet_path)).num_row_groups == 3
+        reader = ipc.open_file(str(arrow_path))
+        assert reader.num_record_batches == 3
+        assert reader.read_all().column("status").to_pylist() == [statuses[day % 3].value for day in range(1, 8)]
+    
+    def test_empty_export(self, client):
+        """
+        Caso borde: Exportación sin facturas.
+        
+        Verifica que se genera un archivo válido con el esquema y sin filas.
+        """
+        import io
+        import pyarrow.parquet as pq
+        
+        response = client.get("/api/v1/invoices/export/parquet")
+        
+        assert response.status_code == 200
+        table = pq.read_table(io.BytesIO(response.content))
+        assert table.num_rows == 0
+        assert "amount" in table.column_names
+
+
+class TestInvoiceSummaryExport:
+    """Tests para el resumen agregado de facturas."""
+    
+    def _seed(self, client, db_session, created_user):
+        """Crear dos usuarios con facturas en varios meses, categorías y métodos de pago."""
+        other = client.post("/api/v1/users/", json={"name": "Otra Persona", "email": "otra@boosting.com"}).json()
+        create_test_invoice(db_session, created_user["id"], amount=100.0, date=datetime(2024, 1, 5),
+                            category=ExpenseCategory.MEALS, payment_method=PaymentMethod.CASH)
+        create_test_invoice(db_session, created_user["id"], amount=50.0, date=datetime(2024, 1, 20),
+                            category=ExpenseCategory.MEALS, payment_method=PaymentMethod.TARJETA_BST)
+        create_test_invoice(db_session, created_user["id"], amount=25.0, date=datetime(2024, 2, 2),
+                            category=ExpenseCategory.TRANSPORT, payment_method=PaymentMethod.CASH)
+        create_test_invoice(db_session, other["id"], amount=400.0, date=datetime(2024, 2, 10),
+                            category=ExpenseCategory.MEALS, payment_method=PaymentMethod.CASH)
+        return other
+    
+    def test_summarize_with_group_by(self, client, created_user, db_session):
+        """
+        Caso de éxito: Agregados del resumen.
+        
+        Verifica totales y cantidades por cada agrupación con un número fijo de consultas.
+        """
+        from src.services.excel_export import invoice_export_query, summarize_invoices
+        
+        other = self._seed(client, db_session, created_user)
+        
+        with count_queries() as queries:
+            summary = summarize_invoices(invoice_export_query(db_session))
+        
+        assert len(queries) == 4
+        assert summary.by_user == [(other["name"], 400.0, 1), (created_user["name"], 175.0, 3)]
+        assert list(summary.by_category) == [(ExpenseCategory.MEALS, 550.0, 3), (ExpenseCategory.TRANSPORT, 25.0, 1)]
+        assert (created_user["name"], "2024-01", 150.0, 2) in summary.by_user_month
+        assert (created_user["name"], "2024-02", 25.0, 1) in summary.by_user_month
+        assert (ExpenseCategory.MEALS, PaymentMethod.CASH, 500.0, 2) in summary.by_category_payment
+    
+    def test_summary_endpoint_sheets(self, client, created_user, db_session):
+        """
+        Caso de éxito: Descargar el resumen en Excel.
+        
+        Verifica las hojas y las filas de usuario por mes.
+        """
+        import io
+        import openpyxl
+        
+        self._seed(client, db_session, created_user)
+        
+        response = client.get(f"/api/v1/invoices/export/summary?user_id={created_user['id']}")
+        
+        assert response.status_code == 200
+        workbook = openpyxl.load_workbook(io.BytesIO(response.content))
+        assert workbook.sheetnames == [
+            "Resumen por Usuario", "Resumen por Categoría", "Usuario por Mes", "Categoría por Pago"
+        ]
+        rows = list(workbook["Usuario por Mes"].iter_rows(values_only=True))
+        assert rows[0] == ("Usuario", "Mes", "Total Facturado", "Número de Facturas")
+        assert rows[1:] == [(created_user["name"], "2024-01", 150.0, 2), (created_user["name"], "2024-02", 25.0, 1)]
+    
+    def test_summary_without_invoices(self, client):
+        """
+        Caso de fallo: Resumen sin facturas.
+        
+        Verifica que se devuelve 404.
+        """
+        response = client.get("/api/v1/invoices/export/summary")
+        
+        assert response.status_code == 404
+        assert "No hay facturas para exportar" in response.json()["detail"]
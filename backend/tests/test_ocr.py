@@ -6,11 +6,16 @@ Prueba la funcionalidad de extracción de texto y datos de facturas.
 import pytest
 import tempfile
 import os
+import asyncio
+import threading
+import time
+import itertools
 from unittest.mock import Mock, patch, MagicMock
 from PIL import Image
 import io
 
-from src.services.ocr_service import OCRService, ocr_service
+from src.services.ocr_service import OCRService, ocr_service, PARSER_VERSION
+from src.models import PaymentMethod, ExpenseCategory
 
 
 class TestOCRService:
@@ -364,3 +369,572 @@ class TestOCRServiceIntegration:
         
         expected_formats = ['.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.pdf']
         assert service.supported_formats == expected_formats
+
+
+class TestFieldExtractor:
+    """Tests del motor de patrones precompilados de extracción de campos."""
+
+    TEXTS = [
+        "SUPERMERCADO ABC S.A.S.\nNIT: 900123456-7\nFECHA: 15/01/2024\nFACTURA N°: FE-1234\nTOTAL: $1.500\nEFECTIVO",
+        "RESTAURANTE EL SABOR LTDA\nEMISIÓN: 2024-03-02\nVALOR TOTAL 23.400\nMÉTODO DE PAGO: TRANSFERENCIA",
+        "PROVEEDOR: TIENDA XYZ FECHA 32/13/2024 2024/03/02 TOTAL: $0.00 12,500 PESOS",
+        "COMPROBANTE NO: 5567 IDENTIFICACIÓN: 80123456 A PAGAR $ 87.000 TARJETA",
+        "monto: -100 importe: abc valor: $500.25",
+        "texto sin información de factura",
+    ]
+
+    def test_first_matches_equal_findall(self):
+        """Test: Cada coincidencia es el primer elemento de re.findall, en orden de prioridad."""
+        import re
+        from src.services.ocr_extractor import FieldExtractor
+
+        extractor = FieldExtractor()
+        service = OCRService()
+        for text in self.TEXTS:
+            clean_text = re.sub(r'\s+', ' ', text.lower())
+            for patterns in service.patterns.values():
+                expected = [
+                    matches[0] for matches in (re.findall(p, clean_text, re.IGNORECASE) for p in patterns) if matches
+                ]
+                assert list(extractor.first_matches(patterns, clean_text)) == expected
+
+    def test_patterns_compiled_once(self):
+        """Test: Los patrones se compilan una sola vez y se reutilizan entre facturas."""
+        service = OCRService()
+        for text in self.TEXTS:
+            service.extract_invoice_data(text)
+        compiled = dict(service.extractor._compiled)
+        for text in self.TEXTS:
+            service.extract_invoice_data(text)
+
+        all_patterns = {p for patterns in service.patterns.values() for p in patterns}
+        assert compiled and set(compiled) <= all_patterns
+        assert service.extractor._compiled == compiled
+        for pattern, regex in compiled.items():
+            assert service.extractor.compile(pattern) is regex
+
+
+class TestKeywordClassifier:
+    """Tests del clasificador de categorías por palabras clave ponderadas."""
+
+    def test_best_match_wins_over_first_hit(self):
+        """Test: Gana la categoría con más peso, no la primera de la tabla que aparece."""
+        service = OCRService()
+        text = "HOTEL CASA BLANCA\nHOSPEDAJE 2 NOCHES\nBAR MINIBAR\nTOTAL 350.000"
+
+        assert service.classify_expense(text) == ExpenseCategory.ACCOMMODATION
+        assert service.classifier.scores(text) == {ExpenseCategory.ACCOMMODATION: 4, ExpenseCategory.MEALS: 1}
+
+    def test_maps_onto_expense_category(self):
+        """Test: Los resultados son miembros de ExpenseCategory; sin coincidencias es OTHER."""
+        service = OCRService()
+
+        assert service.classify_expense("EDS TERPEL GASOLINA CORRIENTE") == ExpenseCategory.TRANSPORT
+        assert service.classify_expense("DROGUERIA SAN JORGE") == ExpenseCategory.SUPPLIES
+        assert service.classify_expense("RECARGA CELULAR MOVISTAR") == ExpenseCategory.COMMUNICATION
+        assert service.classify_expense("texto sin palabras clave") == ExpenseCategory.OTHER
+
+        result = service.extract_invoice_data("RESTAURANTE EL SABOR\nTOTAL: $25.000")
+        assert result['category'] == ExpenseCategory.MEALS.value
+
+    def test_keywords_match_whole_words_only(self):
+        """Test: Una palabra clave dentro de otra palabra no cuenta (GL en INGLES, BAR en BARRIO)."""
+        from src.services.ocr_classifier import KeywordClassifier
+
+        classifier = KeywordClassifier({"transporte": {"GL": 1}, "alimentacion": ["BAR"], "otros": ["PLAN DE DATOS"]})
+
+        assert classifier.scores("INGLES BARRIO") == {}
+        assert classifier.scores("3.5 GL\nBAR") == {ExpenseCategory.TRANSPORT: 1, ExpenseCategory.MEALS: 1}
+        assert classifier.scores("PLAN  DE\nDATOS") == {ExpenseCategory.OTHER: 1}
+
+    def test_ties_resolved_by_table_order(self):
+        """Test: Con puntajes iguales gana la categoría que aparece primero en la tabla."""
+        from src.services.ocr_classifier import KeywordClassifier
+
+        classifier = KeywordClassifier({"hospedaje": ["HOTEL"], "alimentacion": ["RESTAURANTE"]})
+        assert classifier.classify("RESTAURANTE DEL HOTEL") == ExpenseCategory.ACCOMMODATION
+
+    def test_reloads_keyword_file_without_restart(self, tmp_path):
+        """Test: Editar el archivo de palabras clave cambia la clasificación; un archivo inválido se ignora."""
+        import json
+        from src.services.ocr_classifier import KeywordClassifier
+
+        path = tmp_path / "categorias.json"
+        path.write_text(json.dumps({"transporte": {"PARQUEADERO": 2}}))
+        classifier = KeywordClassifier(path=str(path))
+        assert classifier.classify("PARQUEADERO CENTRO") == ExpenseCategory.TRANSPORT
+
+        path.write_text(json.dumps({"otros": {"PARQUEADERO": 2}}))
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        assert classifier.classify("PARQUEADERO CENTRO") == ExpenseCategory.OTHER
+
+        path.write_text(json.dumps({"categoria_inexistente": ["PARQUEADERO"]}))
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        assert classifier.classify("PARQUEADERO CENTRO") == ExpenseCategory.OTHER
+        assert classifier.reload(force=True) is False
+
+    def test_invalid_table_rejected(self):
+        """Test: Categorías desconocidas o pesos no positivos se rechazan al cargar."""
+        from src.services.ocr_classifier import KeywordClassifier
+
+        with pytest.raises(ValueError):
+            KeywordClassifier({"combustible": ["GASOLINA"]})
+        with pytest.raises(ValueError):
+            KeywordClassifier({"transporte": {"TAXI": 0}})
+
+
+class TestOCRExecutor:
+    """Tests del pool de OCR con contrapresión y tiempo máximo."""
+
+    def setup_method(self):
+        from src.services.ocr_executor import set_ocr_executor
+        self.release = threading.Event()
+        set_ocr_executor(None)
+
+    def teardown_method(self):
+        from src.services.ocr_executor import get_ocr_executor, set_ocr_executor
+        self.release.set()
+        get_ocr_executor().shutdown()
+        set_ocr_executor(None)
+
+    def _install(self, **kwargs):
+        from src.services.ocr_executor import OCRExecutor, set_ocr_executor
+        executor = OCRExecutor(use_processes=False, **kwargs)
+        set_ocr_executor(executor)
+        return executor
+
+    def _upload(self, client, user_id):
+        return client.post(
+            "/api/v1/ocr/process",
+            files={"file": ("factura.png", b"fake-image", "image/png")},
+            data={"user_id": user_id}
+        )
+
+    def test_process_runs_in_pool(self, client, created_user):
+        """Test: El endpoint procesa la factura en el pool y libera el cupo."""
+        executor = self._install(max_workers=1, max_pending=0)
+        with patch.object(ocr_service, 'process_invoice_file', return_value={"amount": 1500.0}) as mock_process:
+            response = self._upload(client, created_user["id"])
+
+        assert response.status_code == 200
+        assert response.json()["amount"] == 1500.0
+        assert response.json()["user_id"] == created_user["id"]
+        mock_process.assert_called_once()
+        stats = executor.get_stats()
+        assert stats["in_flight"] == 0
+        assert stats["completed"] == 1
+
+    def test_upload_streamed_to_temp_file(self, client, created_user, monkeypatch):
+        """Test: La carga llega al OCR como archivo temporal, se borra al terminar y respeta el tamaño máximo."""
+        from src.database import settings
+
+        self._install(max_workers=1, max_pending=0)
+        seen = {}
+
+        def fake_process(path):
+            with open(path, "rb") as temp_file:
+                seen[path] = temp_file.read()
+            return {"amount": 1500.0}
+
+        with patch.object(ocr_service, 'process_invoice_file', side_effect=fake_process):
+            assert self._upload(client, created_user["id"]).status_code == 200
+            monkeypatch.setattr(settings, "max_file_size", 4)
+            response = self._upload(client, created_user["id"])
+
+        assert list(seen.values()) == [b"fake-image"]
+        assert not os.path.exists(next(iter(seen)))
+        assert response.status_code == 400
+
+    def test_queue_full_returns_429(self, client, created_user):
+        """Test: Sin cupo en el pool se responde 429 con Retry-After."""
+        executor = self._install(max_workers=1, max_pending=0)
+        executor._acquire()  # Ocupar el único cupo
+        try:
+            with patch.object(ocr_service, 'process_invoice_file') as mock_process:
+                response = self._upload(client, created_user["id"])
+        finally:
+            executor._release()
+
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "5"
+        mock_process.assert_not_called()
+        assert executor.get_stats()["rejected"] == 1
+
+    def test_timeout_returns_504_and_keeps_slot_until_done(self, client, created_user):
+        """Test: Un OCR lento responde 504 y su cupo se libera al terminar el trabajo."""
+        executor = self._install(max_workers=1, max_pending=0, timeout=0.1)
+        finished = threading.Event()
+
+        def slow_ocr(file_path):
+            self.release.wait(5)
+            finished.set()
+            return {"amount": 1.0}
+
+        with patch.object(ocr_service, 'process_invoice_file', side_effect=slow_ocr):
+            response = self._upload(client, created_user["id"])
+            assert response.status_code == 504
+            # El trabajo sigue en el pool: no se admiten más hasta que termine
+            assert executor.get_stats()["in_flight"] == 1
+            assert self._upload(client, created_user["id"]).status_code == 429
+
+            self.release.set()
+            assert finished.wait(5)
+
+        deadline = time.monotonic() + 5
+        while executor.get_stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = executor.get_stats()
+        assert stats["in_flight"] == 0
+        assert stats["timed_out"] == 1
+
+    def test_event_loop_not_blocked(self):
+        """Test: Mientras corre el OCR el bucle de eventos sigue atendiendo otras tareas."""
+        executor = self._install(max_workers=1, max_pending=1)
+
+        def slow_ocr(file_path):
+            self.release.wait(5)
+            return {"amount": 2.0}
+
+        async def scenario():
+            job = asyncio.ensure_future(executor.process_invoice_file("factura.png"))
+            await asyncio.sleep(0.05)
+            # El bucle respondió mientras el OCR seguía bloqueado
+            assert not job.done()
+            self.release.set()
+            return await job
+
+        with patch.object(ocr_service, 'process_invoice_file', side_effect=slow_ocr):
+            assert asyncio.run(scenario()) == {"amount": 2.0}
+
+    def test_process_pool_propagates_errors(self):
+        """Test: Con procesos reales los errores del OCR llegan al llamador."""
+        from src.services.ocr_executor import OCRExecutor
+
+        executor = OCRExecutor(max_workers=1, max_pending=0, timeout=60)
+        try:
+            with pytest.raises(Exception):
+                asyncio.run(executor.process_invoice_file("/no/existe/factura.png"))
+            assert executor.get_stats()["in_flight"] == 0
+        finally:
+            executor.shutdown()
+
+    def test_dead_worker_is_replaced(self, tmp_path, monkeypatch):
+        """Test: Si un proceso del pool muere, el pool se recrea y la siguiente factura se procesa."""
+        import signal
+        import fitz
+        from src.services.ocr_executor import OCRExecutor
+
+        # Los procesos hijos no comparten la caché de OCR de la prueba
+        monkeypatch.setenv("OCR_CACHE_PATH", "")
+        pdf_path = str(tmp_path / "factura.pdf")
+        document = fitz.open()
+        document.new_page().insert_text((72, 72), "TOTAL: $1.500")
+        document.save(pdf_path)
+        document.close()
+
+        executor = OCRExecutor(max_workers=1, max_pending=0, timeout=60)
+        try:
+            assert asyncio.run(executor.process_invoice_file(pdf_path))["amount"] == 1500.0
+
+            pool = executor._pool
+            for process in list(pool._processes.values()):
+                os.kill(process.pid, signal.SIGKILL)
+            deadline = time.monotonic() + 10
+            while not pool._broken and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert pool._broken
+
+            assert asyncio.run(executor.process_invoice_file(pdf_path))["amount"] == 1500.0
+            assert executor._pool is not pool
+            stats = executor.get_stats()
+            assert stats["pool_restarts"] == 1
+            assert stats["in_flight"] == 0
+        finally:
+            executor.shutdown()
+
+    def test_broken_pool_returns_503(self, client, created_user):
+        """Test: Un trabajo interrumpido por la caída del pool responde 503 y descarta el pool."""
+        from concurrent.futures.process import BrokenProcessPool
+
+        executor = self._install(max_workers=1, max_pending=0)
+        with patch.object(ocr_service, 'process_invoice_file', side_effect=BrokenProcessPool("worker murió")):
+            response = self._upload(client, created_user["id"])
+
+        assert response.status_code == 503
+        assert executor._pool is None
+        assert executor.get_stats()["pool_restarts"] == 1
+
+
+class TestOCRJobs:
+    """Tests del pipeline de OCR en segundo plano con Celery."""
+
+    @pytest.fixture
+    def celery_memory(self, tmp_path):
+        """Celery sobre el broker en memoria (en lugar de Redis) y almacén temporal."""
+        from src.celery_app import celery_app
+        from src.services.attachment_storage import set_storage_backend, LocalStorageBackend
+        from tests.conftest import TestingSessionLocal
+
+        previous = {name: celery_app.conf[name] for name in ("broker_url", "result_backend", "task_always_eager")}
+        celery_app.conf.update(broker_url="memory://", result_backend="cache+memory://", task_always_eager=False)
+        storage = LocalStorageBackend(root=str(tmp_path / "blobs"))
+        set_storage_backend(storage)
+        try:
+            with patch("src.tasks.ocr_tasks.SessionLocal", TestingSessionLocal):
+                yield celery_app, storage
+        finally:
+            celery_app.conf.update(previous)
+            set_storage_backend(None)
+
+    def _submit(self, client, user_id, **data):
+        return client.post(
+            "/api/v1/ocr/jobs",
+            files={"file": ("factura.png", b"fake-image", "image/png")},
+            data={"user_id": user_id, **data}
+        )
+
+    def _create_invoice(self, client, user_id):
+        response = client.post("/api/v1/invoices/upload", data={
+            "user_id": user_id,
+            "date": "2024-01-15T10:30:00",
+            "provider": "Proveedor",
+            "amount": 100.0,
+            "payment_method": PaymentMethod.TARJETA_BST.value,
+            "category": ExpenseCategory.MEALS.value,
+        })
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    def test_worker_completes_job_and_fills_invoice(self, client, created_user, celery_memory):
+        """Test: La carga responde con el trabajo y el worker completa los datos OCR de la factura."""
+        from celery.contrib.testing.worker import start_worker
+        from celery.signals import task_postrun
+        from tests.conftest import TestingSessionLocal
+        from src.models import Invoice
+
+        celery_app, storage = celery_memory
+        invoice_id = self._create_invoice(client, created_user["id"])
+        release, finished = threading.Event(), threading.Event()
+        ocr_result = {"amount": 1500.0, "confidence": 0.8, "raw_text": "FACTURA"}
+
+        def slow_ocr(file_path):
+            assert os.path.exists(file_path)
+            release.wait(5)
+            return ocr_result
+
+        def on_postrun(sender=None, **kwargs):
+            finished.set()
+
+        task_postrun.connect(on_postrun, weak=False)
+        try:
+            with patch.object(ocr_service, 'process_invoice_file', side_effect=slow_ocr), \
+                    start_worker(celery_app, perform_ping_check=False, loglevel="WARNING"):
+                response = self._submit(client, created_user["id"], invoice_id=invoice_id)
+                assert response.status_code == 202
+                job = response.json()
+                # La respuesta no espera al OCR
+                assert job["status"] in ("pendiente", "en_proceso")
+                assert job["result"] is None
+
+                release.set()
+                assert finished.wait(10)
+        finally:
+            task_postrun.disconnect(on_postrun)
+
+        response = client.get(f"/api/v1/ocr/jobs/{job['id']}")
+        assert response.status_code == 200
+        job = response.json()
+        assert job["status"] == "completado"
+        assert job["result"] == ocr_result
+        assert job["confidence"] == 0.8
+
+        db = TestingSessionLocal()
+        try:
+            invoice = db.get(Invoice, invoice_id)
+            assert invoice.ocr_data == ocr_result
+            assert invoice.ocr_confidence == 0.8
+        finally:
+            db.close()
+
+    def test_failed_ocr_marks_job_and_releases_file(self, client, created_user, celery_memory):
+        """Test: Un error del OCR deja el trabajo fallido y elimina el archivo no referenciado."""
+        celery_app, storage = celery_memory
+        celery_app.conf.task_always_eager = True
+
+        def unreadable(file_path):
+            assert os.path.exists(file_path)
+            raise ValueError("Imagen ilegible")
+
+        with patch.object(ocr_service, 'process_invoice_file', side_effect=unreadable):
+            response = self._submit(client, created_user["id"])
+
+        assert response.status_code == 202
+        job = response.json()
+        assert job["status"] == "fallido"
+        assert job["error"] == "Imagen ilegible"
+        assert not [name for _, _, files in os.walk(storage.root) for name in files if name.endswith(".png")]
+
+    def test_broker_unavailable_returns_503(self, client, created_user, celery_memory):
+        """Test: Si no se puede encolar el trabajo se responde 503 y queda fallido."""
+        from tests.conftest import TestingSessionLocal
+        from src.models import OCRJob
+
+        with patch("src.routers.ocr.process_ocr_job.delay", side_effect=OSError("broker caído")):
+            response = self._submit(client, created_user["id"])
+
+        assert response.status_code == 503
+        db = TestingSessionLocal()
+        try:
+            job = db.query(OCRJob).one()
+            assert job.status.value == "fallido"
+        finally:
+            db.close()
+
+    def test_wait_holds_response_until_deadline(self, client, created_user, celery_memory):
+        """Test: Con wait la consulta espera mientras el trabajo sigue pendiente."""
+        with patch("src.routers.ocr.process_ocr_job.delay"), \
+                patch("src.routers.ocr.OCR_JOB_POLL_INTERVAL", 0.05):
+            job = self._submit(client, created_user["id"]).json()
+            started = time.monotonic()
+            response = client.get(f"/api/v1/ocr/jobs/{job['id']}", params={"wait": 0.3})
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "pendiente"
+        assert time.monotonic() - started >= 0.3
+
+    def test_unknown_job_and_invoice(self, client, created_user, celery_memory):
+        """Test: Trabajos y facturas inexistentes responden 404."""
+        assert client.get("/api/v1/ocr/jobs/no-existe").status_code == 404
+        response = self._submit(client, created_user["id"], invoice_id=9999)
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Factura no encontrada"
+
+
+class TestOCRCache:
+    """Tests de la caché persistente de resultados de OCR."""
+
+    TEXT = "SUPERMERCADO ABC S.A.S.\nNIT: 900123456-7\nFECHA: 15/01/2024\nTOTAL: $1.500\nEFECTIVO"
+
+    def _receipt(self, tmp_path, content=b"receipt-bytes", name="recibo.png"):
+        path = tmp_path / name
+        path.write_bytes(content)
+        return str(path)
+
+    def test_repeat_submission_skips_tesseract(self, tmp_path, isolated_ocr_cache):
+        """Test: El mismo archivo reenviado se responde desde la caché sin volver a extraer texto."""
+        service = OCRService()
+        first_path = self._receipt(tmp_path)
+        retry_path = self._receipt(tmp_path, name="reintento.png")
+
+        with patch.object(service, 'extract_text_from_file', return_value=self.TEXT) as mock_extract:
+            first = service.process_invoice_file(first_path)
+            retry = service.process_invoice_file(retry_path)
+
+        mock_extract.assert_called_once_with(first_path)
+        for field in ('amount', 'provider', 'date', 'nit', 'payment_method', 'category', 'confidence', 'raw_text'):
+            assert retry[field] == first[field]
+        assert retry['file_path'] == retry_path
+        assert retry['text_length'] == len(self.TEXT)
+
+        stats = isolated_ocr_cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert stats["entries"] == 1
+
+    def test_key_includes_content_config_and_parser_version(self, tmp_path):
+        """Test: Cambiar el contenido, el idioma o la versión del parser produce otra clave."""
+        service = OCRService()
+        path = self._receipt(tmp_path)
+        key = service.cache_key(path)
+
+        assert service.cache_key(self._receipt(tmp_path, name="copia.png")) == key
+        assert service.cache_key(self._receipt(tmp_path, content=b"otro recibo", name="otro.png")) != key
+
+        service.tesseract_lang = 'spa'
+        assert service.cache_key(path) != key
+        service.tesseract_lang = 'spa+eng'
+
+        with patch('src.services.ocr_service.PARSER_VERSION', PARSER_VERSION + 1):
+            assert service.cache_key(path) != key
+
+    def test_keyword_table_reload_invalidates_cached_category(self, tmp_path):
+        """Test: Editar la tabla de palabras clave no devuelve la categoría anterior desde la caché."""
+        import json
+        from src.services.ocr_classifier import KeywordClassifier
+
+        table = tmp_path / "categorias.json"
+        table.write_text(json.dumps({"transporte": {"SUPERMERCADO": 2}}))
+        service = OCRService()
+        service.classifier = KeywordClassifier(path=str(table))
+        path = self._receipt(tmp_path)
+
+        with patch.object(service, 'extract_text_from_file', return_value=self.TEXT) as mock_extract:
+            assert service.process_invoice_file(path)['category'] == ExpenseCategory.TRANSPORT.value
+            assert service.process_invoice_file(path)['category'] == ExpenseCategory.TRANSPORT.value
+            assert mock_extract.call_count == 1
+
+            table.write_text(json.dumps({"hospedaje": {"SUPERMERCADO": 2}}))
+            os.utime(table, (time.time() + 5, time.time() + 5))
+            assert service.process_invoice_file(path)['category'] == ExpenseCategory.ACCOMMODATION.value
+            assert mock_extract.call_count == 2
+
+    def test_lru_eviction_respects_size_cap(self, tmp_path):
+        """Test: Al superar el tamaño máximo se elimina la entrada usada hace más tiempo."""
+        from src.services.ocr_cache import OCRResultCache
+
+        cache = OCRResultCache(str(tmp_path / "lru.sqlite3"), max_bytes=250)
+        entry = {"amount": 1.0, "raw_text": "x" * 80}
+        with patch('src.services.ocr_cache.time.time', side_effect=itertools.count(1000)):
+            cache.set("a", entry)
+            cache.set("b", entry)
+            assert cache.get("a") is not None  # "a" pasa a ser la más reciente
+            cache.set("c", entry)
+
+            assert cache.get("b") is None
+            assert cache.get("a") is not None
+            assert cache.get("c") is not None
+
+        stats = cache.get_stats()
+        assert stats["entries"] == 2
+        assert stats["bytes"] <= 250
+        assert stats["evictions"] == 1
+
+    def test_cache_persists_across_instances(self, tmp_path):
+        """Test: Los resultados sobreviven a un reinicio (nueva instancia sobre el mismo archivo)."""
+        from src.services.ocr_cache import OCRResultCache
+
+        path = str(tmp_path / "persist" / "ocr.sqlite3")
+        OCRResultCache(path).set("clave", {"amount": 10.0, "raw_text": "TOTAL 10"})
+
+        cached = OCRResultCache(path).get("clave")
+        assert cached == {"amount": 10.0, "raw_text": "TOTAL 10"}
+
+    def test_unavailable_cache_falls_back_to_ocr(self, tmp_path):
+        """Test: Si la caché no se puede abrir, el OCR se ejecuta normalmente."""
+        from src.services.ocr_cache import OCRResultCache, set_ocr_cache
+
+        blocker = tmp_path / "bloqueo"
+        blocker.write_text("no es un directorio")
+        set_ocr_cache(OCRResultCache(str(blocker / "ocr.sqlite3")))
+
+        service = OCRService()
+        with patch.object(service, 'extract_text_from_file', return_value=self.TEXT) as mock_extract:
+            result = service.process_invoice_file(self._receipt(tmp_path))
+            service.process_invoice_file(self._receipt(tmp_path))
+
+        assert result['amount'] == 1500.0
+        assert mock_extract.call_count == 2
+
+    def test_cache_stats_endpoint(self, client, isolated_ocr_cache):
+        """Test: El endpoint de estadísticas reporta la tasa de aciertos."""
+        isolated_ocr_cache.set("clave", {"amount": 1.0, "raw_text": "TOTAL 1"})
+        isolated_ocr_cache.get("clave")
+        isolated_ocr_cache.get("otra")
+
+        response = client.get("/api/v1/ocr/cache-stats")
+        assert response.status_code == 200
+        stats = response.json()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
@@ -0,0 +1,189 @@
+"""
+Pruebas unitarias para el almacenamiento de adjuntos.
+Usa un cliente S3 en memoria (equivalente a un MinIO local) para probar el
+backend compatible con S3 sin servicios externos.
+"""
+
+import io
+import pytest
+
+from src.services import attachment_storage
+from src.services.attachment_storage import S3StorageBackend, set_storage_backend
+
+
+class FakeS3Error(Exception):
+    """Error con la misma forma que `botocore.exceptions.ClientError`."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    """Cliente S3 en memoria con las operaciones que usa el backend."""
+
+    def __init__(self):
+        self.objects = {}
+        self.multipart_uploads = {}
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.multipart_uploads) + 1}"
+        self.multipart_uploads[upload_id] = {"key": (Bucket, Key), "parts": {}}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.multipart_uploads[UploadId]["parts"][PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        upload = self.multipart_uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        self.objects[(Bucket, Key)] = b"".join(upload["parts"][n] for n in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.multipart_uploads.pop(UploadId, None)
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise FakeS3Error("404")
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self.objects[(Bucket, Key)] = self.objects[(CopySource["Bucket"], CopySource["Key"])]
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def upload_file(self, Filename, Bucket, Key):
+        with open(Filename, "rb") as source:
+            self.objects[(Bucket, Key)] = source.read()
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"http://minio.local/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+@pytest.fixture
+def s3_client():
+    """Backend S3 activo sobre un cliente en memoria."""
+    client = FakeS3Client()
+    set_storage_backend(S3StorageBackend(bucket="facturas", prefix="adjuntos/", client=client))
+    yield client
+    set_storage_backend(None)
+
+
+def _upload(client, user_id, test_invoice, content):
+    """Subir una factura con el contenido indicado como adjunto."""
+    return client.post(
+        "/api/v1/invoices/upload",
+        data={**test_invoice, "user_id": user_id},
+        files={"file": ("recibo.pdf", content, "application/pdf")}
+    )
+
+
+class TestS3StorageBackend:
+    """Tests para el backend de adjuntos compatible con S3."""
+
+    def test_upload_stores_object_by_content(self, client, created_user, test_invoice, s3_client):
+        """
+        Caso de éxito: Guardar el adjunto en el bucket.
+
+        Verifica que el objeto queda en su clave por contenido sin temporales ni cargas pendientes.
+        """
+        import hashlib
+
+        response = _upload(client, created_user["id"], test_invoice, b"recibo en s3")
+
+        assert response.status_code == 201
+        sha256 = hashlib.sha256(b"recibo en s3").hexdigest()
+        expected_key = f"adjuntos/{sha256[:2]}/{sha256}.pdf"
+        assert response.json()["file_path"] == expected_key
+        assert list(s3_client.objects) == [("facturas", expected_key)]
+        assert s3_client.multipart_uploads == {}
+
+    def test_upload_deduplicates_objects(self, client, created_user, test_invoice, s3_client):
+        """
+        Caso de éxito: Deduplicar adjuntos en el bucket.
+
+        Verifica que dos cargas iguales comparten el mismo objeto.
+        """
+        first = _upload(client, created_user["id"], test_invoice, b"mismo recibo").json()
+        second = _upload(client, created_user["id"], test_invoice, b"mismo recibo").json()
+
+        assert first["file_path"] == second["file_path"]
+        assert len(s3_client.objects) == 1
+
+    def test_multipart_upload_in_parts(self, client, created_user, test_invoice, s3_client, monkeypatch):
+        """
+        Caso de éxito: Carga multiparte por bloques.
+
+        Verifica que un archivo mayor que el tamaño de parte se reensambla completo.
+        """
+        monkeypatch.setattr(attachment_storage, "S3_PART_SIZE", 1024)
+        monkeypatch.setattr(attachment_storage, "UPLOAD_CHUNK_SIZE", 1024)
+        content = bytes(range(256)) * 20
+
+        response = _upload(client, created_user["id"], test_invoice, content)
+
+        assert response.status_code == 201
+        assert s3_client.objects[("facturas", response.json()["file_path"])] == content
+
+    def test_upload_too_large_aborts_multipart(self, client, created_user, test_invoice, s3_client, monkeypatch):
+        """
+        Caso de fallo: Archivo demasiado grande.
+
+        Verifica que la carga multiparte se aborta sin dejar objetos.
+        """
+        from src.database import settings
+
+        monkeypatch.setattr(settings, "max_file_size", 10)
+
+        response = _upload(client, created_user["id"], test_invoice, b"x" * 100)
+
+        assert response.status_code == 400
+        assert s3_client.objects == {}
+        assert s3_client.multipart_uploads == {}
+
+    def test_download_redirects_to_presigned_url(self, client, created_user, test_invoice, s3_client):
+        """
+        Caso de éxito: Descarga con URL prefirmada.
+
+        Verifica que la API redirige al bucket en lugar de transferir los bytes.
+        """
+        invoice = _upload(client, created_user["id"], test_invoice, b"recibo").json()
+
+        response = client.get(f"/api/v1/invoices/{invoice['id']}/download", follow_redirects=False)
+
+        assert response.status_code == 307
+        assert response.headers["location"].startswith(f"http://minio.local/facturas/{invoice['file_path']}")
+
+    def test_delete_last_reference_removes_object(self, client, created_user, test_invoice, s3_client):
+        """
+        Caso de éxito: Eliminar el objeto con la última factura.
+
+        Verifica el conteo de referencias sobre el backend S3.
+        """
+        first = _upload(client, created_user["id"], test_invoice, b"compartido").json()
+        second = _upload(client, created_user["id"], test_invoice, b"compartido").json()
+
+        client.delete(f"/api/v1/invoices/{first['id']}")
+        assert len(s3_client.objects) == 1
+
+        client.delete(f"/api/v1/invoices/{second['id']}")
+        assert s3_client.objects == {}
+
+    def test_store_file_uploads_local_file(self, tmp_path, s3_client):
+        """
+        Caso de éxito: Guardar un archivo local (flujo OCR) en el bucket.
+
+        Verifica que store_file sube el archivo a su clave por contenido.
+        """
+        source = tmp_path / "factura.png"
+        source.write_bytes(b"imagen")
+
+        stored = attachment_storage.store_file(str(source), ".png")
+
+        assert stored.path.startswith("adjuntos/")
+        assert s3_client.objects[("facturas", stored.path)] == b"imagen"